@@ -13,8 +13,7 @@ from .serializers import (
     ClaseSerializer
 )
 
-from aplicaciones.usuarios.utils import registrar_bitacora
-from aplicaciones.usuarios.usuario_views import get_client_ip 
+from aplicaciones.usuarios.auditoria import AuditoriaMixin
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -27,7 +26,8 @@ from aplicaciones.usuarios.permissions import IsAdminOrSuperAdmin, PermisoPorPue
 
 
 
-class GradoViewSet(viewsets.ModelViewSet):
+class GradoViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'grado'
     queryset = Grado.objects.all()
     serializer_class = GradoSerializer
     filterset_fields = ['unidad_educativa', 'nivel_educativo']
@@ -42,13 +42,7 @@ class GradoViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='cantidad')
     def obtener_cantidad_grados(self, request):
         cantidad = Grado.objects.count()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='grado',
-            accion='ver',
-            descripcion='Consultó la cantidad de grados'
-        )
+        self.auditar('ver', 'Consultó la cantidad de grados')
         return Response({'cantidad_grados': cantidad}, status=status.HTTP_200_OK)
 
     @csrf_exempt
@@ -61,13 +55,7 @@ class GradoViewSet(viewsets.ModelViewSet):
             read_serializer = GradoSerializer(grado, context={'request': request})
             print("Id Grado Creado: ", read_serializer.data['id'])
 
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='grado',
-                accion='crear',
-                descripcion='Creó un grado'
-            )
+            self.auditar('crear', 'Creó un grado')
 
             return Response(read_serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -82,13 +70,7 @@ class GradoViewSet(viewsets.ModelViewSet):
         serializer = CreateGradoSerializer(grado, data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='grado',
-                accion='editar',
-                descripcion=f'Editó el grado {pk}'
-            )
+            self.auditar('editar', f'Editó el grado {pk}')
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -100,13 +82,7 @@ class GradoViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Grado no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
         grado.delete()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='grado',
-            accion='eliminar',
-            descripcion=f'Eliminó el grado {pk}'
-        )
+        self.auditar('eliminar', f'Eliminó el grado {pk}')
 
         return Response({'detail': 'Grado eliminado correctamente.'}, status=status.HTTP_204_NO_CONTENT)
 
@@ -117,7 +93,8 @@ class GradoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ParaleloViewSet(viewsets.ModelViewSet):
+class ParaleloViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'paralelo'
     queryset = Paralelo.objects.all()
     serializer_class = ParaleloSerializer
     permission_classes = [PermisoPorRol | PermisoPorPuesto]
@@ -162,12 +139,7 @@ class ParaleloViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         paralelo = serializer.save()
 
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='paralelo',
-            descripcion=f'Actualizo el paralelo {paralelo.id} {paralelo.nobmre}'
-        )
+        self.auditar('editar', f'Actualizo el paralelo {paralelo.id} {paralelo.nombre}')
 
         # ——— Aquí actualizamos también el Curso vinculado ———
         try:
@@ -185,12 +157,7 @@ class ParaleloViewSet(viewsets.ModelViewSet):
 
         curso.nombre = nuevo_nombre
         curso.save()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='curso',
-            descripcion=f'Actualizó el curso vinculado al paraeleo {paralelo.id} {paralelo.nombre}'
-        )
+        self.auditar('editar', f'Actualizó el curso vinculado al paraeleo {paralelo.id} {paralelo.nombre}', tabla='curso')
         # ——————————————————————————————————————————
 
         return Response(self.get_serializer(paralelo).data, status=status.HTTP_200_OK)
@@ -200,24 +167,12 @@ class ParaleloViewSet(viewsets.ModelViewSet):
         paralelo = self.get_object()
         try:
             curso = paralelo.curso
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='curso',
-                accion='eliminar',
-                descripcion=f'Elimino el curso {curso.id} {curso.nombre} vinculado al paralelo {paralelo.id} {paralelo.nombre}',
-            )
+            self.auditar('eliminar', f'Elimino el curso {curso.id} {curso.nombre} vinculado al paralelo {paralelo.id} {paralelo.nombre}', tabla='curso')
         except Curso.DoesNotExist:
             pass
 
         paralelo.delete()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='paralelo',
-            acion='eliminar',
-            descripcion=f'Elimino el paralelo {paralelo.id} {paralelo.nombre}',
-        )
+        self.auditar('eliminar', f'Elimino el paralelo {paralelo.id} {paralelo.nombre}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -398,8 +353,9 @@ class MateriaCursoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ClaseViewSet(viewsets.ModelViewSet):
-    
+class ClaseViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'clase'
+
     queryset = Clase.objects.select_related(
         'materia_curso__materia', 'materia_curso__curso', 'aula'
     )
@@ -436,13 +392,7 @@ class ClaseViewSet(viewsets.ModelViewSet):
             raise ValidationError('Esa materia/curso ya está asignada a ese aula.')
 
         clase = serializer.save()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='clase',
-            accion='crear',
-            descripcion=f'Creó la clase {clase.id}'
-        )
+        self.auditar('crear', f'Creó la clase {clase.id}')
         return Response(self.get_serializer(clase).data, status=status.HTTP_201_CREATED)
 
     # ---------- EDITAR ----------
@@ -458,25 +408,13 @@ class ClaseViewSet(viewsets.ModelViewSet):
             raise ValidationError('Otra clase con esa materia/curso y aula ya existe.')
 
         clase = serializer.save()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='clase',
-            accion='editar',
-            descripcion=f'Editó la clase {clase.id}'
-        )
+        self.auditar('editar', f'Editó la clase {clase.id}')
         return Response(self.get_serializer(clase).data)
 
     # ---------- ELIMINAR ----------
     @action(detail=True, methods=['delete'], url_path='eliminar')
     def eliminar_clase(self, request, pk=None):
         clase = self.get_object()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='clase',
-            accion='eliminar',
-            descripcion=f'Eliminó la clase {clase.id}'
-        )
+        self.auditar('eliminar', f'Eliminó la clase {clase.id}')
         clase.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,109 @@
+# asistencia/alertas.py
+"""
+Avisos de inasistencia a tutores, pasada la hora de corte de cada unidad.
+
+`alertar_ausencias()` (comando alertar_ausencias, programado por cron):
+  1. unidades con día hábil (sin fin de semana ni Feriado de su calendario
+     activo) cuya hora de corte ya pasó;
+  2. una sola consulta con anti-joins: vínculos TutorEstudiante de estudiantes
+     activos sin ASI/TAR hoy, sin licencia aprobada y aún no avisados;
+  3. AvisoAusencia por (tutor, estudiante, día) y una Notificacion por tutor en
+     la misma transacción.
+
+Los pasos 2 y 3 corren con las filas de esas unidades bloqueadas
+(select_for_update): dos ejecuciones que se solapan se serializan y la segunda
+ya ve los avisos de la primera, en lugar de chocar con la restricción única de
+AvisoAusencia y perder todo el lote.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from aplicaciones.calendario.models import Feriado
+from aplicaciones.estudiantes.models import TutorEstudiante
+from aplicaciones.institucion.models import UnidadEducativa
+from aplicaciones.usuarios import notificaciones
+from aplicaciones.usuarios.models import Notificacion
+from .models import AsistenciaGeneral, AvisoAusencia, Licencia
+
+PRESENTES = ('ASI', 'TAR')
+TIPO = 'ausencia'
+
+
+def _hora_corte():
+    return parse_time(getattr(settings, 'ALERTAS_AUSENCIA', {}).get('HORA_CORTE', '09:00'))
+
+
+def unidades_vencidas(ahora):
+    """Ids de las unidades con clases hoy cuya hora de corte ya pasó."""
+    hoy = ahora.date()
+    if hoy.weekday() >= 5:
+        return []
+    feriado = Feriado.objects.filter(
+        fecha=hoy, calendario__activo=True, calendario__unidad_educativa=OuterRef('pk'),
+    )
+    corte, hora = _hora_corte(), ahora.time()
+    return [
+        pk
+        for pk, corte_unidad in UnidadEducativa.objects.exclude(Exists(feriado)).values_list('pk', 'hora_corte_asistencia')
+        if (corte_unidad or corte) <= hora
+    ]
+
+
+def pendientes(fecha, unidad_ids):
+    """(tutor_id, estudiante_id, nombre, apellido) que aún hay que avisar."""
+    presente = AsistenciaGeneral.objects.filter(
+        estudiante=OuterRef('estudiante_id'), fecha=fecha, estado__in=PRESENTES,
+    )
+    con_licencia = Licencia.objects.activas(fecha).filter(estudiante=OuterRef('estudiante_id'))
+    avisado = AvisoAusencia.objects.filter(
+        fecha=fecha, tutor=OuterRef('tutor_id'), estudiante=OuterRef('estudiante_id'),
+    )
+    return (
+        TutorEstudiante.objects.filter(estudiante__estado=True, estudiante__unidad_id__in=unidad_ids)
+        .exclude(Exists(presente))
+        .exclude(Exists(con_licencia))
+        .exclude(Exists(avisado))
+        .order_by()
+        .values_list('tutor_id', 'estudiante_id', 'estudiante__usuario__nombre', 'estudiante__usuario__apellido')
+        .distinct()
+    )
+
+
+def alertar_ausencias(ahora=None):
+    """Avisa las inasistencias de hoy; devuelve cuántas notificaciones creó."""
+    ahora = timezone.localtime(ahora)
+    unidad_ids = unidades_vencidas(ahora)
+    if not unidad_ids:
+        return 0
+
+    fecha = ahora.date()
+    with transaction.atomic():
+        list(UnidadEducativa.objects.select_for_update().filter(pk__in=unidad_ids).order_by('pk').values_list('pk'))
+        por_tutor = defaultdict(list)
+        for tutor_id, estudiante_id, nombre, apellido in pendientes(fecha, unidad_ids):
+            por_tutor[tutor_id].append((estudiante_id, f"{nombre} {apellido}"))
+        if not por_tutor:
+            return 0
+
+        AvisoAusencia.objects.bulk_create([
+            AvisoAusencia(tutor_id=tutor_id, estudiante_id=estudiante_id, fecha=fecha)
+            for tutor_id, hijos in por_tutor.items()
+            for estudiante_id, _ in hijos
+        ])
+        creadas = Notificacion.objects.crear_lote([
+            Notificacion(
+                usuario_id=tutor_id,
+                titulo='Inasistencia',
+                mensaje=f"Sin registro de asistencia el {fecha:%d/%m/%Y}: {', '.join(n for _, n in hijos)}.",
+                tipo=TIPO,
+            )
+            for tutor_id, hijos in por_tutor.items()
+        ])
+        # crear_lote usa bulk_create (sin post_save): se publica el lote completo
+        transaction.on_commit(lambda: notificaciones.publicar_lote(creadas))
+    return len(creadas)
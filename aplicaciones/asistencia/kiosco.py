@@ -0,0 +1,277 @@
+# asistencia/kiosco.py
+"""
+Registro de entrada en portería (kiosco) sin consultas por escaneo.
+
+• IndiceKiosco: por unidad educativa, código escaneado (RUDE o CI) → estudiante
+  y los bloques de horario de la unidad para calcular la hora de entrada.
+  Se carga una vez por unidad y se marca con una VersionCompartida, como
+  MatrizPermisos (releída cada VERSIONES_COMPARTIDAS['RELECTURA_SEG'], no en
+  cada escaneo); las señales la incrementan al cambiar estudiantes, CI de
+  usuarios u horarios.
+• registrar(): clasifica ASI/TAR contra la hora de entrada más la tolerancia,
+  anota la marca en el diario (archivo JSONL, KIOSCO_ASISTENCIA['DIARIO']) y la
+  encola en `cola_kiosco`, que inserta por lotes (bulk_create).
+• Cada vaciado toma también el diario: lo que quedó de un proceso caído o de un
+  vaciado fallido se inserta ahí. Como la primera marca del día gana (ON
+  CONFLICT DO NOTHING), reinsertar una marca ya guardada no cambia nada. Las
+  marcas que la BD rechaza van a `.descartadas` y se olvidan en `_vistos`.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from aplicaciones.calendario.models import ClaseHorario
+from aplicaciones.estudiantes.models import Estudiante
+from aplicaciones.usuarios.buffer import BufferEscritura
+from aplicaciones.usuarios.utils import agregar_lineas, tomar_lineas
+from aplicaciones.usuarios.versiones import VersionCompartida
+from . import rachas, resumen
+from .models import AsistenciaGeneral
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION = 'asistencia:kiosco:version'
+DIAS = ('LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB', 'DOM')  # en el orden de date.weekday()
+
+
+def _config():
+    return getattr(settings, 'KIOSCO_ASISTENCIA', {})
+
+
+def _ruta_diario():
+    return _config().get('DIARIO') or os.path.join(settings.BASE_DIR, 'kiosco_pendiente.jsonl')
+
+
+class IndiceKiosco:
+    """
+    Por unidad: (versión, {código: estudiante_id}, {día: [(hora_inicio, desde, hasta)]}).
+    Además recuerda quién ya marcó hoy en este proceso para no encolar dos veces.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._unidades = {}
+        self._vistos = (None, {})
+        self._compartida = VersionCompartida(CLAVE_VERSION)
+
+    # ── versión ───────────────────────────────────────────────
+    def _version_actual(self):
+        return self._compartida.actual()
+
+    def invalidar(self):
+        self._compartida.invalidar()
+        with self._lock:
+            self._unidades = {}
+
+    def limpiar(self):
+        """Olvida índices y marcas del día de este proceso (tests)."""
+        with self._lock:
+            self._unidades = {}
+            self._vistos = (None, {})
+
+    def programar_invalidacion(self):
+        transaction.on_commit(self.invalidar)
+
+    # ── carga ─────────────────────────────────────────────────
+    def _unidad(self, unidad_id):
+        version = self._version_actual()
+        datos = self._unidades.get(unidad_id)
+        if datos is not None and datos[0] == version:
+            return datos
+        with self._lock:
+            datos = self._unidades.get(unidad_id)
+            if datos is not None and datos[0] == version:
+                return datos
+            codigos = {}
+            for estudiante_id, rude, ci in (
+                Estudiante.objects.filter(unidad_id=unidad_id, estado=True)
+                .values_list('pk', 'rude', 'usuario__ci')
+            ):
+                codigos[rude] = estudiante_id
+                if ci:
+                    codigos.setdefault(ci, estudiante_id)
+            bloques = {}
+            for dia, hora, desde, hasta in (
+                ClaseHorario.objects
+                .filter(clase__materia_curso__curso__paralelo__grado__unidad_educativa_id=unidad_id)
+                .values_list('horario__dia', 'horario__hora_inicio', 'fecha_inicio', 'fecha_fin')
+                .distinct()
+            ):
+                bloques.setdefault(dia, []).append((hora, desde, hasta))
+            datos = (version, codigos, bloques)
+            self._unidades[unidad_id] = datos
+            return datos
+
+    # ── consultas ─────────────────────────────────────────────
+    def resolver(self, unidad_id, codigo):
+        return self._unidad(unidad_id)[1].get(codigo.strip())
+
+    def hora_entrada(self, unidad_id, fecha):
+        """Primer bloque del horario de la unidad vigente en `fecha`, o None."""
+        horas = [
+            hora for hora, desde, hasta in self._unidad(unidad_id)[2].get(DIAS[fecha.weekday()], ())
+            if desde <= fecha and (hasta is None or fecha <= hasta)
+        ]
+        return min(horas, default=None)
+
+    def recordar(self, estudiante_id, fecha, marca):
+        """Guarda la marca del día; si este proceso ya tenía una, devuelve esa y False."""
+        with self._lock:
+            dia, vistos = self._vistos
+            if dia != fecha:
+                vistos = {}
+                self._vistos = (fecha, vistos)
+            if estudiante_id in vistos:
+                return vistos[estudiante_id], False
+            vistos[estudiante_id] = marca
+            return marca, True
+
+    def olvidar(self, estudiante_id, fecha):
+        """La marca no llegó a la BD: un nuevo escaneo vuelve a registrarla."""
+        with self._lock:
+            dia, vistos = self._vistos
+            if dia == fecha:
+                vistos.pop(estudiante_id, None)
+
+
+indice_kiosco = IndiceKiosco()
+
+
+# ── escritura ─────────────────────────────────────────────────
+def clasificar(hora, entrada):
+    if entrada is None:
+        return 'ASI'
+    limite = datetime.combine(datetime.min, entrada) + timedelta(minutes=_config().get('TOLERANCIA_MIN', 10))
+    return 'TAR' if hora > limite.time() else 'ASI'
+
+
+def _vaciar_marcas(marcas):
+    # La primera marca del día gana: no se pisan registros previos (p. ej. JUS cargado antes)
+    with transaction.atomic():
+        AsistenciaGeneral.objects.bulk_create(marcas, ignore_conflicts=True)
+        resumen.actualizar({(marca.estudiante_id, marca.fecha) for marca in marcas})
+        rachas.marcar(marca.estudiante_id for marca in marcas)
+
+
+# ── diario ────────────────────────────────────────────────────
+def _a_linea(marca):
+    return json.dumps({
+        'estudiante_id': marca.estudiante_id,
+        'fecha': marca.fecha.isoformat(),
+        'estado': marca.estado,
+        'hora_entrada': marca.hora_entrada.isoformat() if marca.hora_entrada else None,
+    }) + '\n'
+
+
+def _desde_linea(linea):
+    data = json.loads(linea)
+    hora = data.get('hora_entrada')
+    return AsistenciaGeneral(
+        estudiante_id=int(data['estudiante_id']),
+        fecha=date.fromisoformat(data['fecha']),
+        estado=data['estado'],
+        hora_entrada=parse_time(hora) if hora else None,
+    )
+
+
+def anotar(marcas):
+    """Deja las marcas aceptadas en el diario antes de encolarlas."""
+    agregar_lineas(_ruta_diario(), [_a_linea(marca) for marca in marcas])
+
+
+def _descartar(marcas, lineas=()):
+    for marca in marcas:
+        indice_kiosco.olvidar(marca.estudiante_id, marca.fecha)
+    lineas = [*lineas, *(_a_linea(marca) for marca in marcas)]
+    if lineas:
+        agregar_lineas(f'{_ruta_diario()}.descartadas', lineas)
+        logger.error("Descartadas %s marcas de kiosco inválidas (ver %s.descartadas)", len(lineas), _ruta_diario())
+
+
+def _vaciar_cola(lote):
+    """
+    Inserta el lote junto con lo que haya en el diario, una marca por
+    (estudiante, fecha). Si la BD no responde, todo vuelve al diario.
+    """
+    ruta = _ruta_diario()
+    tomado, lineas = tomar_lineas(ruta)
+    marcas, ilegibles = {}, []
+    for linea in lineas:
+        try:
+            marca = _desde_linea(linea)
+        except (KeyError, TypeError, ValueError):
+            ilegibles.append(linea)
+            continue
+        marcas.setdefault((marca.estudiante_id, marca.fecha), marca)
+    for marca in lote:
+        marcas.setdefault((marca.estudiante_id, marca.fecha), marca)
+    marcas = list(marcas.values())
+
+    try:
+        invalidas = []
+        try:
+            _vaciar_marcas(marcas)
+        except (DataError, IntegrityError):
+            # Alguna marca no entra (p. ej. estudiante borrado): una por una
+            for marca in marcas:
+                try:
+                    _vaciar_marcas([marca])
+                except (DataError, IntegrityError):
+                    invalidas.append(marca)
+        _descartar(invalidas, ilegibles)
+    except Exception:
+        # Errores de conexión: se conservan para el próximo vaciado (si tampoco
+        # se puede escribir el diario, el buffer llama a _respaldo_marcas)
+        agregar_lineas(ruta, [_a_linea(marca) for marca in marcas])
+        logger.exception("No se pudo vaciar el kiosco; %s marcas quedan en el diario", len(marcas))
+    finally:
+        if tomado is not None:
+            os.remove(tomado)
+
+
+def _respaldo_marcas(marcas):
+    # Ni la BD ni el diario: se pierden, y un nuevo escaneo puede volver a marcarlas
+    for marca in marcas:
+        indice_kiosco.olvidar(marca.estudiante_id, marca.fecha)
+    logger.error("Se perdieron %s marcas de kiosco", len(marcas))
+
+
+cola_kiosco = BufferEscritura(
+    'kiosco',
+    _vaciar_cola,
+    max_entradas=_config().get('MAX_ENTRADAS', 200),
+    intervalo_ms=_config().get('INTERVALO_MS', 1000),
+    respaldo=_respaldo_marcas,
+)
+
+
+def registrar(unidad_id, codigo):
+    """
+    Marca la entrada del estudiante con ese código. Devuelve None si el código
+    no pertenece a la unidad; si no, (estudiante_id, estado, fecha, hora, es_nueva).
+    """
+    estudiante_id = indice_kiosco.resolver(unidad_id, codigo)
+    if estudiante_id is None:
+        return None
+    ahora = timezone.localtime()
+    fecha, hora = ahora.date(), ahora.time().replace(microsecond=0)
+    estado = clasificar(hora, indice_kiosco.hora_entrada(unidad_id, fecha))
+    (estado, hora), nueva = indice_kiosco.recordar(estudiante_id, fecha, (estado, hora))
+    if nueva:
+        marca = AsistenciaGeneral(estudiante_id=estudiante_id, fecha=fecha, estado=estado, hora_entrada=hora)
+        if _config().get('ACTIVO', True):
+            try:
+                anotar([marca])
+            except OSError:
+                logger.exception("No se pudo anotar la marca de kiosco en el diario")
+            cola_kiosco.agregar(marca)
+        else:
+            _vaciar_marcas([marca])
+    return estudiante_id, estado, fecha, hora, nueva
@@ -0,0 +1,127 @@
+# asistencia/licencias.py
+"""
+Reflejo de licencias aprobadas en AsistenciaClase.
+
+• aplicar(): un UPDATE sobre las marcas ya registradas del estudiante en el
+  rango (el estado anterior queda en `estado_previo`) y un INSERT ... ON
+  CONFLICT DO NOTHING con las sesiones de su horario (ClaseHorario) que aún no
+  tienen marca, todas como 'LIC' con la licencia asignada.
+• revertir(): restaura `estado_previo` y borra las filas que creó la licencia,
+  solo donde la marca sigue en 'LIC'; las que el profesor volvió a marcar
+  conservan su estado y solo se desvinculan de la licencia.
+
+La señal post_save de Licencia (asistencia/signals.py) llama a `sincronizar()`
+con la vigencia anterior; como UPDATE y bulk_create no disparan señales, aquí
+mismo se recalculan los resúmenes diarios.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from aplicaciones.calendario.models import ClaseHorario, Feriado
+from aplicaciones.estudiantes.models import Estudiante
+from . import resumen
+from .models import AsistenciaClase
+
+APROBADA, FINALIZADA = 'APR', 'FIN'
+DIAS = ('LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB', 'DOM')  # en el orden de date.weekday()
+
+
+def _dias(desde, hasta):
+    while desde <= hasta:
+        yield desde
+        desde += timedelta(days=1)
+
+
+def sesiones(curso_id, unidad_id, desde, hasta):
+    """{(clase_id, fecha): hora} de las clases del curso según su horario, sin feriados."""
+    horarios = (
+        ClaseHorario.objects.filter(clase__materia_curso__curso_id=curso_id, fecha_inicio__lte=hasta)
+        .filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=desde))
+        .values_list('clase_id', 'horario__dia', 'horario__hora_inicio', 'fecha_inicio', 'fecha_fin')
+    )
+    por_dia = {}
+    for clase_id, dia, hora, inicio, fin in horarios:
+        por_dia.setdefault(dia, []).append((clase_id, hora, inicio, fin))
+    if not por_dia:
+        return {}
+    feriados = set(
+        Feriado.objects.filter(calendario__unidad_educativa_id=unidad_id, fecha__range=(desde, hasta))
+        .values_list('fecha', flat=True)
+    )
+
+    resultado = {}
+    for fecha in _dias(desde, hasta):
+        if fecha in feriados:
+            continue
+        for clase_id, hora, inicio, fin in por_dia.get(DIAS[fecha.weekday()], ()):
+            if inicio <= fecha and (fin is None or fecha <= fin):
+                # Dos bloques de la misma clase en un día: una sola marca, la primera hora
+                clave = (clase_id, fecha)
+                resultado[clave] = min(hora, resultado.get(clave, hora))
+    return resultado
+
+
+def aplicar(licencia):
+    estudiante_id, (_, inicio, fin) = licencia.estudiante_id, licencia.vigencia
+    curso_id, unidad_id = (
+        Estudiante.objects.filter(pk=estudiante_id)
+        .values_list('curso_id', 'curso__paralelo__grado__unidad_educativa_id')
+        .first()
+    ) or (None, None)
+
+    with transaction.atomic():
+        AsistenciaClase.objects.filter(
+            estudiante_id=estudiante_id, fecha__range=(inicio, fin), licencia__isnull=True,
+        ).update(estado_previo=F('estado'), estado='LIC', licencia=licencia)
+        if curso_id is not None:
+            AsistenciaClase.objects.bulk_create(
+                [
+                    AsistenciaClase(
+                        clase_id=clase_id, estudiante_id=estudiante_id, fecha=fecha,
+                        hora=hora, estado='LIC', licencia=licencia,
+                    )
+                    for (clase_id, fecha), hora in sesiones(curso_id, unidad_id, inicio, fin).items()
+                ],
+                ignore_conflicts=True,
+            )
+        resumen.actualizar((estudiante_id, fecha) for fecha in _dias(inicio, fin))
+
+
+def revertir(licencia, desde=None):
+    """Deshace la licencia en AsistenciaClase (solo desde `desde`, si se indica)."""
+    filas = AsistenciaClase.objects.filter(licencia_id=licencia.pk)
+    if desde is not None:
+        filas = filas.filter(fecha__gte=desde)
+
+    with transaction.atomic():
+        fechas = set(filas.values_list('fecha', flat=True))
+        if not fechas:
+            return
+        filas.exclude(estado='LIC').update(estado_previo=None, licencia=None)
+        filas = filas.filter(estado='LIC')
+        filas.filter(estado_previo__isnull=True).delete()
+        filas.update(estado=F('estado_previo'), estado_previo=None, licencia=None)
+        resumen.actualizar((licencia.estudiante_id, fecha) for fecha in fechas)
+
+
+def sincronizar(licencia, anterior):
+    """
+    `anterior` es la vigencia (estado, fecha_inicio, fecha_fin) persistida antes
+    del save, o None si la licencia es nueva.
+
+      • deja de estar aprobada → se revierte (si se finaliza sin cambiar fechas,
+                                 solo desde mañana: los días ya transcurridos quedan)
+      • queda aprobada         → se aplica (con fechas nuevas, tras revertir las anteriores)
+    """
+    if anterior == licencia.vigencia:
+        return
+    if anterior is not None and anterior[0] == APROBADA:
+        if licencia.estado == FINALIZADA and anterior[1:] == licencia.vigencia[1:]:
+            revertir(licencia, desde=timezone.localdate() + timedelta(days=1))
+            return
+        revertir(licencia)
+    if licencia.estado == APROBADA:
+        aplicar(licencia)
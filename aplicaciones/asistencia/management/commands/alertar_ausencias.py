@@ -0,0 +1,15 @@
+# asistencia/management/commands/alertar_ausencias.py
+from django.core.management.base import BaseCommand
+
+from aplicaciones.asistencia.alertas import alertar_ausencias
+
+
+class Command(BaseCommand):
+    help = (
+        "Avisa a los tutores de las inasistencias del día en las unidades cuya hora de corte ya pasó "
+        "(pensado para cron cada pocos minutos por la mañana; repetirlo no duplica avisos)."
+    )
+
+    def handle(self, *args, **opciones):
+        total = alertar_ausencias()
+        self.stdout.write(self.style.SUCCESS(f"Avisos de inasistencia enviados: {total}"))
@@ -0,0 +1,19 @@
+# asistencia/management/commands/detectar_rachas_asistencia.py
+from django.core.management.base import BaseCommand
+
+from aplicaciones.asistencia import rachas
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza AlertaAsistencia (ausencias consecutivas y rachas de asistencia) de los estudiantes "
+        "cuya asistencia general cambió desde la última ejecución."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unidad', type=int, help='Solo los estudiantes de esta unidad educativa.')
+        parser.add_argument('--completo', action='store_true', help='Recalcula a todos los estudiantes, no solo los pendientes.')
+
+    def handle(self, *args, **opciones):
+        total = rachas.detectar(unidad_id=opciones['unidad'], completo=opciones['completo'])
+        self.stdout.write(self.style.SUCCESS(f"Estudiantes revisados: {total}"))
@@ -0,0 +1,15 @@
+# asistencia/management/commands/reconstruir_resumen_asistencia.py
+from django.core.management.base import BaseCommand
+
+from aplicaciones.asistencia import resumen
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera los resúmenes diarios de asistencia (por estudiante y por curso) desde "
+        "AsistenciaGeneral y AsistenciaClase (por ejemplo tras cargas con update(), que no disparan señales)."
+    )
+
+    def handle(self, *args, **opciones):
+        total = resumen.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes diarios reconstruidos: {total}"))
@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 08:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from aplicaciones.asistencia import resumen
+
+
+def poblar_resumenes(apps, schema_editor):
+    resumen.reconstruir(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0005_curso_tutor_materiacurso_profesor'),
+        ('asistencia', '0002_initial'),
+        ('estudiantes', '0002_estudiante_unidad'),
+        ('institucion', '0004_remove_unidadeducativa_admin_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAsistenciaCurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('general_asi', models.PositiveIntegerField(default=0)),
+                ('general_fal', models.PositiveIntegerField(default=0)),
+                ('general_tar', models.PositiveIntegerField(default=0)),
+                ('general_jus', models.PositiveIntegerField(default=0)),
+                ('clase_asi', models.PositiveIntegerField(default=0)),
+                ('clase_fal', models.PositiveIntegerField(default=0)),
+                ('clase_tar', models.PositiveIntegerField(default=0)),
+                ('clase_lic', models.PositiveIntegerField(default=0)),
+                ('fecha', models.DateField()),
+                ('curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_asistencia', to='academico.curso')),
+                ('unidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='institucion.unidadeducativa')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de asistencia (curso)',
+                'verbose_name_plural': 'Resúmenes diarios de asistencia (curso)',
+                'db_table': 'asistencia_resumen_curso',
+                'indexes': [models.Index(fields=['unidad', 'fecha'], name='resumen_curso_unidad_idx')],
+                'constraints': [models.UniqueConstraint(fields=('curso', 'fecha'), name='resumen_curso_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenAsistenciaEstudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('general_asi', models.PositiveIntegerField(default=0)),
+                ('general_fal', models.PositiveIntegerField(default=0)),
+                ('general_tar', models.PositiveIntegerField(default=0)),
+                ('general_jus', models.PositiveIntegerField(default=0)),
+                ('clase_asi', models.PositiveIntegerField(default=0)),
+                ('clase_fal', models.PositiveIntegerField(default=0)),
+                ('clase_tar', models.PositiveIntegerField(default=0)),
+                ('clase_lic', models.PositiveIntegerField(default=0)),
+                ('fecha', models.DateField()),
+                ('curso', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='academico.curso')),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_asistencia', to='estudiantes.estudiante')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de asistencia (estudiante)',
+                'verbose_name_plural': 'Resúmenes diarios de asistencia (estudiante)',
+                'db_table': 'asistencia_resumen_estudiante',
+                'indexes': [models.Index(fields=['curso', 'fecha'], name='resumen_estudiante_curso_idx')],
+                'constraints': [models.UniqueConstraint(fields=('estudiante', 'fecha'), name='resumen_estudiante_dia_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0003_resumen_asistencia'),
+        ('estudiantes', '0002_estudiante_unidad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistenciaclase',
+            name='estado_previo',
+            field=models.CharField(blank=True, choices=[('ASI', 'Presente'), ('FAL', 'Ausente'), ('TAR', 'Tardanza'), ('LIC', 'Con licencia')], max_length=3, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='licencia',
+            index=models.Index(condition=models.Q(('estado', 'APR')), fields=['fecha_inicio', 'fecha_fin', 'estudiante'], name='licencia_aprobada_idx'),
+        ),
+    ]
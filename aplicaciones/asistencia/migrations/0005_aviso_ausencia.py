@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 08:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0004_licencia_aplicada'),
+        ('estudiantes', '0002_estudiante_unidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvisoAusencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avisos_ausencia', to='estudiantes.estudiante')),
+                ('tutor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avisos_ausencia', to='estudiantes.tutor')),
+            ],
+            options={
+                'verbose_name': 'Aviso de ausencia',
+                'verbose_name_plural': 'Avisos de ausencia',
+                'db_table': 'aviso_ausencia',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tutor', 'estudiante'), name='aviso_ausencia_unico')],
+            },
+        ),
+    ]
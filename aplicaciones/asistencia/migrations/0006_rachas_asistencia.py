@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 08:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def marcar_estudiantes_con_asistencia(apps, schema_editor):
+    # La primera detección revisa a todos los que ya tienen marcas
+    AsistenciaGeneral = apps.get_model('asistencia', 'AsistenciaGeneral')
+    RachaPendiente = apps.get_model('asistencia', 'RachaPendiente')
+    ahora = timezone.now()
+    RachaPendiente.objects.bulk_create(
+        [
+            RachaPendiente(estudiante_id=pk, marcado=ahora)
+            for pk in AsistenciaGeneral.objects.order_by().values_list('estudiante_id', flat=True).distinct()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0005_aviso_ausencia'),
+        ('estudiantes', '0002_estudiante_unidad'),
+        ('institucion', '0005_unidad_hora_corte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RachaPendiente',
+            fields=[
+                ('estudiante', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='estudiantes.estudiante')),
+                ('marcado', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Racha pendiente de revisión',
+                'verbose_name_plural': 'Rachas pendientes de revisión',
+                'db_table': 'asistencia_racha_pendiente',
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertaAsistencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('AUS', 'Ausencias consecutivas'), ('RAC', 'Racha de asistencia')], max_length=3)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('dias', models.PositiveSmallIntegerField()),
+                ('vigente', models.BooleanField(default=False)),
+                ('detectada', models.DateTimeField(auto_now_add=True)),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_asistencia', to='estudiantes.estudiante')),
+                ('unidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='institucion.unidadeducativa')),
+            ],
+            options={
+                'verbose_name': 'Alerta de asistencia',
+                'verbose_name_plural': 'Alertas de asistencia',
+                'db_table': 'asistencia_alerta',
+                'indexes': [models.Index(fields=['unidad', 'tipo', 'vigente'], name='alerta_asistencia_unidad_idx')],
+                'constraints': [models.UniqueConstraint(fields=('estudiante', 'tipo', 'fecha_inicio'), name='alerta_asistencia_unica')],
+            },
+        ),
+        migrations.RunPython(marcar_estudiantes_con_asistencia, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from aplicaciones.estudiantes.models import Estudiante, Tutor
-from aplicaciones.academico.models import Clase
+from aplicaciones.academico.models import Clase, Curso
+from aplicaciones.institucion.models import UnidadEducativa
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 class Comportamiento(models.Model):
@@ -35,6 +36,12 @@ class Comportamiento(models.Model):
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.estudiante} ({self.fecha})"
 
+class LicenciaManager(models.Manager):
+    def activas(self, fecha):
+        """Licencias aprobadas que cubren `fecha` (índice parcial licencia_aprobada_idx)."""
+        return self.filter(estado='APR', fecha_inicio__lte=fecha, fecha_fin__gte=fecha)
+
+
 class Licencia(models.Model):
     ESTADOS_LICENCIA = [
         ('SOL', 'Solicitada'),
@@ -74,11 +81,48 @@ class Licencia(models.Model):
         verbose_name_plural = 'Licencias'
         db_table = 'licencia'
         ordering = ['-fecha_inicio']
-    
+        indexes = [
+            models.Index(
+                fields=['fecha_inicio', 'fecha_fin', 'estudiante'],
+                condition=models.Q(estado='APR'),
+                name='licencia_aprobada_idx',
+            ),
+        ]
+
+    objects = LicenciaManager()
+
     def __str__(self):
         return f"Licencia {self.estudiante} ({self.fecha_inicio} a {self.fecha_fin})"
 
-class AsistenciaGeneral(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Vigencia persistida: la señal post_save aplica o revierte según la transición
+        instancia._vigencia_guardada = instancia.vigencia
+        return instancia
+
+    @property
+    def vigencia(self):
+        """(estado, fecha_inicio, fecha_fin) con las fechas normalizadas a date."""
+        fecha = lambda nombre: self._meta.get_field(nombre).to_python(self.__dict__.get(nombre))
+        return (self.__dict__.get('estado'), fecha('fecha_inicio'), fecha('fecha_fin'))
+
+    def save(self, *args, **kwargs):
+        # La licencia y sus marcas en AsistenciaClase se confirman juntas
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._vigencia_guardada = self.vigencia
+
+class ClaveResumenMixin:
+    """Recuerda el (estudiante, fecha) leído de la base; si cambia, se rehace también el resumen anterior."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._clave_guardada = (instancia.__dict__.get('estudiante_id'), instancia.__dict__.get('fecha'))
+        return instancia
+
+class AsistenciaGeneral(ClaveResumenMixin, models.Model):
     ESTADOS_ASISTENCIA = [
         ('ASI', 'Asistió'),
         ('FAL', 'Faltó'),
@@ -110,7 +154,7 @@ class AsistenciaGeneral(models.Model):
     def __str__(self):
         return f"{self.estudiante} - {self.fecha}: {self.get_estado_display()}"
 
-class AsistenciaClase(models.Model):
+class AsistenciaClase(ClaveResumenMixin, models.Model):
     ESTADOS_ASISTENCIA_CLASE = [
         ('ASI', 'Presente'),
         ('FAL', 'Ausente'),
@@ -141,6 +185,13 @@ class AsistenciaClase(models.Model):
         blank=True,
         related_name='asistencias'
     )
+    # Estado reemplazado al aplicar la licencia (NULL: la fila la creó la licencia)
+    estado_previo = models.CharField(
+        max_length=3,
+        choices=ESTADOS_ASISTENCIA_CLASE,
+        null=True,
+        blank=True
+    )
     
     class Meta:
         verbose_name = 'Asistencia por Clase'
@@ -150,4 +201,172 @@ class AsistenciaClase(models.Model):
         ordering = ['-fecha', 'hora']
     
     def __str__(self):
-        return f"{self.estudiante} - {self.clase}: {self.get_estado_display()}"
\ No newline at end of file
+        return f"{self.estudiante} - {self.clase}: {self.get_estado_display()}"
+
+
+class AvisoAusencia(models.Model):
+    """Registro de avisos de inasistencia ya enviados: uno por tutor, estudiante y día."""
+    estudiante = models.ForeignKey(
+        Estudiante,
+        on_delete=models.CASCADE,
+        related_name='avisos_ausencia'
+    )
+    tutor = models.ForeignKey(
+        Tutor,
+        on_delete=models.CASCADE,
+        related_name='avisos_ausencia'
+    )
+    fecha = models.DateField()
+
+    class Meta:
+        verbose_name = 'Aviso de ausencia'
+        verbose_name_plural = 'Avisos de ausencia'
+        db_table = 'aviso_ausencia'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'tutor', 'estudiante'], name='aviso_ausencia_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.estudiante} → {self.tutor} ({self.fecha})"
+
+
+# ──────────────────────────────────────────────────────────────
+#  Resúmenes diarios (los mantiene asistencia/resumen.py)
+# ──────────────────────────────────────────────────────────────
+class ContadoresAsistencia(models.Model):
+    """Marcas por estado: general_* desde AsistenciaGeneral, clase_* desde AsistenciaClase."""
+    general_asi = models.PositiveIntegerField(default=0)
+    general_fal = models.PositiveIntegerField(default=0)
+    general_tar = models.PositiveIntegerField(default=0)
+    general_jus = models.PositiveIntegerField(default=0)
+    clase_asi = models.PositiveIntegerField(default=0)
+    clase_fal = models.PositiveIntegerField(default=0)
+    clase_tar = models.PositiveIntegerField(default=0)
+    clase_lic = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ResumenAsistenciaEstudiante(ContadoresAsistencia):
+    estudiante = models.ForeignKey(
+        Estudiante,
+        on_delete=models.CASCADE,
+        related_name='resumenes_asistencia'
+    )
+    fecha = models.DateField()
+    # Curso del estudiante al momento de la marca
+    curso = models.ForeignKey(
+        Curso,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Resumen diario de asistencia (estudiante)'
+        verbose_name_plural = 'Resúmenes diarios de asistencia (estudiante)'
+        db_table = 'asistencia_resumen_estudiante'
+        constraints = [
+            models.UniqueConstraint(fields=['estudiante', 'fecha'], name='resumen_estudiante_dia_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['curso', 'fecha'], name='resumen_estudiante_curso_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.estudiante} - {self.fecha}"
+
+
+class ResumenAsistenciaCurso(ContadoresAsistencia):
+    curso = models.ForeignKey(
+        Curso,
+        on_delete=models.CASCADE,
+        related_name='resumenes_asistencia'
+    )
+    fecha = models.DateField()
+    unidad = models.ForeignKey(
+        UnidadEducativa,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Resumen diario de asistencia (curso)'
+        verbose_name_plural = 'Resúmenes diarios de asistencia (curso)'
+        db_table = 'asistencia_resumen_curso'
+        constraints = [
+            models.UniqueConstraint(fields=['curso', 'fecha'], name='resumen_curso_dia_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['unidad', 'fecha'], name='resumen_curso_unidad_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.curso} - {self.fecha}"
+
+
+# ──────────────────────────────────────────────────────────────
+#  Rachas de asistencia (las mantiene asistencia/rachas.py)
+# ──────────────────────────────────────────────────────────────
+class AlertaAsistencia(models.Model):
+    """Racha de días consecutivos con marca general: ausencias sin justificar o asistencia perfecta."""
+    TIPOS = [
+        ('AUS', 'Ausencias consecutivas'),
+        ('RAC', 'Racha de asistencia'),
+    ]
+    estudiante = models.ForeignKey(
+        Estudiante,
+        on_delete=models.CASCADE,
+        related_name='alertas_asistencia'
+    )
+    unidad = models.ForeignKey(
+        UnidadEducativa,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    tipo = models.CharField(max_length=3, choices=TIPOS)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    dias = models.PositiveSmallIntegerField()
+    # La racha llega hasta la última marca del estudiante (sigue abierta)
+    vigente = models.BooleanField(default=False)
+    detectada = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Alerta de asistencia'
+        verbose_name_plural = 'Alertas de asistencia'
+        db_table = 'asistencia_alerta'
+        constraints = [
+            models.UniqueConstraint(fields=['estudiante', 'tipo', 'fecha_inicio'], name='alerta_asistencia_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['unidad', 'tipo', 'vigente'], name='alerta_asistencia_unidad_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.estudiante} - {self.get_tipo_display()} ({self.dias} días desde {self.fecha_inicio})"
+
+
+class RachaPendiente(models.Model):
+    """Estudiantes con AsistenciaGeneral modificada desde la última detección de rachas."""
+    estudiante = models.OneToOneField(
+        Estudiante,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+    marcado = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Racha pendiente de revisión'
+        verbose_name_plural = 'Rachas pendientes de revisión'
+        db_table = 'asistencia_racha_pendiente'
+
+    def __str__(self):
+        return f"{self.estudiante} ({self.marcado})"
@@ -0,0 +1,126 @@
+# asistencia/planilla.py
+"""
+Planilla mensual de asistencia de un curso: estudiantes × días hábiles.
+
+Los días hábiles son lunes a viernes del mes, dentro del CalendarioAcademico
+activo de la unidad y sin sus Feriados. La matriz sale de una sola consulta
+que pivotea ResumenAsistenciaEstudiante (una columna por día, agregación
+condicional), así que combina AsistenciaGeneral y AsistenciaClase:
+la marca general manda; sin ella, la de clases (licencia primero).
+"""
+import calendar
+import csv
+from datetime import date, timedelta
+
+from django.db.models import Case, CharField, FilteredRelation, Max, Q, Value, When
+
+from aplicaciones.academico.models import Curso
+from aplicaciones.calendario.models import CalendarioAcademico, Feriado
+from aplicaciones.estudiantes.models import Estudiante
+
+# (campo del resumen, código) en orden de precedencia
+CODIGOS = (
+    ('general_asi', 'A'), ('general_tar', 'T'), ('general_fal', 'F'), ('general_jus', 'J'),
+    ('clase_lic', 'L'), ('clase_asi', 'A'), ('clase_tar', 'T'), ('clase_fal', 'F'),
+)
+LEYENDA = {'A': 'Asistió', 'T': 'Tardanza', 'F': 'Faltó', 'J': 'Falta justificada', 'L': 'Licencia'}
+SIN_MARCA = '.'
+
+
+def dias_habiles(unidad_id, anio, mes):
+    inicio = date(anio, mes, 1)
+    fin = date(anio, mes, calendar.monthrange(anio, mes)[1])
+    calendario = (
+        CalendarioAcademico.objects.filter(unidad_educativa_id=unidad_id, activo=True)
+        .values('pk', 'fecha_inicio', 'fecha_fin')
+        .first()
+    )
+    feriados = set()
+    if calendario is not None:
+        inicio, fin = max(inicio, calendario['fecha_inicio']), min(fin, calendario['fecha_fin'])
+        feriados = set(
+            Feriado.objects.filter(calendario_id=calendario['pk'], fecha__range=(inicio, fin))
+            .values_list('fecha', flat=True)
+        )
+    dias = []
+    while inicio <= fin:
+        if inicio.weekday() < 5 and inicio not in feriados:
+            dias.append(inicio)
+        inicio += timedelta(days=1)
+    return dias
+
+
+def _codigo_del_dia(dia):
+    return Max(Case(
+        *[
+            When(Q(mes__fecha=dia) & Q(**{f'mes__{campo}__gt': 0}), then=Value(codigo))
+            for campo, codigo in CODIGOS
+        ],
+        output_field=CharField(),
+    ))
+
+
+def planilla(curso_id, anio, mes):
+    """
+    {'curso', 'mes', 'dias', 'leyenda', 'estudiantes': [...]} o None si el curso
+    no existe. Cada estudiante trae `codigos` (un carácter por día) y `totales`.
+    """
+    unidad_id = (
+        Curso.objects.filter(pk=curso_id).values_list('paralelo__grado__unidad_educativa_id', flat=True).first()
+    )
+    if unidad_id is None:
+        return None
+    dias = dias_habiles(unidad_id, anio, mes)
+
+    columnas = {f'd{i}': _codigo_del_dia(dia) for i, dia in enumerate(dias)}
+    estudiantes = Estudiante.objects.filter(curso_id=curso_id)
+    if dias:
+        # LEFT JOIN acotado al mes: los estudiantes sin marcas también salen
+        estudiantes = estudiantes.annotate(mes=FilteredRelation(
+            'resumenes_asistencia', condition=Q(resumenes_asistencia__fecha__range=(dias[0], dias[-1])),
+        ))
+    filas = (
+        estudiantes
+        .values('pk', 'rude', 'usuario__nombre', 'usuario__apellido')
+        .annotate(**columnas)
+        .order_by('usuario__apellido', 'usuario__nombre')
+    )
+    resultado = []
+    for fila in filas:
+        codigos = ''.join(fila[columna] or SIN_MARCA for columna in columnas)
+        resultado.append({
+            'id': fila['pk'],
+            'rude': fila['rude'],
+            'nombre': fila['usuario__nombre'],
+            'apellido': fila['usuario__apellido'],
+            'codigos': codigos,
+            'totales': {codigo: codigos.count(codigo) for codigo in LEYENDA},
+        })
+    return {
+        'curso': curso_id,
+        'mes': f'{anio:04d}-{mes:02d}',
+        'dias': dias,
+        'leyenda': LEYENDA,
+        'estudiantes': resultado,
+    }
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def filas_csv(datos):
+    """Genera la planilla como CSV, línea por línea (para StreamingHttpResponse)."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(
+        ['RUDE', 'Apellido', 'Nombre', *(dia.strftime('%d') for dia in datos['dias']), *datos['leyenda']]
+    )
+    for estudiante in datos['estudiantes']:
+        yield escritor.writerow([
+            estudiante['rude'], estudiante['apellido'], estudiante['nombre'],
+            *(codigo.replace(SIN_MARCA, '') for codigo in estudiante['codigos']),
+            *estudiante['totales'].values(),
+        ])
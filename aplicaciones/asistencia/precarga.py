@@ -0,0 +1,104 @@
+# asistencia/precarga.py
+"""
+Todo lo necesario para abrir el pase de lista de una clase en una sola petición:
+resumen de la clase, nómina del curso, marcas de la fecha y licencias activas,
+con cuatro consultas planas (.values()). De las licencias solo viaja la
+vigencia: el motivo no es asunto del pase de lista.
+
+El resultado se cachea por (clase, fecha) en la caché compartida (CACHES), así
+que la invalidación alcanza a todos los procesos. Las escrituras de
+AsistenciaClase y de Licencia lo invalidan al confirmarse (asistencia/signals.py
+y las rutas con bulk_create); los cambios de nómina se reflejan al vencer CACHE_TTL.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from aplicaciones.academico.models import Clase
+from aplicaciones.estudiantes.models import Estudiante
+from .models import AsistenciaClase, Licencia
+
+CLAVE = 'asistencia:precarga:v2:{}:{}'  # v2: sin el motivo de las licencias
+CACHE_TTL = 60 * 10
+
+
+def _clave(clase_id, fecha):
+    return CLAVE.format(clase_id, fecha.isoformat())
+
+
+def precarga(clase_id, fecha):
+    """Datos del pase de lista de `clase_id` en `fecha`, o None si la clase no existe."""
+    clave = _clave(clase_id, fecha)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = construir(clase_id, fecha)
+        if datos is not None:
+            cache.set(clave, datos, CACHE_TTL)
+    return datos
+
+
+def construir(clase_id, fecha):
+    clase = (
+        Clase.objects.filter(pk=clase_id, materia_curso__isnull=False)
+        .values(
+            'id', 'aula__nombre', 'materia_curso__materia__nombre',
+            'materia_curso__curso_id', 'materia_curso__curso__nombre', 'materia_curso__profesor_id',
+        )
+        .first()
+    )
+    if clase is None:
+        return None
+    curso_id = clase['materia_curso__curso_id']
+
+    nomina = (
+        Estudiante.objects.filter(curso_id=curso_id)
+        .order_by('usuario__apellido', 'usuario__nombre')
+        .values_list('pk', 'usuario__nombre', 'usuario__apellido', 'rude')
+    )
+    marcas = (
+        AsistenciaClase.objects.filter(clase_id=clase_id, fecha=fecha)
+        .order_by()
+        .values('estudiante_id', 'estado', 'hora', 'licencia_id')
+    )
+    licencias = (
+        Licencia.objects.activas(fecha).filter(estudiante__curso_id=curso_id)
+        .order_by()
+        .values('id', 'estudiante_id', 'fecha_inicio', 'fecha_fin')
+    )
+    return {
+        'clase': {
+            'id': clase['id'],
+            'materia': clase['materia_curso__materia__nombre'],
+            'curso': curso_id,
+            'curso_nombre': clase['materia_curso__curso__nombre'],
+            'aula': clase['aula__nombre'],
+            'profesor': clase['materia_curso__profesor_id'],
+        },
+        'fecha': fecha,
+        'nomina': [
+            {'id': pk, 'nombre': nombre, 'apellido': apellido, 'rude': rude}
+            for pk, nombre, apellido, rude in nomina
+        ],
+        'marcas': list(marcas),
+        'licencias': list(licencias),
+    }
+
+
+# ── invalidación ──────────────────────────────────────────────
+def invalidar(claves):
+    """Borra la precarga de esos (clase_id, fecha) cuando la transacción se confirma."""
+    claves = [_clave(clase_id, fecha) for clase_id, fecha in set(claves)]
+    if claves:
+        transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def invalidar_estudiante(estudiante_id, rangos):
+    """Todas las clases del curso del estudiante en cada (desde, hasta) de `rangos`."""
+    clases = list(
+        Clase.objects.filter(materia_curso__curso__estudiantes__pk=estudiante_id).values_list('pk', flat=True)
+    )
+    fechas = set()
+    for desde, hasta in rangos:
+        fechas.update(desde + timedelta(days=n) for n in range((hasta - desde).days + 1))
+    invalidar((clase_id, fecha) for clase_id in clases for fecha in fechas)
@@ -0,0 +1,185 @@
+# asistencia/rachas.py
+"""
+Rachas sobre AsistenciaGeneral (gaps-and-islands), por estudiante y en orden de fecha:
+
+• AUS: marcas FAL consecutivas (sin justificar). Una JUS, ASI o TAR corta la racha.
+• RAC: asistencia perfecta, marcas ASI/TAR consecutivas. Cualquier ausencia la corta.
+
+"Consecutivas" se mide en días con marca, así que fines de semana y feriados
+no cortan la racha. Las que alcanzan el mínimo configurado (RACHAS_ASISTENCIA)
+se guardan en AlertaAsistencia.
+
+La detección es incremental: cada escritura de AsistenciaGeneral (señales,
+cargas masivas, kiosco) llama a `marcar()` y `detectar()` solo recalcula a los
+estudiantes pendientes, por lotes. Si la base soporta funciones de ventana, las
+islas salen de una sola consulta (ROW_NUMBER() OVER ...); si no, de una pasada
+en Python sobre las marcas ordenadas.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from aplicaciones.estudiantes.models import Estudiante
+from .models import AlertaAsistencia, AsistenciaGeneral, RachaPendiente
+
+AUSENCIA, RACHA = 'AUS', 'RAC'
+FALTA, PRESENTES = 'FAL', ('ASI', 'TAR')
+
+
+def _config():
+    return getattr(settings, 'RACHAS_ASISTENCIA', {})
+
+
+def _minimos():
+    return {AUSENCIA: _config().get('MIN_AUSENCIAS', 3), RACHA: _config().get('MIN_RACHA', 10)}
+
+
+def _tipo(estado):
+    if estado == FALTA:
+        return AUSENCIA
+    return RACHA if estado in PRESENTES else ''
+
+
+# ── pendientes ────────────────────────────────────────────────
+def marcar(estudiante_ids):
+    """Anota a esos estudiantes para la próxima detección."""
+    ahora = timezone.now()
+    RachaPendiente.objects.bulk_create(
+        [RachaPendiente(estudiante_id=pk, marcado=ahora) for pk in set(estudiante_ids) if pk is not None],
+        update_conflicts=True,
+        unique_fields=['estudiante'],
+        update_fields=['marcado'],
+    )
+
+
+# ── islas ─────────────────────────────────────────────────────
+_SQL_ISLAS = """
+    WITH marcas AS (
+        SELECT estudiante_id, fecha,
+               CASE WHEN estado = %s THEN %s WHEN estado IN (%s, %s) THEN %s ELSE '' END AS tipo,
+               ROW_NUMBER() OVER (PARTITION BY estudiante_id ORDER BY fecha) AS n,
+               MAX(fecha) OVER (PARTITION BY estudiante_id) AS ultima
+        FROM {tabla}
+        WHERE estudiante_id IN ({ids})
+    ),
+    islas AS (
+        SELECT estudiante_id, fecha, tipo, ultima,
+               n - ROW_NUMBER() OVER (PARTITION BY estudiante_id, tipo ORDER BY fecha) AS grupo
+        FROM marcas
+    )
+    SELECT estudiante_id, tipo, MIN(fecha), MAX(fecha), COUNT(*), MAX(fecha) = MAX(ultima)
+    FROM islas
+    WHERE tipo <> ''
+    GROUP BY estudiante_id, tipo, grupo
+    HAVING COUNT(*) >= CASE tipo WHEN %s THEN %s ELSE %s END
+"""
+
+
+def islas_sql(estudiante_ids):
+    """[(estudiante_id, tipo, inicio, fin, dias, vigente)] con funciones de ventana."""
+    minimos = _minimos()
+    sql = _SQL_ISLAS.format(
+        tabla=connection.ops.quote_name(AsistenciaGeneral._meta.db_table),
+        ids=', '.join(['%s'] * len(estudiante_ids)),
+    )
+    params = [
+        FALTA, AUSENCIA, *PRESENTES, RACHA,
+        *estudiante_ids,
+        AUSENCIA, minimos[AUSENCIA], minimos[RACHA],
+    ]
+    # Sin tipo declarado (agregados), SQLite devuelve las fechas como texto
+    fecha = models.DateField().to_python
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            (estudiante_id, tipo, fecha(inicio), fecha(fin), dias, bool(vigente))
+            for estudiante_id, tipo, inicio, fin, dias, vigente in cursor.fetchall()
+        ]
+
+
+def islas_python(estudiante_ids):
+    """Lo mismo que islas_sql(), recorriendo las marcas ordenadas por (estudiante, fecha)."""
+    minimos = _minimos()
+    marcas = (
+        AsistenciaGeneral.objects.filter(estudiante_id__in=estudiante_ids)
+        .order_by('estudiante_id', 'fecha')
+        .values_list('estudiante_id', 'fecha', 'estado')
+    )
+    resultado = []
+    for estudiante_id, filas in groupby(marcas.iterator(), key=itemgetter(0)):
+        filas = list(filas)
+        ultima = filas[-1][1]
+        for tipo, tramo in groupby(filas, key=lambda fila: _tipo(fila[2])):
+            tramo = list(tramo)
+            if tipo and len(tramo) >= minimos[tipo]:
+                inicio, fin = tramo[0][1], tramo[-1][1]
+                resultado.append((estudiante_id, tipo, inicio, fin, len(tramo), fin == ultima))
+    return resultado
+
+
+def islas(estudiante_ids):
+    if connection.features.supports_over_clause:
+        return islas_sql(estudiante_ids)
+    return islas_python(estudiante_ids)
+
+
+# ── alertas ───────────────────────────────────────────────────
+def refrescar(estudiante_ids):
+    """Reemplaza las AlertaAsistencia de esos estudiantes; las que siguen iguales conservan `detectada`."""
+    estudiante_ids = list(estudiante_ids)
+    unidades = dict(Estudiante.objects.filter(pk__in=estudiante_ids).values_list('pk', 'unidad_id'))
+    alertas = [
+        AlertaAsistencia(
+            estudiante_id=estudiante_id, unidad_id=unidades.get(estudiante_id), tipo=tipo,
+            fecha_inicio=inicio, fecha_fin=fin, dias=dias, vigente=vigente,
+        )
+        for estudiante_id, tipo, inicio, fin, dias, vigente in islas(estudiante_ids)
+    ]
+    vigentes = {(alerta.estudiante_id, alerta.tipo, alerta.fecha_inicio) for alerta in alertas}
+
+    with transaction.atomic():
+        obsoletas = [
+            pk for pk, *clave in AlertaAsistencia.objects.filter(estudiante_id__in=estudiante_ids)
+            .values_list('pk', 'estudiante_id', 'tipo', 'fecha_inicio')
+            if tuple(clave) not in vigentes
+        ]
+        if obsoletas:
+            AlertaAsistencia.objects.filter(pk__in=obsoletas).delete()
+        AlertaAsistencia.objects.bulk_create(
+            alertas,
+            update_conflicts=True,
+            unique_fields=['estudiante', 'tipo', 'fecha_inicio'],
+            update_fields=['unidad', 'fecha_fin', 'dias', 'vigente'],
+        )
+    return len(alertas)
+
+
+def detectar(unidad_id=None, completo=False):
+    """
+    Recalcula las rachas de los estudiantes pendientes (de `unidad_id`, o de
+    todas las unidades). Con `completo`, de todos los estudiantes de la unidad.
+    Devuelve cuántos estudiantes revisó.
+    """
+    if completo:
+        estudiantes = Estudiante.objects.all()
+        if unidad_id is not None:
+            estudiantes = estudiantes.filter(unidad_id=unidad_id)
+        marcar(estudiantes.values_list('pk', flat=True))
+
+    # Lo que se marque durante la detección queda para la siguiente
+    corte = timezone.now()
+    pendientes = RachaPendiente.objects.filter(marcado__lte=corte)
+    if unidad_id is not None:
+        pendientes = pendientes.filter(estudiante__unidad_id=unidad_id)
+    ids = list(pendientes.order_by('estudiante_id').values_list('estudiante_id', flat=True))
+
+    lote = _config().get('LOTE', 500)
+    for inicio in range(0, len(ids), lote):
+        parte = ids[inicio:inicio + lote]
+        with transaction.atomic():
+            refrescar(parte)
+            RachaPendiente.objects.filter(estudiante_id__in=parte, marcado__lte=corte).delete()
+    return len(ids)
@@ -0,0 +1,201 @@
+# asistencia/resumen.py
+"""
+Resúmenes diarios de asistencia.
+
+• ResumenAsistenciaEstudiante: una fila por (estudiante, fecha) con las marcas
+  de AsistenciaGeneral y AsistenciaClase de ese día y el curso del estudiante.
+• ResumenAsistenciaCurso: suma de esas filas por (curso, fecha), con la unidad.
+
+Las señales (asistencia/signals.py) y las cargas masivas con bulk_create (que
+no disparan señales) llaman a `actualizar()` con los (estudiante, fecha)
+afectados; `reconstruir()` regenera ambas tablas. `tasas()` solo lee resúmenes.
+
+Cada recálculo bloquea (select_for_update, en orden de pk) las filas de
+Estudiante y luego las de Curso afectadas antes de contar: dos transacciones
+que tocan al mismo estudiante o curso se serializan y la segunda cuenta con lo
+que confirmó la primera, en lugar de pisar el resumen con un conteo viejo.
+"""
+from django.apps import apps as apps_globales
+from django.db import transaction
+from django.db.models import Count, Sum
+
+GENERAL = {'ASI': 'general_asi', 'FAL': 'general_fal', 'TAR': 'general_tar', 'JUS': 'general_jus'}
+CLASE = {'ASI': 'clase_asi', 'FAL': 'clase_fal', 'TAR': 'clase_tar', 'LIC': 'clase_lic'}
+CAMPOS = (*GENERAL.values(), *CLASE.values())
+
+
+def _sumas():
+    return {campo: Sum(campo) for campo in CAMPOS}
+
+
+def _contar(apps, pares=None):
+    """{(estudiante_id, fecha): {campo: n}} leído de las tablas de asistencia."""
+    AsistenciaGeneral = apps.get_model('asistencia', 'AsistenciaGeneral')
+    AsistenciaClase = apps.get_model('asistencia', 'AsistenciaClase')
+    generales = AsistenciaGeneral.objects.all()
+    clases = AsistenciaClase.objects.all()
+    if pares is not None:
+        ids, fechas = {e for e, _ in pares}, {f for _, f in pares}
+        generales = generales.filter(estudiante_id__in=ids, fecha__in=fechas)
+        clases = clases.filter(estudiante_id__in=ids, fecha__in=fechas)
+
+    contadores = {}
+    filas = [
+        (GENERAL, generales.values_list('estudiante_id', 'fecha', 'estado').annotate(n=Count('id')).order_by()),
+        (CLASE, clases.values_list('estudiante_id', 'fecha', 'estado').annotate(n=Count('id')).order_by()),
+    ]
+    for campos, consulta in filas:
+        for estudiante_id, fecha, estado, n in consulta:
+            clave = (estudiante_id, fecha)
+            if estado not in campos or (pares is not None and clave not in pares):
+                continue
+            contadores.setdefault(clave, dict.fromkeys(CAMPOS, 0))[campos[estado]] += n
+    return contadores
+
+
+def _unidades(apps, curso_ids):
+    Curso = apps.get_model('academico', 'Curso')
+    return dict(
+        Curso.objects.filter(pk__in=curso_ids).values_list('pk', 'paralelo__grado__unidad_educativa_id')
+    )
+
+
+# ── mantenimiento incremental ─────────────────────────────────
+def actualizar(pares):
+    """Recalcula los resúmenes de esos (estudiante_id, fecha) y de sus cursos."""
+    ResumenEstudiante = apps_globales.get_model('asistencia', 'ResumenAsistenciaEstudiante')
+    Estudiante = apps_globales.get_model('estudiantes', 'Estudiante')
+    pares = set(pares)
+    if not pares:
+        return
+
+    ids, fechas = {e for e, _ in pares}, {f for _, f in pares}
+    with transaction.atomic():
+        # Las filas existentes conservan el curso con el que se registraron
+        actuales = dict(
+            Estudiante.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'curso_id')
+        )
+        contadores = _contar(apps_globales, pares)
+        anteriores = {
+            (estudiante_id, fecha): (pk, curso_id)
+            for pk, estudiante_id, fecha, curso_id in ResumenEstudiante.objects
+            .filter(estudiante_id__in=ids, fecha__in=fechas)
+            .values_list('pk', 'estudiante_id', 'fecha', 'curso_id')
+            if (estudiante_id, fecha) in pares
+        }
+        cursos = {par: anteriores[par][1] if par in anteriores else actuales.get(par[0]) for par in pares}
+
+        vacios = [anteriores[par][0] for par in pares if par in anteriores and par not in contadores]
+        if vacios:
+            ResumenEstudiante.objects.filter(pk__in=vacios).delete()
+        ResumenEstudiante.objects.bulk_create(
+            [
+                ResumenEstudiante(estudiante_id=e, fecha=f, curso_id=cursos[(e, f)], **conteo)
+                for (e, f), conteo in contadores.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['estudiante', 'fecha'],
+            update_fields=list(CAMPOS),
+        )
+        actualizar_cursos({(cursos[(e, f)], f) for e, f in pares if cursos[(e, f)] is not None})
+
+
+def actualizar_cursos(dias):
+    """Recalcula ResumenAsistenciaCurso para esos (curso_id, fecha)."""
+    ResumenEstudiante = apps_globales.get_model('asistencia', 'ResumenAsistenciaEstudiante')
+    ResumenCurso = apps_globales.get_model('asistencia', 'ResumenAsistenciaCurso')
+    Curso = apps_globales.get_model('academico', 'Curso')
+    dias = set(dias)
+    if not dias:
+        return
+
+    curso_ids, fechas = {c for c, _ in dias}, {f for _, f in dias}
+    with transaction.atomic():
+        list(Curso.objects.select_for_update().filter(pk__in=curso_ids).order_by('pk').values_list('pk'))
+        sumas = {}
+        consulta = (
+            ResumenEstudiante.objects.filter(curso_id__in=curso_ids, fecha__in=fechas)
+            .values('curso_id', 'fecha')
+            .annotate(**_sumas())
+            .order_by()
+        )
+        for fila in consulta:
+            dia = (fila.pop('curso_id'), fila.pop('fecha'))
+            if dia in dias:
+                sumas[dia] = fila
+        vacios = [
+            pk for pk, curso_id, fecha in ResumenCurso.objects
+            .filter(curso_id__in=curso_ids, fecha__in=fechas)
+            .values_list('pk', 'curso_id', 'fecha')
+            if (curso_id, fecha) in dias and (curso_id, fecha) not in sumas
+        ]
+        if vacios:
+            ResumenCurso.objects.filter(pk__in=vacios).delete()
+
+        unidades = _unidades(apps_globales, curso_ids)
+        ResumenCurso.objects.bulk_create(
+            [ResumenCurso(curso_id=c, fecha=f, unidad_id=unidades.get(c), **fila) for (c, f), fila in sumas.items()],
+            update_conflicts=True,
+            unique_fields=['curso', 'fecha'],
+            update_fields=['unidad', *CAMPOS],
+        )
+
+
+def reconstruir(apps=apps_globales):
+    """Regenera ambos resúmenes; cada fila toma el curso actual del estudiante."""
+    ResumenEstudiante = apps.get_model('asistencia', 'ResumenAsistenciaEstudiante')
+    ResumenCurso = apps.get_model('asistencia', 'ResumenAsistenciaCurso')
+    Estudiante = apps.get_model('estudiantes', 'Estudiante')
+
+    cursos = dict(Estudiante.objects.values_list('pk', 'curso_id'))
+    filas = [
+        ResumenEstudiante(estudiante_id=e, fecha=f, curso_id=cursos.get(e), **conteo)
+        for (e, f), conteo in _contar(apps).items()
+    ]
+    with transaction.atomic():
+        ResumenCurso.objects.all().delete()
+        ResumenEstudiante.objects.all().delete()
+        ResumenEstudiante.objects.bulk_create(filas, batch_size=1000)
+
+        sumas = list(
+            ResumenEstudiante.objects.filter(curso__isnull=False)
+            .values('curso_id', 'fecha')
+            .annotate(**_sumas())
+            .order_by()
+        )
+        unidades = _unidades(apps, {fila['curso_id'] for fila in sumas})
+        ResumenCurso.objects.bulk_create(
+            [ResumenCurso(unidad_id=unidades.get(fila['curso_id']), **fila) for fila in sumas],
+            batch_size=1000,
+        )
+    return len(filas)
+
+
+# ── consulta ──────────────────────────────────────────────────
+def _porcentajes(totales, campos):
+    conteos = {estado: totales[campo] or 0 for estado, campo in campos.items()}
+    total = sum(conteos.values())
+    return {
+        'total': total,
+        'conteos': conteos,
+        'tasas': {estado: round(100 * n / total, 2) if total else None for estado, n in conteos.items()},
+    }
+
+
+def tasas(estudiante=None, curso=None, unidad=None, desde=None, hasta=None):
+    """Porcentajes por estado de un estudiante, curso o unidad en [desde, hasta]."""
+    if estudiante is not None:
+        consulta = apps_globales.get_model('asistencia', 'ResumenAsistenciaEstudiante').objects.filter(estudiante_id=estudiante)
+    else:
+        consulta = apps_globales.get_model('asistencia', 'ResumenAsistenciaCurso').objects.all()
+        consulta = consulta.filter(curso_id=curso) if curso is not None else consulta.filter(unidad_id=unidad)
+    if desde:
+        consulta = consulta.filter(fecha__gte=desde)
+    if hasta:
+        consulta = consulta.filter(fecha__lte=hasta)
+
+    totales = consulta.aggregate(**_sumas())
+    return {
+        'general': _porcentajes(totales, GENERAL),
+        'clases': _porcentajes(totales, CLASE),
+    }
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import (
     Comportamiento,
@@ -5,8 +6,11 @@ from .models import (
     AsistenciaGeneral,
     AsistenciaClase
 )
+from aplicaciones.estudiantes.models import Estudiante
 from aplicaciones.estudiantes.serializers import EstudianteSerializer, TutorSerializer
+from aplicaciones.academico.models import Clase
 from aplicaciones.academico.serializers import ClaseSerializer
+from . import precarga, rachas, resumen
 
 # Serializadores de lectura (anidados)
 class ComportamientoSerializer(serializers.ModelSerializer):
@@ -59,12 +63,134 @@ class CreateLicenciaSerializer(serializers.ModelSerializer):
         model = Licencia
         fields = '__all__'
 
+class AsistenciaGeneralListSerializer(serializers.ListSerializer):
+    """
+    Carga masiva de asistencia general (create con many=True).
+    Resuelve todos los estudiantes con un solo in_bulk, verifica (estudiante, fecha)
+    del lote con una sola consulta y guarda con bulk_create. Con
+    context['actualizar'] los duplicados se sobrescriben (ON CONFLICT DO UPDATE).
+    """
+
+    def to_internal_value(self, data):
+        # Tras la validación por ítem (sin consultas), los chequeos de lote; los
+        # errores quedan alineados con cada fila, como los de ListSerializer
+        attrs = super().to_internal_value(data)
+        errores = []
+        pares = set()
+        for item in attrs:
+            par = (item['estudiante_id'], item['fecha'])
+            errores.append({'non_field_errors': ['Registro repetido en el lote.']} if par in pares else {})
+            pares.add(par)
+
+        ids = {estudiante_id for estudiante_id, _ in pares}
+        existentes = Estudiante.objects.in_bulk(ids)
+        for i, item in enumerate(attrs):
+            if item['estudiante_id'] not in existentes:
+                errores[i].setdefault('estudiante', []).append(f"Estudiante {item['estudiante_id']} no existe.")
+
+        if not self.context.get('actualizar'):
+            registrados = set(
+                AsistenciaGeneral.objects
+                .filter(estudiante_id__in=ids, fecha__in={fecha for _, fecha in pares})
+                .values_list('estudiante_id', 'fecha')
+            )
+            for i, item in enumerate(attrs):
+                if (item['estudiante_id'], item['fecha']) in registrados:
+                    errores[i].setdefault('non_field_errors', []).append('Ya existe asistencia para ese estudiante y fecha.')
+
+        if any(errores):
+            raise serializers.ValidationError(errores)
+        return attrs
+
+    def create(self, validated_data):
+        filas = [AsistenciaGeneral(**item) for item in validated_data]
+        opciones = {}
+        if self.context.get('actualizar'):
+            opciones = dict(
+                update_conflicts=True,
+                unique_fields=['estudiante', 'fecha'],
+                update_fields=['estado', 'hora_entrada', 'hora_salida', 'observaciones'],
+            )
+        with transaction.atomic():
+            filas = AsistenciaGeneral.objects.bulk_create(filas, batch_size=1000, **opciones)
+            # bulk_create no dispara señales
+            resumen.actualizar({(fila.estudiante_id, fila.fecha) for fila in filas})
+            rachas.marcar(fila.estudiante_id for fila in filas)
+        return filas
+
+
 class CreateAsistenciaGeneralSerializer(serializers.ModelSerializer):
     class Meta:
         model = AsistenciaGeneral
         fields = '__all__'
+        list_serializer_class = AsistenciaGeneralListSerializer
+
+    @property
+    def _en_lote(self):
+        return isinstance(self.parent, serializers.ListSerializer)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self._en_lote:
+            # En lote el estudiante se valida para todo el conjunto en la lista
+            fields['estudiante'] = serializers.IntegerField(source='estudiante_id')
+        return fields
+
+    def get_validators(self):
+        return [] if self._en_lote else super().get_validators()
 
 class CreateAsistenciaClaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = AsistenciaClase
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+# Pase de lista: toda la clase en un solo upsert
+class MarcaAsistenciaSerializer(serializers.Serializer):
+    estudiante = serializers.IntegerField()
+    estado = serializers.ChoiceField(choices=AsistenciaClase.ESTADOS_ASISTENCIA_CLASE)
+
+
+class PaseListaSerializer(serializers.Serializer):
+    clase = serializers.PrimaryKeyRelatedField(queryset=Clase.objects.select_related('materia_curso'))
+    fecha = serializers.DateField()
+    hora = serializers.TimeField()
+    marcas = MarcaAsistenciaSerializer(many=True, allow_empty=False)
+
+    def validate(self, data):
+        ids = [marca['estudiante'] for marca in data['marcas']]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError({'marcas': 'Hay estudiantes repetidos en el pase de lista.'})
+
+        materia_curso = data['clase'].materia_curso
+        if materia_curso is None:
+            raise serializers.ValidationError({'clase': 'La clase no está asociada a ninguna materia de curso.'})
+        inscritos = set(
+            Estudiante.objects.filter(curso_id=materia_curso.curso_id, pk__in=ids).values_list('pk', flat=True)
+        )
+        ajenos = [pk for pk in ids if pk not in inscritos]
+        if ajenos:
+            raise serializers.ValidationError({'marcas': f'Estudiantes que no pertenecen al curso: {ajenos}'})
+        return data
+
+    def create(self, validated_data):
+        """Un único INSERT ... ON CONFLICT (clase, estudiante, fecha) DO UPDATE."""
+        filas = [
+            AsistenciaClase(
+                clase=validated_data['clase'],
+                estudiante_id=marca['estudiante'],
+                fecha=validated_data['fecha'],
+                hora=validated_data['hora'],
+                estado=marca['estado'],
+            )
+            for marca in validated_data['marcas']
+        ]
+        with transaction.atomic():
+            filas = AsistenciaClase.objects.bulk_create(
+                filas,
+                update_conflicts=True,
+                unique_fields=['clase', 'estudiante', 'fecha'],
+                update_fields=['hora', 'estado'],
+            )
+            resumen.actualizar({(fila.estudiante_id, fila.fecha) for fila in filas})
+            precarga.invalidar([(validated_data['clase'].pk, validated_data['fecha'])])
+        return filas
@@ -0,0 +1,97 @@
+# asistencia/signals.py
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import licencias, precarga, rachas, resumen
+from .kiosco import indice_kiosco
+from .models import AsistenciaGeneral, AsistenciaClase, Licencia
+
+
+def _fecha(instance):
+    # La instancia conserva lo asignado (p. ej. '2025-03-10'); los resúmenes comparan con date
+    return instance._meta.get_field('fecha').to_python(instance.fecha)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Resúmenes diarios de asistencia
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender=AsistenciaGeneral)
+@receiver(post_delete, sender=AsistenciaGeneral)
+@receiver(post_save, sender=AsistenciaClase)
+@receiver(post_delete, sender=AsistenciaClase)
+def actualizar_resumen(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pares = {(instance.estudiante_id, _fecha(instance)), getattr(instance, '_clave_guardada', (None, None))}
+    resumen.actualizar(par for par in pares if None not in par)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Rachas de asistencia (pendientes para rachas.detectar)
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender=AsistenciaGeneral)
+@receiver(post_delete, sender=AsistenciaGeneral)
+def marcar_racha(sender, instance, raw=False, origin=None, **kwargs):
+    # Si el borrado viene en cascada desde Estudiante/Usuario, el estudiante (y su
+    # RachaPendiente) también se va: volver a marcarlo dejaría una fila huérfana
+    if raw or (origin is not None and getattr(origin, 'model', type(origin)) is not AsistenciaGeneral):
+        return
+    rachas.marcar([instance.estudiante_id, getattr(instance, '_clave_guardada', (None, None))[0]])
+
+
+# ──────────────────────────────────────────────────────────────
+#  Precarga del pase de lista (caché por clase y fecha)
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender=AsistenciaClase)
+@receiver(post_delete, sender=AsistenciaClase)
+def invalidar_precarga(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    precarga.invalidar([(instance.clase_id, _fecha(instance))])
+
+
+# ──────────────────────────────────────────────────────────────
+#  Licencias aprobadas → AsistenciaClase 'LIC'
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender=Licencia)
+def sincronizar_licencia(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_vigencia_guardada', None)
+    if anterior == instance.vigencia:
+        return
+    licencias.sincronizar(instance, anterior)
+    # Las licencias activas también forman parte de la precarga
+    rangos = {instance.vigencia[1:], *([anterior[1:]] if anterior else [])}
+    precarga.invalidar_estudiante(instance.estudiante_id, rangos)
+
+
+@receiver(pre_delete, sender=Licencia)
+def revertir_licencia(sender, instance, **kwargs):
+    # Con SET_NULL las marcas quedarían como 'LIC' sin licencia
+    licencias.revertir(instance)
+    precarga.invalidar_estudiante(instance.estudiante_id, [instance.vigencia[1:]])
+
+
+# ──────────────────────────────────────────────────────────────
+#  Índice del kiosco (códigos y horarios por unidad)
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender='estudiantes.Estudiante')
+@receiver(post_delete, sender='estudiantes.Estudiante')
+@receiver(post_save, sender='calendario.Horario')
+@receiver(post_delete, sender='calendario.Horario')
+@receiver(post_save, sender='calendario.ClaseHorario')
+@receiver(post_delete, sender='calendario.ClaseHorario')
+def invalidar_indice_kiosco(sender, raw=False, **kwargs):
+    if raw:
+        return
+    indice_kiosco.programar_invalidacion()
+
+
+@receiver(post_save, sender='usuarios.Usuario')
+def invalidar_indice_kiosco_ci(sender, raw=False, update_fields=None, **kwargs):
+    # El login guarda solo last_login; no hace falta recargar el índice
+    if raw or (update_fields is not None and 'ci' not in update_fields):
+        return
+    indice_kiosco.programar_invalidacion()
+
@@ -1,3 +1,299 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.utils import timezone
+
+from aplicaciones.academico.models import Clase, Curso, Grado, Materia, MateriaCurso, Paralelo
+from aplicaciones.calendario.models import CalendarioAcademico, ClaseHorario, Feriado, Horario, TipoFeriado, TipoHorario
+from aplicaciones.estudiantes.models import Estudiante, Tutor, TutorEstudiante
+from aplicaciones.institucion.models import Aula, UnidadEducativa
+from aplicaciones.usuarios.models import Accion, ModeloPermitido, MultiToken, Notificacion, PermisoRol, SuperAdmin, Usuario
+from aplicaciones.usuarios.tests import DatosInstitucionMixin
+from . import alertas, kiosco, precarga, rachas, resumen
+from .models import AlertaAsistencia, AsistenciaClase, AsistenciaGeneral, Licencia, RachaPendiente, ResumenAsistenciaCurso, ResumenAsistenciaEstudiante
+
+
+class AsistenciaMasivaTests(DatosInstitucionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.unidad = self._unidad("U1")
+        grado = Grado.objects.create(unidad_educativa=self.unidad, nivel_educativo="PRI")
+        self.curso = Curso.objects.create(paralelo=Paralelo.objects.create(grado=grado, letra="A"), nombre="1A")
+        materia = MateriaCurso.objects.create(curso=self.curso, materia=Materia.objects.create(nombre="Mat"))
+        self.clase = Clase.objects.create(materia_curso=materia, aula=Aula.objects.create(nombre="A1", capacidad=40))
+        self.estudiantes = [
+            Estudiante.objects.create(usuario=self._usuario(f"est{i}"), rude=f"R{i}", curso=self.curso).pk
+            for i in range(3)
+        ]
+        self.ajeno = Estudiante.objects.create(usuario=self._usuario("ajeno"), rude="RX").pk
+        admin = self._usuario("admin")
+        SuperAdmin.objects.create(usuario=admin)
+        token = MultiToken.objects.emitir(admin, device_name="test")
+        self.cliente = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.url = "/asistencia/asistencias-clases/pase-lista/"
+
+    def _cliente(self, usuario_id):
+        token = MultiToken.objects.emitir(Usuario.objects.get(pk=usuario_id), device_name="test")
+        return Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def _pase(self, estados):
+        cuerpo = {
+            "clase": self.clase.pk, "fecha": "2025-03-10", "hora": "08:00",
+            "marcas": [{"estudiante": pk, "estado": estado} for pk, estado in estados.items()],
+        }
+        return self.cliente.post(self.url, cuerpo, content_type="application/json")
+
+    def test_pase_lista_es_idempotente(self):
+        respuesta = self._pase({pk: "ASI" for pk in self.estudiantes})
+        self.assertEqual((respuesta.status_code, respuesta.json()["registradas"]), (200, 3))
+
+        respuesta = self._pase({self.estudiantes[0]: "FAL", self.estudiantes[1]: "ASI"})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(
+            dict(AsistenciaClase.objects.values_list('estudiante_id', 'estado')),
+            {self.estudiantes[0]: "FAL", self.estudiantes[1]: "ASI", self.estudiantes[2]: "ASI"},
+        )
+
+        respuesta = self._pase({self.ajeno: "ASI"})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(AsistenciaClase.objects.count(), 3)
+
+    def test_carga_masiva_de_asistencia_general(self):
+        url = "/asistencia/asistencias-generales/crear/"
+        lote = [{"estudiante": pk, "fecha": "2025-03-10", "estado": "ASI"} for pk in self.estudiantes]
+        respuesta = self.cliente.post(url, lote, content_type="application/json")
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(AsistenciaGeneral.objects.count(), 3)
+
+        lote[0]["estado"] = "TAR"
+        respuesta = self.cliente.post(url, lote + [{"estudiante": 0, "fecha": "2025-03-10", "estado": "ASI"}], content_type="application/json")
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(len(respuesta.json()), 4)
+
+        respuesta = self.cliente.post(f"{url}?actualizar=1", lote, content_type="application/json")
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(AsistenciaGeneral.objects.get(estudiante_id=self.estudiantes[0]).estado, "TAR")
+
+    def test_resumenes_diarios_y_tasas(self):
+        AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[0], fecha="2025-03-10", estado="ASI")
+        marca = AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[1], fecha="2025-03-10", estado="ASI")
+        marca.estado = "FAL"
+        marca.save()
+        self._pase({self.estudiantes[0]: "ASI", self.estudiantes[1]: "LIC"})
+        AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[2], fecha="2025-03-11", estado="TAR").delete()
+
+        url = "/asistencia/asistencias-generales/tasas/"
+        datos = self.cliente.get(url, {"curso": self.curso.pk, "desde": "2025-03-01", "hasta": "2025-03-31"}).json()
+        self.assertEqual(datos["general"]["conteos"], {"ASI": 1, "FAL": 1, "TAR": 0, "JUS": 0})
+        self.assertEqual(datos["clases"]["tasas"], {"ASI": 50.0, "FAL": 0.0, "TAR": 0.0, "LIC": 50.0})
+        self.assertEqual(self.cliente.get(url, {"unidad": self.unidad.pk}).json()["general"], datos["general"])
+        datos = self.cliente.get(url, {"estudiante": self.estudiantes[1]}).json()
+        self.assertEqual((datos["general"]["tasas"]["FAL"], datos["clases"]["total"]), (100.0, 1))
+        self.assertEqual(self.cliente.get(url, {"curso": self.curso.pk, "unidad": self.unidad.pk}).status_code, 400)
+
+        filas = lambda: (
+            set(ResumenAsistenciaEstudiante.objects.values_list('estudiante_id', 'fecha', 'curso_id', *resumen.CAMPOS)),
+            set(ResumenAsistenciaCurso.objects.values_list('curso_id', 'fecha', 'unidad_id', *resumen.CAMPOS)),
+        )
+        esperadas = filas()
+        call_command('reconstruir_resumen_asistencia', stdout=StringIO())
+        self.assertEqual(filas(), esperadas)
+
+    def test_licencia_aprobada_se_refleja_en_clases(self):
+        tipo = TipoHorario.objects.create(nombre="Regular", turno="MAÑANA")
+        for dia in ("LUN", "MIE"):
+            horario = Horario.objects.create(tipo=tipo, hora_inicio="08:00", hora_fin="09:00", dia=dia)
+            ClaseHorario.objects.create(clase=self.clase, horario=horario, fecha_inicio="2025-01-01")
+        self._pase({self.estudiantes[0]: "FAL"})  # lunes 2025-03-10
+        marcas = lambda: set(AsistenciaClase.objects.values_list('fecha', 'estado', 'licencia_id'))
+
+        licencia = Licencia.objects.create(
+            estudiante_id=self.estudiantes[0], fecha_inicio="2025-03-10", fecha_fin="2025-03-13", motivo="Salud",
+        )
+        licencia = Licencia.objects.get(pk=licencia.pk)
+        licencia.estado = "APR"
+        licencia.save()
+        self.assertEqual(marcas(), {
+            (date(2025, 3, 10), "LIC", licencia.pk), (date(2025, 3, 12), "LIC", licencia.pk),
+        })
+        plantilla = self.cliente.get(
+            "/asistencia/asistencias-clases/pase-lista/", {"clase": self.clase.pk, "fecha": "2025-03-12"},
+        ).json()
+        self.assertEqual(
+            [(m["estudiante"], m["estado"]) for m in plantilla["marcas"]],
+            [(self.estudiantes[0], "LIC"), (self.estudiantes[1], None), (self.estudiantes[2], None)],
+        )
+
+        respuesta = self._cliente(self.estudiantes[1]).get("/asistencia/asistencias-clases/pase-lista/", {"clase": self.clase.pk, "fecha": "2025-03-12"})
+        self.assertEqual(respuesta.status_code, 403)
+
+        # El profesor vuelve a marcar el lunes: al rechazarse la licencia esa marca se respeta
+        self._pase({self.estudiantes[0]: "ASI"})
+        licencia.estado = "REC"
+        licencia.save()
+        self.assertEqual(marcas(), {(date(2025, 3, 10), "ASI", None)})
+        self.assertEqual(ResumenAsistenciaEstudiante.objects.get().clase_asi, 1)
+
+    def test_precarga_cacheada_e_invalidada_por_escrituras(self):
+        url = "/asistencia/asistencias-clases/precarga/"
+        parametros = {"clase": self.clase.pk, "fecha": "2025-03-10"}
+        datos = self.cliente.get(url, parametros).json()
+        self.assertEqual([e["rude"] for e in datos["nomina"]], ["R0", "R1", "R2"])
+        self.assertEqual((datos["marcas"], datos["licencias"]), ([], []))
+        with self.assertNumQueries(0):
+            precarga.precarga(self.clase.pk, date(2025, 3, 10))
+        self.assertEqual(self._cliente(self.estudiantes[0]).get(url, parametros).status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._pase({self.estudiantes[0]: "TAR"})
+        datos = self.cliente.get(url, parametros).json()
+        self.assertEqual(
+            [(m["estudiante_id"], m["estado"]) for m in datos["marcas"]], [(self.estudiantes[0], "TAR")],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Licencia.objects.create(
+                estudiante_id=self.estudiantes[1], fecha_inicio="2025-03-10", fecha_fin="2025-03-10", motivo="Salud", estado="APR",
+            )
+        licencias = self.cliente.get(url, parametros).json()["licencias"]
+        self.assertEqual([(l["estudiante_id"], "motivo" in l) for l in licencias], [(self.estudiantes[1], False)])
+
+    def test_kiosco_resuelve_codigos_en_memoria(self):
+        Estudiante.objects.filter(pk__in=self.estudiantes).update(unidad=self.unidad)
+        # El índice y las marcas del día viven en el proceso: sobreviven al rollback de otros tests
+        kiosco.indice_kiosco.limpiar()
+        url = "/asistencia/asistencias-generales/kiosco/"
+        respuesta = self.cliente.post(url, {"codigo": "R1", "unidad": self.unidad.pk})
+        self.assertEqual((respuesta.status_code, respuesta.json()["estado"]), (202, "ASI"))
+
+        ci = Usuario.objects.get(pk=self.estudiantes[1]).ci
+        with self.assertNumQueries(0):
+            self.assertFalse(kiosco.registrar(self.unidad.pk, ci)[-1])
+        self.assertEqual(self.cliente.post(url, {"codigo": "R9", "unidad": self.unidad.pk}).status_code, 404)
+
+        # Fuera del superadmin, la unidad es siempre la propia
+        with self.captureOnCommitCallbacks(execute=True):
+            PermisoRol.objects.create(
+                rol=self.rol, modelo=ModeloPermitido.objects.create(nombre="asistenciageneral"),
+                accion=Accion.objects.create(nombre="add"),
+            )
+        otro = self._cliente(self.estudiantes[0])
+        self.assertEqual(otro.post(url, {"codigo": "R1", "unidad": self._unidad("U2").pk}).status_code, 403)
+        self.assertEqual(otro.post(url, {"codigo": "R1"}).json()["repetida"], True)
+        self.assertEqual(AsistenciaGeneral.objects.get().estudiante_id, self.estudiantes[1])
+
+        self.assertEqual(kiosco.clasificar(time(8, 10), time(8, 0)), "ASI")
+        self.assertEqual(kiosco.clasificar(time(8, 11), time(8, 0)), "TAR")
+
+    def test_kiosco_recupera_el_diario_y_olvida_marcas_perdidas(self):
+        hoy = timezone.localdate()
+        marca = lambda i: AsistenciaGeneral(estudiante_id=self.estudiantes[i], fecha=hoy, estado="ASI", hora_entrada=time(7, 55))
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "kiosco.jsonl")
+            with self.settings(KIOSCO_ASISTENCIA={'DIARIO': ruta}):
+                # Marca aceptada por un proceso que cayó antes de vaciar su cola
+                kiosco.anotar([marca(0)])
+                with open(ruta, "a", encoding="utf-8") as archivo:
+                    archivo.write("{no es json\n")
+                with self.assertLogs("aplicaciones.asistencia.kiosco", "ERROR"):
+                    kiosco._vaciar_cola([marca(1), marca(0)])
+                self.assertFalse(os.path.exists(ruta))
+                with open(f"{ruta}.descartadas", encoding="utf-8") as archivo:
+                    self.assertEqual(archivo.read(), "{no es json\n")
+        self.assertEqual(
+            set(AsistenciaGeneral.objects.values_list('estudiante_id', 'hora_entrada')),
+            {(self.estudiantes[0], time(7, 55)), (self.estudiantes[1], time(7, 55))},
+        )
+
+        kiosco.indice_kiosco.limpiar()
+        self.assertTrue(kiosco.indice_kiosco.recordar(self.estudiantes[2], hoy, ("ASI", time(8, 0)))[1])
+        with self.assertLogs("aplicaciones.asistencia.kiosco", "ERROR"):
+            kiosco._respaldo_marcas([marca(2)])
+        self.assertTrue(kiosco.indice_kiosco.recordar(self.estudiantes[2], hoy, ("ASI", time(8, 5)))[1])
+
+    def test_avisos_de_ausencia_tras_la_hora_de_corte(self):
+        Estudiante.objects.filter(pk__in=self.estudiantes).update(unidad=self.unidad)
+        UnidadEducativa.objects.filter(pk=self.unidad.pk).update(hora_corte_asistencia=time(9, 0))
+        tutores = []
+        for i, estudiante_id in enumerate(self.estudiantes):
+            tutor = Tutor.objects.create(usuario=self._usuario(f"tut{i}"))
+            TutorEstudiante.objects.create(tutor=tutor, estudiante_id=estudiante_id)
+            tutores.append(tutor.pk)
+        AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[0], fecha=date(2025, 3, 10), estado="TAR")
+        Licencia.objects.create(
+            estudiante_id=self.estudiantes[2], fecha_inicio=date(2025, 3, 10), fecha_fin=date(2025, 3, 10),
+            motivo="Salud", estado="APR",
+        )
+
+        lunes = lambda hora: timezone.make_aware(datetime.combine(date(2025, 3, 10), hora))
+        self.assertEqual(alertas.alertar_ausencias(lunes(time(8, 30))), 0)
+        self.assertEqual(alertas.alertar_ausencias(lunes(time(9, 30))), 1)
+        self.assertEqual(alertas.alertar_ausencias(lunes(time(9, 45))), 0)
+        self.assertEqual(
+            list(Notificacion.objects.values_list('usuario_id', 'tipo')), [(tutores[1], "ausencia")],
+        )
+
+    def test_planilla_mensual_del_curso(self):
+        calendario = CalendarioAcademico.objects.create(
+            unidad_educativa=self.unidad, año=2025, fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 12, 15), activo=True,
+        )
+        Feriado.objects.create(
+            calendario=calendario, tipo=TipoFeriado.objects.create(nombre="Nacional"), nombre="Carnaval", fecha=date(2025, 3, 4),
+        )
+        self._pase({self.estudiantes[0]: "FAL", self.estudiantes[1]: "FAL"})
+        AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[0], fecha=date(2025, 3, 10), estado="ASI")
+        AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[1], fecha=date(2025, 3, 11), estado="TAR")
+
+        url = f"/asistencia/asistencias-generales/planilla/?curso={self.curso.pk}&mes=2025-03"
+        datos = self.cliente.get(url).json()
+        self.assertEqual(len(datos["dias"]), 20)
+        self.assertEqual(datos["dias"][:5], ["2025-03-03", "2025-03-05", "2025-03-06", "2025-03-07", "2025-03-10"])
+        filas = {fila["id"]: fila for fila in datos["estudiantes"]}
+        self.assertEqual(filas[self.estudiantes[0]]["codigos"][3:6], ".A.")
+        self.assertEqual(filas[self.estudiantes[1]]["codigos"][3:6], ".FT")
+        self.assertEqual(filas[self.estudiantes[2]]["codigos"], "." * 20)
+        self.assertEqual(filas[self.estudiantes[1]]["totales"], {"A": 0, "T": 1, "F": 1, "J": 0, "L": 0})
+
+        respuesta = self.cliente.get(f"{url}&formato=csv")
+        self.assertEqual(respuesta["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(len(b"".join(respuesta.streaming_content).decode().splitlines()), 4)
+        for mes in ("2025-13", "0000-03", "9999-12", "2025-03-01"):
+            self.assertEqual(self.cliente.get(url.replace("2025-03", mes)).status_code, 400)
+
+    def test_rachas_de_asistencia_incrementales(self):
+        Estudiante.objects.filter(pk__in=self.estudiantes).update(unidad=self.unidad)
+        dias = [dia for dia in (date(2025, 3, 3) + timedelta(days=n) for n in range(12)) if dia.weekday() < 5]
+        for dia, estado in zip(dias, ["FAL", "FAL", "FAL", "JUS", "FAL", "FAL"]):
+            AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[0], fecha=dia, estado=estado)
+        for dia in dias:
+            AsistenciaGeneral.objects.create(estudiante_id=self.estudiantes[1], fecha=dia, estado="ASI")
+
+        self.assertEqual(rachas.detectar(self.unidad.pk), 2)
+        self.assertEqual(
+            set(AlertaAsistencia.objects.values_list('estudiante_id', 'tipo', 'fecha_inicio', 'dias', 'vigente')),
+            {(self.estudiantes[0], "AUS", dias[0], 3, False), (self.estudiantes[1], "RAC", dias[0], 10, True)},
+        )
+        self.assertEqual(sorted(rachas.islas_sql(self.estudiantes)), sorted(rachas.islas_python(self.estudiantes)))
+
+        justificada = AsistenciaGeneral.objects.get(estudiante_id=self.estudiantes[0], fecha=dias[3])
+        justificada.estado = "FAL"
+        justificada.save()
+        self.assertEqual(rachas.detectar(self.unidad.pk), 1)
+        self.assertEqual(
+            list(AlertaAsistencia.objects.filter(estudiante_id=self.estudiantes[0]).values_list('dias', 'vigente')),
+            [(6, True)],
+        )
+        self.assertEqual(rachas.detectar(self.unidad.pk), 0)
+
+        # Borrar al estudiante (o su usuario) arrastra sus marcas sin volver a dejarlo pendiente
+        AsistenciaGeneral.objects.filter(estudiante_id=self.estudiantes[0]).delete()
+        Estudiante.objects.get(pk=self.estudiantes[1]).delete()
+        Usuario.objects.get(pk=self.estudiantes[2]).delete()
+        self.assertEqual(list(RachaPendiente.objects.values_list('estudiante_id', flat=True)), [self.estudiantes[0]])
+        self.assertEqual(rachas.detectar(self.unidad.pk), 1)
@@ -1,6 +1,10 @@
+from datetime import MAXYEAR, MINYEAR
+
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from .models import (
     Comportamiento,
     Licencia,
@@ -15,12 +19,17 @@ from .serializers import (
     CreateComportamientoSerializer,
     CreateLicenciaSerializer,
     CreateAsistenciaGeneralSerializer,
-    CreateAsistenciaClaseSerializer
+    CreateAsistenciaClaseSerializer,
+    PaseListaSerializer
 )
 from aplicaciones.usuarios.permissions import PermisoPorRol, PermisoPorPuesto, PermisoEstudianteView
 from aplicaciones.usuarios.authentication import MultiTokenAuthentication
+from aplicaciones.usuarios.perfil import obtener_perfil
+from aplicaciones.usuarios.visibilidad import VisibilidadEstudianteMixin, puede_ver
+from aplicaciones.calendario.models import Periodo
+from . import kiosco, planilla, precarga, resumen
 
-class ComportamientoViewSet(viewsets.ModelViewSet):
+class ComportamientoViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = Comportamiento.objects.select_related('estudiante').all()
     filterset_fields = ['estudiante', 'tipo', 'fecha']
     search_fields = ['descripcion', 'estudiante__usuario__nombre']
@@ -53,7 +62,7 @@ class ComportamientoViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         return self.destroy(request, pk=pk)
 
-class LicenciaViewSet(viewsets.ModelViewSet):
+class LicenciaViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = Licencia.objects.select_related('estudiante', 'tutor').all()
     filterset_fields = ['estudiante', 'tutor', 'estado', 'fecha_inicio', 'fecha_fin']
     search_fields = ['motivo', 'estudiante__usuario__nombre', 'tutor__usuario__nombre']
@@ -86,7 +95,7 @@ class LicenciaViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         return self.destroy(request, pk=pk)
 
-class AsistenciaGeneralViewSet(viewsets.ModelViewSet):
+class AsistenciaGeneralViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = AsistenciaGeneral.objects.select_related('estudiante').all()
     filterset_fields = ['estudiante', 'estado', 'fecha']
     search_fields = ['estudiante__usuario__nombre']
@@ -95,10 +104,16 @@ class AsistenciaGeneralViewSet(viewsets.ModelViewSet):
     ordering_fields = ['fecha']
 
     def get_serializer_class(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in ['create', 'update', 'partial_update', 'crear', 'actualizar']:
             return CreateAsistenciaGeneralSerializer
         return AsistenciaGeneralSerializer
 
+    def get_serializer_context(self):
+        contexto = super().get_serializer_context()
+        # ?actualizar=1 en cargas masivas: sobrescribe (estudiante, fecha) existentes
+        contexto['actualizar'] = self.request.query_params.get('actualizar') in ('1', 'true')
+        return contexto
+
     @action(detail=False, methods=['get'], url_path='listar')
     def listar(self, request):
         return self.list(request)
@@ -118,21 +133,125 @@ class AsistenciaGeneralViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['delete'], url_path='eliminar')
     def eliminar(self, request, pk=None):
         return self.destroy(request, pk=pk)
-    
+
+    @action(detail=False, methods=['post'], url_path='kiosco')
+    def kiosco(self, request):
+        """
+        Entrada en portería: {codigo: RUDE o CI, unidad?}. La unidad es la del
+        usuario del kiosco; solo un superadmin puede indicar otra. Resuelve y
+        clasifica en memoria; la marca se inserta en lote (202). Un segundo
+        escaneo del día devuelve la primera marca.
+        """
+        codigo = str(request.data.get('codigo', '')).strip()
+        perfil = obtener_perfil(request.user)
+        unidad_id = perfil.unidad_id
+        pedida = request.data.get('unidad')
+        if pedida and str(pedida) != str(unidad_id):
+            if not perfil.es_superadmin:
+                return Response({'detail': 'Solo puede registrar entradas en su unidad.'}, status=status.HTTP_403_FORBIDDEN)
+            unidad_id = pedida
+        if not codigo or not str(unidad_id or '').isdigit():
+            return Response({'detail': 'Indique el código escaneado y la unidad.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado = kiosco.registrar(int(unidad_id), codigo)
+        if resultado is None:
+            return Response({'detail': 'Código no registrado en esta unidad.'}, status=status.HTTP_404_NOT_FOUND)
+        estudiante_id, estado, fecha, hora, nueva = resultado
+        return Response(
+            {'estudiante': estudiante_id, 'estado': estado, 'fecha': fecha, 'hora_entrada': hora, 'repetida': not nueva},
+            status=status.HTTP_202_ACCEPTED if nueva else status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=['get'], url_path='tasas')
+    def tasas(self, request):
+        """
+        Porcentajes ASI/FAL/TAR/JUS (general) y ASI/FAL/TAR/LIC (clases) desde los
+        resúmenes diarios. Uno de ?estudiante=, ?curso= o ?unidad=; rango con
+        ?desde=&hasta= (AAAA-MM-DD) o ?periodo=<id>.
+        """
+        params = request.query_params
+        objetivo = {clave: params[clave] for clave in ('estudiante', 'curso', 'unidad') if params.get(clave)}
+        if len(objetivo) != 1 or not all(valor.isdigit() for valor in objetivo.values()):
+            return Response(
+                {'detail': 'Indique exactamente uno de: estudiante, curso o unidad.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        objetivo = {clave: int(valor) for clave, valor in objetivo.items()}
+
+        if params.get('periodo'):
+            periodo = Periodo.objects.filter(pk=params['periodo']).values('fecha_inicio', 'fecha_fin').first()
+            if periodo is None:
+                return Response({'detail': 'Periodo no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            desde, hasta = periodo['fecha_inicio'], periodo['fecha_fin']
+        else:
+            try:
+                desde, hasta = parse_date(params.get('desde', '')), parse_date(params.get('hasta', ''))
+            except ValueError:
+                desde = hasta = None
+            if (params.get('desde') and desde is None) or (params.get('hasta') and hasta is None):
+                return Response({'detail': 'Fechas inválidas (AAAA-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Misma regla que VisibilidadEstudianteMixin
+        perfil = obtener_perfil(request.user)
+        permitido = True
+        if perfil.es_superadmin or perfil.es_admin:
+            pass
+        elif 'estudiante' not in objetivo:
+            permitido = not (perfil.es_estudiante or perfil.es_tutor)
+        elif perfil.es_estudiante:
+            permitido = perfil.usuario_id == objetivo['estudiante']
+        elif perfil.es_tutor or perfil.es_profesor:
+            permitido = puede_ver(perfil.usuario_id, objetivo['estudiante'])
+        if not permitido:
+            return Response({'detail': 'Sin acceso a estas tasas de asistencia.'}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({
+            **objetivo,
+            'desde': desde,
+            'hasta': hasta,
+            **resumen.tasas(desde=desde, hasta=hasta, **objetivo),
+        })
+
+    @action(detail=False, methods=['get'], url_path='planilla')
+    def planilla(self, request):
+        """
+        Planilla mensual del curso: ?curso=<id>&mes=AAAA-MM&formato=csv|json.
+        Una fila por estudiante, un código por día hábil (ver planilla.LEYENDA)
+        y los totales del mes. El CSV se envía por streaming.
+        """
+        params = request.query_params
+        curso_id, mes = params.get('curso', ''), params.get('mes', '')
+        try:
+            anio, numero = (int(parte) for parte in mes.split('-'))
+            # El recorrido de días pasa al día siguiente del fin de mes: MAXYEAR queda fuera
+            valido = curso_id.isdigit() and MINYEAR <= anio < MAXYEAR and 1 <= numero <= 12
+        except ValueError:
+            valido = False
+        if not valido:
+            return Response({'detail': 'Indique curso y mes (AAAA-MM).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        perfil = obtener_perfil(request.user)
+        if not (perfil.es_superadmin or perfil.es_admin) and (perfil.es_estudiante or perfil.es_tutor):
+            return Response({'detail': 'Sin acceso a la planilla del curso.'}, status=status.HTTP_403_FORBIDDEN)
+
+        datos = planilla.planilla(int(curso_id), anio, numero)
+        if datos is None:
+            return Response({'detail': 'Curso no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        if params.get('formato') == 'csv':
+            respuesta = StreamingHttpResponse(planilla.filas_csv(datos), content_type='text/csv; charset=utf-8')
+            respuesta['Content-Disposition'] = f'attachment; filename="planilla_{curso_id}_{mes}.csv"'
+            return respuesta
+        return Response(datos)
+
     def create(self, request, *args, **kwargs):
-        print("DATA RECIBIDA:", request.data)
         is_many = isinstance(request.data, list)
         serializer = self.get_serializer(data=request.data, many=is_many)
-        try:
-            serializer.is_valid(raise_exception=True)
-        except Exception as e:
-            print("ERRORES DE SERIALIZER:", serializer.errors)
-            raise
+        serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class AsistenciaClaseViewSet(viewsets.ModelViewSet):
+class AsistenciaClaseViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = AsistenciaClase.objects.select_related('clase', 'estudiante', 'licencia').all()
     filterset_fields = ['clase', 'estudiante', 'estado', 'fecha']
     search_fields = ['clase__nombre', 'estudiante__usuario__nombre']
@@ -163,4 +282,81 @@ class AsistenciaClaseViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
     def eliminar(self, request, pk=None):
-        return self.destroy(request, pk=pk)
\ No newline at end of file
+        return self.destroy(request, pk=pk)
+
+    @action(detail=False, methods=['get', 'post'], url_path='pase-lista')
+    def pase_lista(self, request):
+        """
+        GET ?clase=&fecha=: plantilla con el curso de la clase; cada estudiante
+        trae su marca registrada o 'LIC' si tiene una licencia aprobada ese día.
+        POST: registra la asistencia de toda una clase:
+        {clase, fecha, hora, marcas: [{estudiante, estado}]}.
+        Reenviar el mismo pase de lista actualiza las marcas existentes.
+        """
+        if request.method == 'GET':
+            return self._plantilla_pase_lista(request)
+
+        serializer = PaseListaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        clase = serializer.validated_data['clase']
+        if not self._dicta_clase(request.user, clase.materia_curso.profesor_id):
+            return Response({'detail': 'No dicta esta clase.'}, status=status.HTTP_403_FORBIDDEN)
+
+        filas = serializer.save()
+        return Response({
+            'clase': clase.pk,
+            'fecha': serializer.validated_data['fecha'],
+            'registradas': len(filas),
+        })
+
+    def _dicta_clase(self, user, profesor_id):
+        # Nómina, marcas y licencias del curso: solo administración y el profesor de la clase
+        perfil = obtener_perfil(user)
+        if perfil.es_superadmin or perfil.es_admin:
+            return True
+        return perfil.es_profesor and profesor_id == perfil.usuario_id
+
+    @action(detail=False, methods=['get'], url_path='precarga')
+    def precarga_pase_lista(self, request):
+        """
+        GET ?clase=&fecha=: resumen de la clase, nómina del curso, marcas de la
+        fecha y licencias activas en una sola respuesta (cacheada por clase y fecha).
+        """
+        datos, error = self._precarga(request)
+        return error or Response(datos)
+
+    def _precarga(self, request):
+        clase_id = request.query_params.get('clase', '')
+        try:
+            fecha = parse_date(request.query_params.get('fecha', ''))
+        except ValueError:
+            fecha = None
+        if not clase_id.isdigit() or fecha is None:
+            return None, Response({'detail': 'Indique clase y fecha (AAAA-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        datos = precarga.precarga(int(clase_id), fecha)
+        if datos is None:
+            return None, Response({'detail': 'Clase no encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        if not self._dicta_clase(request.user, datos['clase']['profesor']):
+            return None, Response({'detail': 'No dicta esta clase.'}, status=status.HTTP_403_FORBIDDEN)
+        return datos, None
+
+    def _plantilla_pase_lista(self, request):
+        datos, error = self._precarga(request)
+        if error:
+            return error
+        marcas = {marca['estudiante_id']: marca['estado'] for marca in datos['marcas']}
+        con_licencia = {licencia['estudiante_id']: licencia['id'] for licencia in datos['licencias']}
+        return Response({
+            'clase': datos['clase']['id'],
+            'fecha': datos['fecha'],
+            'marcas': [
+                {
+                    'estudiante': estudiante['id'],
+                    'nombre': f"{estudiante['nombre']} {estudiante['apellido']}",
+                    'estado': marcas.get(estudiante['id'], 'LIC' if estudiante['id'] in con_licencia else None),
+                    'licencia': con_licencia.get(estudiante['id']),
+                }
+                for estudiante in datos['nomina']
+            ],
+        })
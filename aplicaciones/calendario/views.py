@@ -15,10 +15,10 @@ from .serializers import (
 
 from aplicaciones.usuarios.permissions import IsAdminOrSuperAdmin
 from aplicaciones.usuarios.authentication import MultiTokenAuthentication
-from aplicaciones.usuarios.utils import registrar_bitacora
-from aplicaciones.usuarios.usuario_views import get_client_ip
+from aplicaciones.usuarios.auditoria import AuditoriaMixin
 
-class CalendarioAcademicoViewSet(viewsets.ModelViewSet):
+class CalendarioAcademicoViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'calendario_academico'
     queryset = CalendarioAcademico.objects.all()
     serializer_class = CalendarioAcademicoSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -28,13 +28,7 @@ class CalendarioAcademicoViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = self.get_serializer(qs, many=True)
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='calendario_academico',
-            accion='listar',
-            descripcion='Listo el calendario academico'
-        )
+        self.auditar('listar', 'Listo el calendario academico')
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['post'], url_path='crear')
@@ -42,13 +36,7 @@ class CalendarioAcademicoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='calendario_academico',
-                accion='crear',
-                descripcion=f'Creo el calendario academico {obj.año} - {obj.unidad_educativa.nombre}'
-            )
+            self.auditar('crear', f'Creo el calendario academico {obj.año} - {obj.unidad_educativa.nombre}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.erros, status=status.HTTP_400_BAD_REQUEST)
     
@@ -58,13 +46,7 @@ class CalendarioAcademicoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(obj, data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='calendario_academico',
-                accion='editar',
-                descripcion=f'Edito el calendario academico {obj.año} - {obj.unidad_educativa.nombre}'
-            )
+            self.auditar('editar', f'Edito el calendario academico {obj.año} - {obj.unidad_educativa.nombre}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -72,17 +54,12 @@ class CalendarioAcademicoViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         obj = self.get_object()
         obj.delete()
-        registar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='calendario_academico',
-            accion='eliminar',
-            descripcion=f'Elimino el calendario academico {obj.año} - {obj.unidad_educativa.nombre}'
-        )
+        self.auditar('eliminar', f'Elimino el calendario academico {obj.año} - {obj.unidad_educativa.nombre}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class PeriodoViewSet(viewsets.ModelViewSet):
+class PeriodoViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'periodo'
     queryset = Periodo.objects.all()
     serializer_class = PeriodoSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -92,13 +69,7 @@ class PeriodoViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = self.get_serializer(qs, many=True)
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='periodo',
-            accion='listar',
-            descripcion='Listo los periodos del calendario academico'
-        )
+        self.auditar('listar', 'Listo los periodos del calendario academico')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -106,13 +77,7 @@ class PeriodoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='periodo',
-                accion='crear',
-                descripcion=f'Creo el periodo {obj.nombre} - {obj.calendario.año}'
-            )
+            self.auditar('crear', f'Creo el periodo {obj.nombre} - {obj.calendario.año}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -122,13 +87,7 @@ class PeriodoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(obj, data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='periodo',
-                accion='editar',
-                descripcion=f'Edito el periodo {obj.nombre} - {obj.calendario.año}'
-            )
+            self.auditar('editar', f'Edito el periodo {obj.nombre} - {obj.calendario.año}')
             return Response(self.get_serializer(obj).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -136,16 +95,11 @@ class PeriodoViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         obj = self.get_object()
         obj.delete()
-        registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='periodo',
-                accion='eliminar',
-                descripcion=f'Elimino el periodo {obj.nombre} - {obj.calendario.año}'
-            )
+        self.auditar('eliminar', f'Elimino el periodo {obj.nombre} - {obj.calendario.año}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class TipoFeriadoViewSet(viewsets.ModelViewSet):
+class TipoFeriadoViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'tipo_feriado'
     queryset = TipoFeriado.objects.all()
     serializer_class = TipoFeriadoSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -162,12 +116,7 @@ class TipoFeriadoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='tipo_feriado',
-                descripcion=f'Creo el tipo de feriado {obj.nombre}'
-            )
+            self.auditar('crear', f'Creo el tipo de feriado {obj.nombre}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -187,7 +136,8 @@ class TipoFeriadoViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class FeriadoViewSet(viewsets.ModelViewSet):
+class FeriadoViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'feriado'
     queryset = Feriado.objects.all()
     serializer_class = FeriadoSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -197,13 +147,7 @@ class FeriadoViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = self.get_serializer(qs, many=True)
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='feriado',
-            accion='listar',
-            descripcion='Listo los feriados del calendario academico'
-        )
+        self.auditar('listar', 'Listo los feriados del calendario academico')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -211,13 +155,7 @@ class FeriadoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='feriado',
-                accion='crear',
-                descripcion=f'Creo el feriado {obj.nombre} - {obj.fecha} en el calendario {obj.calendario.año}'
-            )
+            self.auditar('crear', f'Creo el feriado {obj.nombre} - {obj.fecha} en el calendario {obj.calendario.año}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -227,13 +165,7 @@ class FeriadoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(obj, data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='feriado',
-                accion='editar',
-                descripcion=f'Edito el feriado {obj.nombre} - {obj.fecha} en el calendario {obj.calendario.año}'
-            )
+            self.auditar('editar', f'Edito el feriado {obj.nombre} - {obj.fecha} en el calendario {obj.calendario.año}')
             return Response(self.get_serializer(obj).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -241,16 +173,11 @@ class FeriadoViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         obj = self.get_object()
         obj.delete()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='feriado',
-            accion='eliminar',
-            descripcion=f'Elimino el feriado {obj.nombre} - {obj.fecha} en el calendario {obj.calendario.año}'
-        )
+        self.auditar('eliminar', f'Elimino el feriado {obj.nombre} - {obj.fecha} en el calendario {obj.calendario.año}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class TipoHorarioViewSet(viewsets.ModelViewSet):
+class TipoHorarioViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'tipo_horario'
     queryset = TipoHorario.objects.all()
     serializer_class = TipoHorarioSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -260,13 +187,7 @@ class TipoHorarioViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = self.get_serializer(qs, many=True)
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='tipo_feriado',
-            accion='listar',
-            descripcion='Listo los tipos de horario disponibles'
-        )
+        self.auditar('listar', 'Listo los tipos de horario disponibles')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -274,13 +195,7 @@ class TipoHorarioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora (
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='tipo_horario',
-                accion='crear',
-                descripcion=f'Creo el tipo de horario {obj.nombre} {obj.turno}'
-            )
+            self.auditar('crear', f'Creo el tipo de horario {obj.nombre} {obj.turno}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -290,13 +205,7 @@ class TipoHorarioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(obj, data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora (
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='tipo_horario',
-                accion='editar',
-                descripcion=f'Edito el tipo de horario {obj.nombre} {obj.turno}'
-            )
+            self.auditar('editar', f'Edito el tipo de horario {obj.nombre} {obj.turno}')
             return Response(self.get_serializer(obj).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -304,17 +213,12 @@ class TipoHorarioViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         obj = self.get_object()
         obj.delete()
-        registrar_bitacora (
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='tipo_horario',
-                accion='eliminar',
-                descripcion=f'Elimino el tipo de horario {obj.nombre} {obj.turno}'
-            )
+        self.auditar('eliminar', f'Elimino el tipo de horario {obj.nombre} {obj.turno}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class HorarioViewSet(viewsets.ModelViewSet):
+class HorarioViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'horario'
     queryset = Horario.objects.all()
     serializer_class = HorarioSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -324,13 +228,7 @@ class HorarioViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = self.get_serializer(qs, many=True)
-        registrar_bitacora (
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='horario',
-            accion='listar',
-            descripcion='Listo los horarios disponibles'
-        )
+        self.auditar('listar', 'Listo los horarios disponibles')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -338,13 +236,7 @@ class HorarioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora (
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='horario',
-                accion='crear',
-                descripcion=f'Creo el horario {obj.tipo.nombre} {obj.dia} {obj.hora_inicio} - {obj.hora_fin}'
-            )
+            self.auditar('crear', f'Creo el horario {obj.tipo.nombre} {obj.dia} {obj.hora_inicio} - {obj.hora_fin}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -354,13 +246,7 @@ class HorarioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(obj, data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora (
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='horario',
-                accion='editar',
-                descripcion=f'Edito el horario {obj.tipo.nombre} {obj.dia_display} {obj.hora_inicio} - {obj.hora_fin}'
-            )
+            self.auditar('editar', f'Edito el horario {obj.tipo.nombre} {obj.dia_display} {obj.hora_inicio} - {obj.hora_fin}')
             return Response(self.get_serializer(obj).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -368,17 +254,12 @@ class HorarioViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         obj = self.get_object()
         obj.delete()
-        registrar_bitacora (
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='horario',
-            accion='eliminar',
-            descripcion=f'Elimino el horario {obj.tipo.nombre} {obj.dia_display} {obj.hora_inicio} - {obj.hora_fin}'
-        )
+        self.auditar('eliminar', f'Elimino el horario {obj.tipo.nombre} {obj.dia_display} {obj.hora_inicio} - {obj.hora_fin}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ClaseHorarioViewSet(viewsets.ModelViewSet):
+class ClaseHorarioViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'clase_horario'
     queryset = ClaseHorario.objects.all()
     serializer_class = ClaseHorarioSerializer
     permission_classes = [IsAdminOrSuperAdmin]
@@ -388,13 +269,7 @@ class ClaseHorarioViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = self.get_serializer(qs, many=True)
-        registar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='clase_horario',
-            accion='listar',
-            descripcion='Listo las clases de horario disponibles'
-        )
+        self.auditar('listar', 'Listo las clases de horario disponibles')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -402,13 +277,7 @@ class ClaseHorarioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='clase_horario',
-                accion='crear',
-                descripcion=f'Creo la clase de horario {obj.clase_id} - {obj.horario_id}'
-            )
+            self.auditar('crear', f'Creo la clase de horario {obj.clase_id} - {obj.horario_id}')
             return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -418,13 +287,7 @@ class ClaseHorarioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(obj, data=request.data)
         if serializer.is_valid():
             obj = serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='clase_horario',
-                accion='editar',
-                descripcion=f'Edito la clase de horario {obj.clase_id} - {obj.horario_id}'
-            )
+            self.auditar('editar', f'Edito la clase de horario {obj.clase_id} - {obj.horario_id}')
             return Response(self.get_serializer(obj).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -432,13 +295,7 @@ class ClaseHorarioViewSet(viewsets.ModelViewSet):
     def eliminar(self, request, pk=None):
         obj = self.get_object()
         obj.delete()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='clase_horario',
-            accion='crear',
-            descripcion=f'Edito la clase de horario {obj.clase_id} - {obj.horario_id}'
-        )
+        self.auditar('eliminar', f'Elimino la clase de horario {obj.clase_id} - {obj.horario_id}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
         
\ No newline at end of file
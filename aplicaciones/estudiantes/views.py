@@ -5,8 +5,8 @@ from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
 from aplicaciones.usuarios.permissions import PermisoEstudianteView, PermisoPorPuesto, PermisoPorRol
-from aplicaciones.usuarios.utils import registrar_bitacora
-from aplicaciones.usuarios.usuario_views import get_client_ip
+from aplicaciones.usuarios.auditoria import AuditoriaMixin
+from aplicaciones.usuarios.visibilidad import VisibilidadEstudianteMixin
 from aplicaciones.usuarios.authentication import MultiTokenAuthentication
 from .models import Estudiante, Tutor, TutorEstudiante
 from .serializers import (
@@ -15,37 +15,14 @@ from .serializers import (
     TutorEstudianteSerializer, CreateTutorEstudianteSerializer
 )
 
-class EstudianteViewSet(viewsets.ModelViewSet):
+class EstudianteViewSet(VisibilidadEstudianteMixin, AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'estudiante'
+    campo_estudiante = 'pk'
+    otros_sin_acceso = True
     queryset = Estudiante.objects.select_related('usuario','curso').all()
     permission_classes = [PermisoPorPuesto, PermisoPorRol, PermisoEstudianteView]
     authentication_classes = [MultiTokenAuthentication]
 
-    def get_queryset(self):
-        user = self.request.user 
-        qs = super().get_queryset()
-
-        # SuperAdmin / Admin pueden ver todos los estudiantes
-        if hasattr(user, 'superadmin') or hasattr(user, 'admin'):
-            return qs
-        
-        # Tutor: solo ve sus propios estudiantes
-        if hasattr(user, 'tutor'):
-            return qs.filter(tutores__tutor__usuario=user).distinct()
-        
-        # Estudiante: solo ve su propio perfil
-        if hasattr(user, 'estudiante'):
-            return qs.filter(pk.user.pk)
-        
-        if hasattr(user, 'profesor'):
-            prof = user.profesor
-            return qs.filter(
-                Q(curso__tutor_id=prof.tutor_id) |
-                Q(curso__materias__profesor=prof)
-            ).distinct()
-        
-        return Estudiante.objects.none()  # No acceso
-
-
     def get_serializer_class(self):
         if self.action in ['crear_estudiante','editar_estudiante']:
             return CreateEstudianteSerializer
@@ -55,7 +32,7 @@ class EstudianteViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = EstudianteSerializer(qs, many=True)
-        registrar_bitacora(request.user, get_client_ip(request), 'estudiante', 'ver', 'Listar estudiantes')
+        self.auditar('ver', 'Listar estudiantes')
         return Response(serializer.data)
 
     @csrf_exempt
@@ -75,7 +52,7 @@ class EstudianteViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
             est = serializer.save()
-            registrar_bitacora(request.user, get_client_ip(request), 'estudiante', 'crear', f'Crear estudiante {est}')
+            self.auditar('crear', f'Crear estudiante {est}')
         return Response(EstudianteSerializer(est).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -85,18 +62,19 @@ class EstudianteViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
             est = serializer.save()
-            registrar_bitacora(request.user, get_client_ip(request), 'estudiante', 'editar', f'Editar estudiante {est}')
+            self.auditar('editar', f'Editar estudiante {est}')
         return Response(EstudianteSerializer(est).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
     def eliminar_estudiante(self, request, pk=None):
         est = self.get_object()
         est.delete()
-        registrar_bitacora(request.user, get_client_ip(request), 'estudiante', 'eliminar', f'Eliminar estudiante {pk}')
+        self.auditar('eliminar', f'Eliminar estudiante {pk}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TutorViewSet(viewsets.ModelViewSet):
+class TutorViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'tutor'
     queryset = Tutor.objects.select_related('usuario').all()
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
@@ -109,7 +87,7 @@ class TutorViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='listar')
     def listar(self, request):
         serializer = TutorSerializer(self.get_queryset(), many=True)
-        registrar_bitacora(request.user, get_client_ip(request), 'tutor', 'ver', 'Listar tutores')
+        self.auditar('ver', 'Listar tutores')
         return Response(serializer.data)
 
     @csrf_exempt
@@ -119,7 +97,7 @@ class TutorViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
             t = serializer.save()
-            registrar_bitacora(request.user, get_client_ip(request), 'tutor', 'crear', f'Crear tutor {t}')
+            self.auditar('crear', f'Crear tutor {t}')
         return Response(TutorSerializer(t).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -129,14 +107,14 @@ class TutorViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
             t = serializer.save()
-            registrar_bitacora(request.user, get_client_ip(request), 'tutor', 'editar', f'Editar tutor {t}')
+            self.auditar('editar', f'Editar tutor {t}')
         return Response(TutorSerializer(t).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
     def eliminar_tutor(self, request, pk=None):
         t = self.get_object()
         t.delete()
-        registrar_bitacora(request.user, get_client_ip(request), 'tutor', 'eliminar', f'Eliminar tutor {pk}')
+        self.auditar('eliminar', f'Eliminar tutor {pk}')
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=False, methods=["get"], url_path="usuario/(?P<usuario_id>[^/.]+)")
@@ -149,7 +127,8 @@ class TutorViewSet(viewsets.ModelViewSet):
             return Response({"detail": "No existe"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class TutorEstudianteViewSet(viewsets.ModelViewSet):
+class TutorEstudianteViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'tutor_estudiante'
     queryset = TutorEstudiante.objects.select_related('tutor__usuario','estudiante__usuario').all()
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
@@ -162,7 +141,7 @@ class TutorEstudianteViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='listar')
     def listar(self, request):
         data = TutorEstudianteSerializer(self.get_queryset(), many=True)
-        registrar_bitacora(request.user, get_client_ip(request), 'tutor_estudiante', 'ver', 'Listar relaciones')
+        self.auditar('ver', 'Listar relaciones')
         return Response(data.data)
 
     @csrf_exempt
@@ -172,7 +151,7 @@ class TutorEstudianteViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
             rel = serializer.save()
-            registrar_bitacora(request.user, get_client_ip(request), 'tutor_estudiante', 'crear', f'Crear relación {rel}')
+            self.auditar('crear', f'Crear relación {rel}')
         return Response(TutorEstudianteSerializer(rel).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -182,12 +161,12 @@ class TutorEstudianteViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
             rel = serializer.save()
-            registrar_bitacora(request.user, get_client_ip(request), 'tutor_estudiante', 'editar', f'Editar relación {rel}')
+            self.auditar('editar', f'Editar relación {rel}')
         return Response(TutorEstudianteSerializer(rel).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
     def eliminar_relacion(self, request, pk=None):
         rel = self.get_object()
         rel.delete()
-        registrar_bitacora(request.user, get_client_ip(request), 'tutor_estudiante', 'eliminar', f'Eliminar relación {pk}')
+        self.auditar('eliminar', f'Eliminar relación {pk}')
         return Response(status=status.HTTP_204_NO_CONTENT)
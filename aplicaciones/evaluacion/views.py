@@ -20,6 +20,7 @@ from .serializers import (
     CreateAutoEvaluacionSerializer,
     CreateDimensionEvaluacionSerializer,
 )
+from aplicaciones.usuarios.visibilidad import VisibilidadEstudianteMixin
 
 class DimensionEvaluacionViewSet(viewsets.ModelViewSet):
     queryset = DimensionEvaluacion.objects.all()
@@ -56,7 +57,7 @@ class ActividadViewSet(viewsets.ModelViewSet):
         serializer = NotaActividadSerializer(notas, many=True)
         return Response(serializer.data)
 
-class NotaActividadViewSet(viewsets.ModelViewSet):
+class NotaActividadViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = NotaActividad.objects.all()
     serializer_class = NotaActividadSerializer
     filterset_fields = ['actividad', 'estudiante']
@@ -66,7 +67,7 @@ class NotaActividadViewSet(viewsets.ModelViewSet):
             return CreateNotaActividadSerializer
         return NotaActividadSerializer
 
-class NotaFinalMateriaViewSet(viewsets.ModelViewSet):
+class NotaFinalMateriaViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = NotaFinalMateria.objects.all()
     serializer_class = NotaFinalMateriaSerializer
     filterset_fields = ['estudiante', 'materia_curso', 'periodo', 'estado']
@@ -76,7 +77,7 @@ class NotaFinalMateriaViewSet(viewsets.ModelViewSet):
             return CreateNotaFinalMateriaSerializer
         return NotaFinalMateriaSerializer
 
-class AutoEvaluacionViewSet(viewsets.ModelViewSet):
+class AutoEvaluacionViewSet(VisibilidadEstudianteMixin, viewsets.ModelViewSet):
     queryset = AutoEvaluacion.objects.all()
     serializer_class = AutoEvaluacionSerializer
     filterset_fields = [
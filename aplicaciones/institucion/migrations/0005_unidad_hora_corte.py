@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institucion', '0004_remove_unidadeducativa_admin_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unidadeducativa',
+            name='hora_corte_asistencia',
+            field=models.TimeField(blank=True, null=True),
+        ),
+    ]
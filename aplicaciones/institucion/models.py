@@ -118,6 +118,9 @@ class UnidadEducativa(models.Model):
         null=True,
         blank=True
     )
+    # Hora tras la cual se avisa a los tutores de las inasistencias del día
+    # (asistencia/alertas.py); vacío → ALERTAS_AUSENCIA['HORA_CORTE']
+    hora_corte_asistencia = models.TimeField(null=True, blank=True)
     
     class Meta:
         verbose_name = 'Unidad Educativa'
@@ -5,8 +5,7 @@ from rest_framework import status
 from django.db.models import OuterRef, Subquery, Q
 from rest_framework.parsers import MultiPartParser, FormParser
 from .models import Colegio, Modulo, Aula, UnidadEducativa,SuperAdmin
-from aplicaciones.usuarios.utils import registrar_bitacora
-from aplicaciones.usuarios.usuario_views import get_client_ip 
+from aplicaciones.usuarios.auditoria import AuditoriaMixin
 from .serializers import (
     ColegioSerializer,
     ModuloSerializer,
@@ -21,14 +20,13 @@ from aplicaciones.usuarios.authentication import CsrfExemptSessionAuthentication
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Count
-from aplicaciones.usuarios.models import Admin
-from aplicaciones.estudiantes.models import Estudiante, Tutor, TutorEstudiante
-from aplicaciones.personal.models import Profesor
+from aplicaciones.usuarios.models import UsuarioUnidad
 
 from aplicaciones.usuarios.permissions import IsSuperAdmin, IsAdminOrSuperAdmin, PermisoPorPuesto
 from aplicaciones.usuarios.authentication import MultiTokenAuthentication
 
-class ColegioViewSet(viewsets.ModelViewSet):
+class ColegioViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'colegio'
     queryset = Colegio.objects.all()
     search_fields = ['nombre', 'direccion']
     permission_classes = [IsSuperAdmin]  # Permitir solo a SuperAdmin
@@ -43,13 +41,7 @@ class ColegioViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='cantidad')
     def obtener_cantidad_colegios(self, request):
         cantidad = Colegio.objects.count()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='colegio',
-            accion='ver',
-            descripcion='Consultó la cantidad de colegios'
-        )
+        self.auditar('ver', 'Consultó la cantidad de colegios')
         return Response({'cantidad_colegios': cantidad})
 
     @csrf_exempt
@@ -72,13 +64,7 @@ class ColegioViewSet(viewsets.ModelViewSet):
         print("serializer", serializer.initial_data)
         if serializer.is_valid():
             serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='colegio',
-                accion='crear',
-                descripcion=f'Creó el colegio nuevo'
-            )
+            self.auditar('crear', f'Creó el colegio nuevo')
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -92,13 +78,7 @@ class ColegioViewSet(viewsets.ModelViewSet):
         try:
             colegio = Colegio.objects.get(pk=pk)
             colegio.delete()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='colegio',
-                accion='eliminar',
-                descripcion=f'Eliminó el colegio )'
-            )
+            self.auditar('eliminar', f'Eliminó el colegio )')
             return Response({'detail': 'Colegio eliminado exitosamente.'}, status=status.HTTP_204_NO_CONTENT)
         except Colegio.DoesNotExist:
             return Response({'detail': 'Colegio no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
@@ -114,13 +94,7 @@ class ColegioViewSet(viewsets.ModelViewSet):
             serializer = CreateColegioSerializer(colegio, data=request.data, partial=False)
             if serializer.is_valid():
                 serializer.save()
-                registrar_bitacora(
-                    usuario=request.user,
-                    ip=get_client_ip(request),
-                    tabla_afectada='colegio',
-                    accion='editar',
-                    descripcion=f'Editó el colegio '
-                )
+                self.auditar('editar', f'Editó el colegio ')
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Colegio.DoesNotExist:
@@ -141,16 +115,11 @@ class ColegioViewSet(viewsets.ModelViewSet):
         data = Colegio.objects.filter(
             unidades_educativas__isnull=False  # Solo colegios con unidades educativas asociadas
         ).values('nombre', 'unidades_educativas__id')  # Obtener el nombre del colegio y el ID de la unidad educativa
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='colegio',
-            accion='ver',
-            descripcion='Listó colegios con unidades educativas asociadas'
-        )
+        self.auditar('ver', 'Listó colegios con unidades educativas asociadas')
         return Response(data, status=status.HTTP_200_OK)
 
-class ModuloViewSet(viewsets.ModelViewSet):
+class ModuloViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'modulo'
     queryset = Modulo.objects.annotate(cantidad_aulas_real=Count('aulas'))
     search_fields = ['nombre']
     filterset_fields = ['cantidad_aulas_real']
@@ -187,13 +156,7 @@ class ModuloViewSet(viewsets.ModelViewSet):
         modulo = crear_ser.save()
 
         # 2) Registrar bitácora
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='modulo',
-            accion='crear',
-            descripcion=f'Creó el módulo {modulo.nombre}'
-        )
+        self.auditar('crear', f'Creó el módulo {modulo.nombre}')
 
         # 3) Re-serializar con ModuloSerializer para devolver todos los campos
         read_ser = ModuloSerializer(modulo, context={'request': request})
@@ -213,13 +176,7 @@ class ModuloViewSet(viewsets.ModelViewSet):
         modulo = editar_ser.save()
 
         # 2) Registrar bitácora
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='modulo',
-            accion='editar',
-            descripcion=f'Editó el módulo {modulo.nombre}'
-        )
+        self.auditar('editar', f'Editó el módulo {modulo.nombre}')
 
         # 3) Re-serializar con ModuloSerializer
         read_ser = ModuloSerializer(modulo, context={'request': request})
@@ -232,16 +189,11 @@ class ModuloViewSet(viewsets.ModelViewSet):
         except Modulo.DoesNotExist:
             return Response({"detail": "No encontrado"}, status=status.HTTP_404_NOT_FOUND)
         modulo.delete()
-        registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='modulo',
-                accion='eliminar',
-                descripcion=f'Eliminó el módulo )'
-            )
+        self.auditar('eliminar', f'Eliminó el módulo )')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class AulaViewSet(viewsets.ModelViewSet):
+class AulaViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'aula'
     queryset = Aula.objects.all()
     filterset_fields = ['modulo', 'tipo', 'estado']
     search_fields = ['nombre', 'equipamiento']
@@ -273,13 +225,7 @@ class AulaViewSet(viewsets.ModelViewSet):
         aula = crear_ser.save()
 
         # 2) Bitácora
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='aula',
-            accion='crear',
-            descripcion=f'Creó el aula {aula.nombre}'
-        )
+        self.auditar('crear', f'Creó el aula {aula.nombre}')
 
         # 3) Re-serializamos con el serializer de lectura para devolver nested módulo→colegio
         read_ser = AulaSerializer(aula, context={'request': request})
@@ -301,13 +247,7 @@ class AulaViewSet(viewsets.ModelViewSet):
         aula = editar_ser.save()
 
         # 3) Bitácora
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='aula',
-            accion='editar',
-            descripcion=f'Editó el aula {aula.nombre}'
-        )
+        self.auditar('editar', f'Editó el aula {aula.nombre}')
 
         # 4) Re-serializamos con el serializer de lectura
         read_ser = AulaSerializer(aula, context={'request': request})
@@ -318,19 +258,14 @@ class AulaViewSet(viewsets.ModelViewSet):
         try:
             aula = Aula.objects.get(pk=pk)
         except Aula.DoesNotExist:
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='aula',
-                accion='eliminar',
-                descripcion=f'Eliminó el aula '
-            )
+            self.auditar('eliminar', f'Eliminó el aula ')
             return Response({'detail': 'Aula no encontrada'}, status=status.HTTP_404_NOT_FOUND)
         
         aula.delete()
         return Response({'detail': 'Aula eliminada'}, status=status.HTTP_204_NO_CONTENT)
 
-class UnidadEducativaViewSet(viewsets.ModelViewSet):
+class UnidadEducativaViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'unidad_educativa'
     queryset = UnidadEducativa.objects.all()
     filterset_fields = ['colegio', 'turno']
     search_fields = ['codigo_sie', 'direccion']
@@ -346,13 +281,7 @@ class UnidadEducativaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='cantidad')
     def obtener_cantidad_unidades_educativas(self, request):
         cantidad = UnidadEducativa.objects.count()
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='unidad_educativa',
-            accion='ver',
-            descripcion='Consultó la cantidad de unidades educativas'
-        )
+        self.auditar('ver', 'Consultó la cantidad de unidades educativas')
         return Response({'cantidad_unidades_educativas': cantidad})
     
     @action(detail=False, methods=['post'], url_path='crear')
@@ -360,13 +289,7 @@ class UnidadEducativaViewSet(viewsets.ModelViewSet):
         serializer = CreateUnidadEducativaSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='unidad_educativa',
-            accion='crear',
-            descripcion='Creó una nueva unidad educativa'
-            )
+            self.auditar('crear', 'Creó una nueva unidad educativa')
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -382,13 +305,7 @@ class UnidadEducativaViewSet(viewsets.ModelViewSet):
         print("serializer",serializer.initial_data)
         if serializer.is_valid():
             serializer.save()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='unidad_educativa',
-                accion='editar',
-                descripcion=f'Editó la unidad educativa con ID: '
-            )
+            self.auditar('editar', f'Editó la unidad educativa con ID: ')
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -397,13 +314,7 @@ class UnidadEducativaViewSet(viewsets.ModelViewSet):
         try:
             unidad = UnidadEducativa.objects.get(pk=pk)
             unidad.delete()
-            registrar_bitacora(
-                usuario=request.user,
-                ip=get_client_ip(request),
-                tabla_afectada='unidad_educativa',
-                accion='eliminar',
-                descripcion=f'Eliminó la unidad educativa con código SIE:'
-            )
+            self.auditar('eliminar', f'Eliminó la unidad educativa con código SIE:')
             return Response({'detail': 'Unidad Educativa eliminada exitosamente.'}, status=status.HTTP_204_NO_CONTENT)
         except UnidadEducativa.DoesNotExist:
             return Response({'detail': 'Unidad Educativa no encontrada.'}, status=status.HTTP_404_NOT_FOUND)
@@ -427,14 +338,17 @@ class UnidadEducativaViewSet(viewsets.ModelViewSet):
         except UnidadEducativa.DoesNotExist:
             return Response({'detail': 'Unidad Educativa no encontrada.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Contar usuarios por rol en la unidad educativa
-        admins = Admin.objects.filter(unidad=unidad).count()
-        profesores = Profesor.objects.filter(unidad=unidad).count()
-        alumnos = Estudiante.objects.filter(unidad=unidad).count()
-        # Tutores: buscar tutores que tengan estudiantes en esta unidad
-        tutores = Tutor.objects.filter(
-            estudiantes__estudiante__unidad=unidad
-        ).distinct().count()
+        # Contar usuarios por rol en la unidad educativa: un GROUP BY sobre UsuarioUnidad
+        conteos = dict(
+            UsuarioUnidad.objects.filter(unidad=unidad)
+            .values_list('tipo')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        admins = conteos.get('ADM', 0)
+        profesores = conteos.get('PRO', 0)
+        alumnos = conteos.get('EST', 0)
+        tutores = conteos.get('TUT', 0)
         total = admins + profesores + tutores + alumnos
 
         return Response({
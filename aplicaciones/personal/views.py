@@ -3,9 +3,8 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.views.decorators.csrf import csrf_exempt
 from aplicaciones.usuarios.permissions import PermisoPorPuesto
-from aplicaciones.usuarios.utils import registrar_bitacora
+from aplicaciones.usuarios.auditoria import AuditoriaMixin
 from aplicaciones.usuarios.authentication import MultiTokenAuthentication
-from aplicaciones.usuarios.usuario_views import get_client_ip
 
 from .models import Especialidad, Profesor, ProfesorEspecialidad, CargaHoraria
 from .serializers import (
@@ -17,7 +16,8 @@ from .serializers import (
 )
 
 
-class EspecialidadViewSet(viewsets.ModelViewSet):
+class EspecialidadViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'especialidad'
     queryset = Especialidad.objects.all()
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
@@ -31,8 +31,7 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = EspecialidadSerializer(qs, many=True)
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'especialidad', 'ver', 'Listó especialidades')
+        self.auditar('ver', 'Listó especialidades')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -41,8 +40,7 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
         serializer = CreateEspecialidadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         esp = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'especialidad', 'crear', f'Creó {esp}')
+        self.auditar('crear', f'Creó {esp}')
         return Response(EspecialidadSerializer(esp).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -54,8 +52,7 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
         serializer = CreateEspecialidadSerializer(esp, data=request.data)
         serializer.is_valid(raise_exception=True)
         esp = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'especialidad', 'editar', f'Editó {esp}')
+        self.auditar('editar', f'Editó {esp}')
         return Response(EspecialidadSerializer(esp).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
@@ -65,12 +62,12 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
         except Especialidad.DoesNotExist:
             return Response({'detail':'No encontrado'}, status=status.HTTP_404_NOT_FOUND)
         esp.delete()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'especialidad', 'eliminar', f'Eliminó especialidad {pk}')
+        self.auditar('eliminar', f'Eliminó especialidad {pk}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ProfesorViewSet(viewsets.ModelViewSet):
+class ProfesorViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'profesor'
     queryset = Profesor.objects.all()
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
@@ -86,8 +83,7 @@ class ProfesorViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = ProfesorSerializer(qs, many=True)
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor', 'ver', 'Listó profesores')
+        self.auditar('ver', 'Listó profesores')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -96,8 +92,7 @@ class ProfesorViewSet(viewsets.ModelViewSet):
         serializer = CreateProfesorSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         prof = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor', 'crear', f'Creó {prof}')
+        self.auditar('crear', f'Creó {prof}')
         return Response(ProfesorSerializer(prof).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -108,8 +103,7 @@ class ProfesorViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         prof = serializer.save()
 
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor', 'editar', f'Editó {prof}')
+        self.auditar('editar', f'Editó {prof}')
         return Response(ProfesorSerializer(prof).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
@@ -119,12 +113,12 @@ class ProfesorViewSet(viewsets.ModelViewSet):
         except Profesor.DoesNotExist:
             return Response({'detail':'No encontrado'}, status=status.HTTP_404_NOT_FOUND)
         prof.delete()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor', 'eliminar', f'Eliminó profesor {pk}')
+        self.auditar('eliminar', f'Eliminó profesor {pk}')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ProfesorEspecialidadViewSet(viewsets.ModelViewSet):
+class ProfesorEspecialidadViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'profesor_especialidad'
     queryset = ProfesorEspecialidad.objects.select_related('profesor', 'especialidad')
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
@@ -138,8 +132,7 @@ class ProfesorEspecialidadViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = ProfesorEspecialidadSerializer(qs, many=True)
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor_especialidad', 'ver', 'Listó asignaciones')
+        self.auditar('ver', 'Listó asignaciones')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -148,8 +141,7 @@ class ProfesorEspecialidadViewSet(viewsets.ModelViewSet):
         serializer = CreateProfesorEspecialidadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         pe = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor_especialidad', 'crear', f'Asignó {pe}')
+        self.auditar('crear', f'Asignó {pe}')
         return Response(ProfesorEspecialidadSerializer(pe).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -161,8 +153,7 @@ class ProfesorEspecialidadViewSet(viewsets.ModelViewSet):
         serializer = CreateProfesorEspecialidadSerializer(pe, data=request.data)
         serializer.is_valid(raise_exception=True)
         pe = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor_especialidad', 'editar', f'Editó {pe}')
+        self.auditar('editar', f'Editó {pe}')
         return Response(ProfesorEspecialidadSerializer(pe).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
@@ -172,13 +163,13 @@ class ProfesorEspecialidadViewSet(viewsets.ModelViewSet):
         except ProfesorEspecialidad.DoesNotExist:
             return Response({'detail':'No encontrado'}, status=status.HTTP_404_NOT_FOUND)
         pe.delete()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'profesor_especialidad', 'eliminar', f'Removió {pe}')
+        self.auditar('eliminar', f'Removió {pe}')
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
 
-class CargaHorariaViewSet(viewsets.ModelViewSet):
+class CargaHorariaViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'carga_horaria'
     queryset = CargaHoraria.objects.select_related('profesor_especialidad__profesor', 'profesor_especialidad__especialidad', 'periodo')
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
@@ -192,8 +183,7 @@ class CargaHorariaViewSet(viewsets.ModelViewSet):
     def listar(self, request):
         qs = self.get_queryset()
         serializer = CargaHorariaSerializer(qs, many=True)
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'carga_horaria', 'ver', 'Listó cargas horarias')
+        self.auditar('ver', 'Listó cargas horarias')
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='crear')
@@ -202,8 +192,7 @@ class CargaHorariaViewSet(viewsets.ModelViewSet):
         serializer = CreateCargaHorariaSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         carga = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'carga_horaria', 'crear', f'Asignó {carga}')
+        self.auditar('crear', f'Asignó {carga}')
         return Response(CargaHorariaSerializer(carga).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put'], url_path='editar')
@@ -215,8 +204,7 @@ class CargaHorariaViewSet(viewsets.ModelViewSet):
         serializer = CreateCargaHorariaSerializer(carga, data=request.data)
         serializer.is_valid(raise_exception=True)
         carga = serializer.save()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'carga_horaria', 'editar', f'Editó {carga}')
+        self.auditar('editar', f'Editó {carga}')
         return Response(CargaHorariaSerializer(carga).data)
 
     @action(detail=True, methods=['delete'], url_path='eliminar')
@@ -226,6 +214,5 @@ class CargaHorariaViewSet(viewsets.ModelViewSet):
         except CargaHoraria.DoesNotExist:
             return Response({'detail':'No encontrado'}, status=status.HTTP_404_NOT_FOUND)
         carga.delete()
-        registrar_bitacora(request.user, get_client_ip(request),
-                           'carga_horaria', 'eliminar', f'Eliminó carga horaria {pk}')
+        self.auditar('eliminar', f'Eliminó carga horaria {pk}')
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
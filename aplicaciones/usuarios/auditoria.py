@@ -0,0 +1,99 @@
+# usuarios/auditoria.py
+"""
+Política de auditoría declarativa.
+
+Las vistas ya no deciden si escriben en la bitácora: llaman `self.auditar(...)`
+y la tabla AUDITORIA_POLITICA (settings) decide si se registra, con qué
+muestreo y con qué plantilla de descripción. Claves, de la más específica
+a la más general:
+
+    'tabla.accion'  →  'tabla.*'  →  '*.accion'  →  '*'
+
+Ejemplo:
+
+    AUDITORIA_POLITICA = {
+        'horario.listar': {'registrar': False},
+        '*.listar':       {'muestreo': 0.1},
+        'usuario.*':      {'plantilla': '[{tabla}] {descripcion}'},
+    }
+"""
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+from .utils import registrar_bitacora, get_client_ip
+
+# Acciones con otro nombre en el código → nombre de Bitacora.ACCIONES
+ALIAS_ACCIONES = {
+    'ver': 'listar',
+}
+
+
+@dataclass(frozen=True)
+class ReglaAuditoria:
+    registrar: bool = True
+    muestreo: float = 1.0          # 0..1, fracción de eventos que se registran
+    plantilla: Optional[str] = None
+
+
+REGLA_POR_DEFECTO = ReglaAuditoria()
+
+
+class _Contexto(dict):
+    def __missing__(self, clave):
+        return ''
+
+
+def normalizar_accion(accion):
+    return ALIAS_ACCIONES.get(accion, accion)
+
+
+def obtener_regla(tabla, accion):
+    politica = getattr(settings, 'AUDITORIA_POLITICA', {})
+    for clave in (f'{tabla}.{accion}', f'{tabla}.*', f'*.{accion}', '*'):
+        if clave in politica:
+            return ReglaAuditoria(**politica[clave])
+    return REGLA_POR_DEFECTO
+
+
+def auditar(request, tabla, accion, descripcion='', usuario=None, **contexto):
+    """
+    Registra (o no) el evento en la bitácora según AUDITORIA_POLITICA.
+    `usuario` reemplaza a request.user cuando aún no hay sesión (login, registro).
+    """
+    usuario = usuario or request.user
+    accion = normalizar_accion(accion)
+    regla = obtener_regla(tabla, accion)
+    if not regla.registrar:
+        return False
+    if regla.muestreo < 1 and random.random() >= regla.muestreo:
+        return False
+
+    if regla.plantilla:
+        descripcion = regla.plantilla.format_map(_Contexto(
+            contexto, descripcion=descripcion, tabla=tabla, accion=accion, usuario=usuario,
+        ))
+
+    registrar_bitacora(
+        usuario=usuario,
+        ip=get_client_ip(request),
+        tabla_afectada=tabla,
+        accion=accion,
+        descripcion=descripcion
+    )
+    return True
+
+
+class AuditoriaMixin:
+    """
+    Mixin para ViewSets: `tabla_auditoria` es la tabla por defecto y
+    `self.auditar(accion, descripcion)` delega en la política.
+    """
+    tabla_auditoria = None
+
+    def auditar(self, accion, descripcion='', tabla=None, usuario=None, **contexto):
+        return auditar(
+            self.request, tabla or self.tabla_auditoria, accion, descripcion, usuario=usuario, **contexto
+        )
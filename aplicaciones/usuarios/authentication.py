@@ -1,20 +1,185 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 from .models import MultiToken
+from .perfil import obtener_perfil
+from . import tokens_firmados
 from rest_framework.authentication import SessionAuthentication
 
+
+# Relaciones que se traen junto al token en un solo JOIN:
+# usuario → rol → perfiles (superadmin, admin, profesor, estudiante, tutor)
+RELACIONES_PERFIL = (
+    'user__rol',
+    'user__superadmin',
+    'user__admin',
+    'user__profesor',
+    'user__estudiante',
+    'user__tutor',
+)
+
+
+class CacheTokens:
+    """
+    Caché en memoria del proceso: token → (usuario, token).
+    Acotada por cantidad de entradas (LRU) y por tiempo de vida (TTL).
+
+    Las invalidaciones (logout, borrado del token, usuario desactivado) solo
+    alcanzan al proceso que las ejecuta; los demás workers pueden aceptar el
+    token revocado hasta que venza su entrada, es decir, TTL segundos como mucho.
+    """
+
+    def __init__(self, ttl=None, max_entradas=None):
+        self._ttl = ttl
+        self._max_entradas = max_entradas
+        self._entradas = OrderedDict()   # key → (expira, usuario, token)
+        self._por_usuario = {}           # user_id → {keys}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is None:
+            return getattr(settings, 'MULTITOKEN_CACHE', {}).get('TTL', 15)
+        return self._ttl
+
+    @property
+    def max_entradas(self):
+        if self._max_entradas is None:
+            return getattr(settings, 'MULTITOKEN_CACHE', {}).get('MAX_ENTRADAS', 10000)
+        return self._max_entradas
+
+    def obtener(self, key):
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is None:
+                return None
+            expira, usuario, token = entrada
+            if expira < time.monotonic():
+                self._quitar(key)
+                return None
+            self._entradas.move_to_end(key)
+        # Copia superficial: cada request trabaja sobre su propia instancia
+        return copy.copy(usuario), token
+
+    def guardar(self, key, usuario, token):
+        if self.ttl <= 0 or self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._quitar(key)
+            self._entradas[key] = (time.monotonic() + self.ttl, usuario, token)
+            self._por_usuario.setdefault(usuario.pk, set()).add(key)
+            while len(self._entradas) > self.max_entradas:
+                self._quitar(next(iter(self._entradas)))
+
+    def invalidar(self, key):
+        with self._lock:
+            self._quitar(key)
+
+    def invalidar_usuario(self, user_id):
+        with self._lock:
+            for key in list(self._por_usuario.get(user_id, ())):
+                self._quitar(key)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_usuario.clear()
+
+    def _quitar(self, key):
+        entrada = self._entradas.pop(key, None)
+        if entrada is None:
+            return
+        user_id = entrada[1].pk
+        keys = self._por_usuario.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._por_usuario[user_id]
+
+
+cache_tokens = CacheTokens()
+
+
 class MultiTokenAuthentication(BaseAuthentication):
+    """
+    Autenticación unificada por `Authorization: Token <key>` o, en modo sin
+    estado, `Authorization: Bearer <jwt>` (ver tokens_firmados.py).
+    Resuelve token → usuario → perfil de rol en una sola consulta y
+    guarda el resultado en `cache_tokens` durante MULTITOKEN_CACHE['TTL'] segundos.
+    Rechaza tokens expirados y desliza su vencimiento según MULTITOKEN.
+    """
+    keyword = 'Token'
+
+    keyword_firmado = 'Bearer'
+
     def authenticate(self, request):
         auth = request.headers.get('Authorization')
-        if not auth or not auth.startswith("Token "):
+        if not auth:
+            return None
+        if auth.startswith(f"{self.keyword_firmado} "):
+            # Modo sin estado (JWT): convive con MultiToken mientras migran los clientes
+            if not tokens_firmados.activo():
+                return None
+            return tokens_firmados.autenticar(self._credencial(auth))
+        if not auth.startswith(f"{self.keyword} "):
             return None
-        token_key = auth.split(" ")[1]
+        return self.authenticate_credentials(self._credencial(auth))
+
+    def autenticar_credencial(self, crudo):
+        """
+        Para canales sin cabeceras (WebSocket, EventSource): la credencial llega
+        en la query string. Un JWT (tiene puntos) va por tokens_firmados.
+        """
+        if '.' in crudo:
+            if not tokens_firmados.activo():
+                raise exceptions.AuthenticationFailed("Token inválido.")
+            return tokens_firmados.autenticar(crudo)
+        return self.authenticate_credentials(crudo)
+
+    def _credencial(self, auth):
+        partes = auth.split()
+        if len(partes) != 2:
+            raise exceptions.AuthenticationFailed("Cabecera de token inválida.")
+        return partes[1]
+
+    def authenticate_credentials(self, token_key):
+        cacheado = cache_tokens.obtener(token_key)
+        if cacheado is None:
+            cacheado = self._cargar(token_key)
+        user, token = cacheado
+        self._verificar_vigencia(token)
+        return user, token
+
+    def _verificar_vigencia(self, token):
+        ahora = timezone.now()
+        if token.expirado(ahora):
+            cache_tokens.invalidar(token.key)
+            raise exceptions.AuthenticationFailed("Token expirado.")
+        # Un UPDATE como máximo cada MULTITOKEN['REFRESCO'] segundos, no uno por request
+        if token.debe_renovarse(ahora):
+            token.renovar(ahora)
+
+    def _cargar(self, token_key):
         try:
-            token = MultiToken.objects.get(key=token_key)
+            token = MultiToken.objects.select_related(*RELACIONES_PERFIL).get(key=token_key)
         except MultiToken.DoesNotExist:
             raise exceptions.AuthenticationFailed("Token inválido.")
-        return (token.user, token)
-    
+
+        user = token.user
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("Usuario inactivo o eliminado.")
+
+        # El perfil queda en user.perfil y viaja con las copias cacheadas
+        obtener_perfil(user)
+        cache_tokens.guardar(token_key, user, token)
+        return (copy.copy(user), token)
+
 class CsrfExemptSessionAuthentication(BaseAuthentication):
     """
     Igual que SessionAuthentication pero sin enforce_csrf,
@@ -0,0 +1,107 @@
+# usuarios/buffer.py
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BufferEscritura:
+    """
+    Cola en memoria que vacía lotes de escrituras desde un hilo de fondo.
+
+    • `agregar(item)` no toca la base de datos: solo encola.
+    • El hilo llama `vaciar(lote)` cada `intervalo_ms` o apenas la cola
+      alcanza `max_entradas`, lo que ocurra primero.
+    • Si `vaciar` falla, el lote se entrega a `respaldo(lote)` para no perderlo.
+    • Al terminar el proceso (atexit) se vacía lo pendiente.
+    """
+
+    def __init__(self, nombre, vaciar, max_entradas=100, intervalo_ms=500, respaldo=None):
+        self.nombre = nombre
+        self._vaciar = vaciar
+        self._respaldo = respaldo
+        self.max_entradas = max_entradas
+        self.intervalo_ms = intervalo_ms
+        self._cola = queue.Queue()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        atexit.register(self.detener)
+
+    # ── API ───────────────────────────────────────────────────
+    def agregar(self, item):
+        self._iniciar()
+        self._cola.put(item)
+        if self._cola.qsize() >= self.max_entradas:
+            self._despertar.set()
+
+    def pendientes(self):
+        return self._cola.qsize()
+
+    def vaciar(self):
+        """Vacía sincrónicamente todo lo encolado hasta ahora."""
+        while True:
+            lote = self._tomar_lote()
+            if not lote:
+                return
+            self._procesar(lote)
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        hilo = self._hilo
+        if hilo is not None and hilo.is_alive() and hilo is not threading.current_thread():
+            hilo.join(timeout=5)
+        self.vaciar()
+
+    # ── interno ───────────────────────────────────────────────
+    def _iniciar(self):
+        # Tras un fork (gunicorn) el hilo del proceso padre no existe en el hijo
+        if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+                return
+            self._pid = os.getpid()
+            self._detener.clear()
+            self._hilo = threading.Thread(
+                target=self._trabajar, name=f'buffer-{self.nombre}', daemon=True
+            )
+            self._hilo.start()
+
+    def _trabajar(self):
+        while not self._detener.is_set():
+            self._despertar.wait(self.intervalo_ms / 1000)
+            self._despertar.clear()
+            close_old_connections()
+            try:
+                self.vaciar()
+            finally:
+                close_old_connections()
+
+    def _tomar_lote(self):
+        lote = []
+        while len(lote) < self.max_entradas:
+            try:
+                lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _procesar(self, lote):
+        try:
+            self._vaciar(lote)
+        except Exception:
+            logger.exception("No se pudo vaciar el buffer %s (%s entradas)", self.nombre, len(lote))
+            if self._respaldo is not None:
+                try:
+                    self._respaldo(lote)
+                except Exception:
+                    logger.exception("Falló el respaldo del buffer %s", self.nombre)
@@ -0,0 +1,40 @@
+# usuarios/consumers.py
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import notificaciones
+
+
+class NotificacionConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket de notificaciones: ws/notificaciones/?token=<MultiToken o JWT>.
+    Al conectar envía el contador de no leídas y luego cada evento del grupo
+    del usuario (ver usuarios/notificaciones.py).
+    """
+
+    async def connect(self):
+        consulta = parse_qs(self.scope.get('query_string', b'').decode())
+        crudo = (consulta.get('token') or [''])[0]
+        self.user = await database_sync_to_async(notificaciones.autenticar_consulta)(crudo)
+        if self.user is None:
+            await self.close(code=4401)
+            return
+
+        self.grupo = notificaciones.grupo_usuario(self.user.pk)
+        await self.channel_layer.group_add(self.grupo, self.channel_name)
+        await self.accept()
+        await self.send_json(await database_sync_to_async(notificaciones.evento_contador)(self.user.pk))
+
+    async def disconnect(self, code):
+        if getattr(self, 'grupo', None):
+            await self.channel_layer.group_discard(self.grupo, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Canal de solo bajada; 'ping' permite al cliente comprobar la conexión
+        if content.get('accion') == 'ping':
+            await self.send_json({'evento': 'pong'})
+
+    async def notificacion_evento(self, event):
+        await self.send_json(event['datos'])
@@ -0,0 +1,231 @@
+# usuarios/difusion.py
+"""
+Difusión masiva de notificaciones.
+
+La audiencia es un selector con una sola clave:
+  {"usuarios": [ids]}
+  {"rol": id}
+  {"unidad": id, "perfil": "administradores|profesores|estudiantes|tutores"}
+  {"curso": id,  "perfil": "profesores|estudiantes|tutores"}
+  {"ausentes": "AAAA-MM-DD" | null, "perfil": "estudiantes|tutores"}   (faltas del día)
+("perfil" es opcional salvo en "ausentes", que por defecto avisa a los tutores.)
+
+Se resuelve en una única consulta sobre Usuario (subconsultas, sin bucles) y
+se inserta con bulk_create por lotes. Las audiencias grandes se procesan en
+segundo plano (cola_difusion); EnvioNotificacion es el identificador del trabajo.
+"""
+import logging
+from datetime import timedelta
+from string import Formatter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from . import membresias, notificaciones
+from .buffer import BufferEscritura
+from .models import EnvioNotificacion, Notificacion, Usuario, UsuarioUnidad
+
+logger = logging.getLogger(__name__)
+
+SELECTORES = ('usuarios', 'rol', 'unidad', 'curso', 'ausentes')
+PERFILES_UNIDAD = {
+    'administradores': membresias.ADMIN,
+    'profesores': membresias.PROFESOR,
+    'estudiantes': membresias.ESTUDIANTE,
+    'tutores': membresias.TUTOR,
+}
+CAMPOS_PLANTILLA = ('nombre', 'apellido', 'username')
+
+
+def _config():
+    return getattr(settings, 'DIFUSION_NOTIFICACIONES', {})
+
+
+# ── audiencia ─────────────────────────────────────────────────
+def _perfil(audiencia, permitidos, defecto=None):
+    perfil = audiencia.get('perfil') or defecto
+    if perfil is not None and perfil not in permitidos:
+        raise ValidationError({'perfil': f"Debe ser uno de: {', '.join(permitidos)}"})
+    return perfil
+
+
+def _filtro_curso(curso_id, perfil):
+    Estudiante = apps.get_model('estudiantes', 'Estudiante')
+    TutorEstudiante = apps.get_model('estudiantes', 'TutorEstudiante')
+    Curso = apps.get_model('academico', 'Curso')
+    MateriaCurso = apps.get_model('academico', 'MateriaCurso')
+
+    filtros = {
+        'estudiantes': Q(pk__in=Estudiante.objects.filter(curso_id=curso_id).values('usuario_id')),
+        'tutores': Q(pk__in=TutorEstudiante.objects.filter(estudiante__curso_id=curso_id).values('tutor_id')),
+        'profesores': (
+            Q(pk__in=MateriaCurso.objects.filter(curso_id=curso_id).values('profesor_id'))
+            | Q(pk__in=Curso.objects.filter(pk=curso_id).values('tutor_id'))
+        ),
+    }
+    if perfil:
+        return filtros[perfil]
+    return filtros['estudiantes'] | filtros['tutores'] | filtros['profesores']
+
+
+def _filtro_ausentes(fecha, perfil):
+    AsistenciaGeneral = apps.get_model('asistencia', 'AsistenciaGeneral')
+    TutorEstudiante = apps.get_model('estudiantes', 'TutorEstudiante')
+
+    ausentes = AsistenciaGeneral.objects.filter(fecha=fecha, estado='FAL').values('estudiante_id')
+    if perfil == 'estudiantes':
+        return Q(pk__in=ausentes)
+    return Q(pk__in=TutorEstudiante.objects.filter(estudiante_id__in=ausentes).values('tutor_id'))
+
+
+def _id(valor, clave):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValidationError({clave: 'Debe ser un id numérico.'})
+
+
+def filtro_audiencia(audiencia):
+    """Q sobre Usuario que selecciona a los destinatarios de la audiencia."""
+    if not isinstance(audiencia, dict):
+        raise ValidationError({'audiencia': 'Se espera un objeto.'})
+    claves = [clave for clave in SELECTORES if clave in audiencia]
+    if len(claves) != 1:
+        raise ValidationError({'audiencia': f"Indique exactamente uno de: {', '.join(SELECTORES)}"})
+    clave = claves[0]
+    valor = audiencia[clave]
+
+    if clave == 'usuarios':
+        if not isinstance(valor, list):
+            raise ValidationError({'usuarios': 'Se espera una lista de ids.'})
+        return Q(pk__in=[_id(usuario_id, 'usuarios') for usuario_id in valor])
+    if clave == 'rol':
+        return Q(rol_id=_id(valor, 'rol'))
+    if clave == 'unidad':
+        perfil = _perfil(audiencia, PERFILES_UNIDAD)
+        membresias_unidad = UsuarioUnidad.objects.filter(unidad_id=_id(valor, 'unidad'))
+        if perfil:
+            membresias_unidad = membresias_unidad.filter(tipo=PERFILES_UNIDAD[perfil])
+        return Q(pk__in=membresias_unidad.values('usuario_id'))
+    if clave == 'curso':
+        return _filtro_curso(_id(valor, 'curso'), _perfil(audiencia, ('profesores', 'estudiantes', 'tutores')))
+
+    fecha = parse_date(valor) if valor else timezone.localdate()
+    if fecha is None:
+        raise ValidationError({'ausentes': 'Fecha inválida (AAAA-MM-DD).'})
+    return _filtro_ausentes(fecha, _perfil(audiencia, ('estudiantes', 'tutores'), defecto='tutores'))
+
+
+def destinatarios(audiencia):
+    return Usuario.objects.filter(filtro_audiencia(audiencia), is_active=True)
+
+
+# ── plantilla ─────────────────────────────────────────────────
+def validar_plantilla(texto, campo):
+    try:
+        nombres = {nombre for _, nombre, _, _ in Formatter().parse(texto) if nombre is not None}
+    except ValueError:
+        raise ValidationError({campo: 'Plantilla mal formada.'})
+    desconocidos = nombres - set(CAMPOS_PLANTILLA)
+    if desconocidos:
+        raise ValidationError({campo: f"Campos no válidos: {', '.join(sorted(desconocidos))}. "
+                                      f"Disponibles: {', '.join(CAMPOS_PLANTILLA)}"})
+    return bool(nombres)
+
+
+# ── trabajo ───────────────────────────────────────────────────
+def crear_envio(usuario, audiencia, titulo, mensaje, tipo='aviso'):
+    """Valida, cuenta destinatarios y procesa ya o encola según DIFUSION_NOTIFICACIONES['UMBRAL_FONDO']."""
+    if not titulo or not mensaje:
+        raise ValidationError('Se requieren titulo y mensaje.')
+    validar_plantilla(titulo, 'titulo')
+    validar_plantilla(mensaje, 'mensaje')
+    total = destinatarios(audiencia).count()
+
+    envio = EnvioNotificacion.objects.create(
+        creado_por=usuario, audiencia=audiencia, titulo=titulo[:100],
+        mensaje=mensaje, tipo=tipo[:50], total=total,
+    )
+    if total <= _config().get('UMBRAL_FONDO', 500):
+        procesar(envio.pk)
+        envio.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: cola_difusion.agregar(envio.pk))
+    return envio
+
+
+def reclamar(envio_id):
+    """
+    Toma el envío con un UPDATE condicional: solo si está pendiente o si quien lo
+    procesaba dejó de dar señales (latido más viejo que ABANDONO_SEG). Devuelve
+    False si otro hilo o proceso lo tiene en curso o ya terminó.
+    """
+    ahora = timezone.now()
+    abandonado = ahora - timedelta(seconds=_config().get('ABANDONO_SEG', 300))
+    return bool(
+        EnvioNotificacion.objects.filter(pk=envio_id)
+        .filter(Q(estado='PEN') | Q(estado='PRO', latido__lt=abandonado) | Q(estado='PRO', latido__isnull=True))
+        .update(estado='PRO', latido=ahora)
+    )
+
+
+def procesar(envio_id):
+    """
+    Inserta las notificaciones por lotes en orden de usuario. Cada lote se arma
+    con el cursor leído bajo bloqueo de la fila del envío (select_for_update) y
+    se confirma junto con el avance: si se interrumpe, se retoma donde quedó, y
+    dos procesos que coincidan no repiten destinatarios.
+    Devuelve el envío, o None si no se pudo reclamar.
+    """
+    if not reclamar(envio_id):
+        return None
+    envio = EnvioNotificacion.objects.get(pk=envio_id)
+
+    lote_max = _config().get('LOTE', 1000)
+    con_campos = validar_plantilla(envio.titulo, 'titulo') | validar_plantilla(envio.mensaje, 'mensaje')
+    filas = destinatarios(envio.audiencia).order_by('pk').values_list('pk', *CAMPOS_PLANTILLA)
+    try:
+        while True:
+            with transaction.atomic():
+                envio = EnvioNotificacion.objects.select_for_update().get(pk=envio_id)
+                lote = list(filas.filter(pk__gt=envio.ultimo_usuario_id)[:lote_max])
+                if not lote:
+                    break
+                nuevas = []
+                for usuario_id, *valores in lote:
+                    titulo, mensaje = envio.titulo, envio.mensaje
+                    if con_campos:
+                        campos = dict(zip(CAMPOS_PLANTILLA, valores))
+                        titulo, mensaje = titulo.format_map(campos)[:100], mensaje.format_map(campos)
+                    nuevas.append(Notificacion(usuario_id=usuario_id, titulo=titulo, mensaje=mensaje, tipo=envio.tipo))
+
+                creadas = Notificacion.objects.crear_lote(nuevas)
+                envio.enviados += len(creadas)
+                envio.ultimo_usuario_id = lote[-1][0]
+                envio.latido = timezone.now()
+                envio.save(update_fields=['enviados', 'ultimo_usuario_id', 'latido'])
+            # crear_lote usa bulk_create (sin post_save): se publica el lote completo
+            transaction.on_commit(lambda creadas=creadas: notificaciones.publicar_lote(creadas))
+    except Exception as error:
+        logger.exception("Falló el envío de notificaciones %s", envio_id)
+        EnvioNotificacion.objects.filter(pk=envio_id).update(estado='ERR', error=str(error))
+        envio.refresh_from_db()
+        return envio
+
+    envio.estado, envio.finalizado = 'COM', timezone.now()
+    envio.save(update_fields=['estado', 'finalizado'])
+    return envio
+
+
+def _procesar_cola(envio_ids):
+    for envio_id in envio_ids:
+        procesar(envio_id)
+
+
+# Un envío por vez, apenas se encola
+cola_difusion = BufferEscritura('difusion', _procesar_cola, max_entradas=1, intervalo_ms=1000)
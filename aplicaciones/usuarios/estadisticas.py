@@ -0,0 +1,85 @@
+# usuarios/estadisticas.py
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import Bitacora
+
+TRUNCAR = {
+    'dia': TruncDay,
+    'hora': TruncHour,
+}
+
+# Una ventana que terminó hace más de este margen ya no recibe filas
+# (la bitácora se escribe en diferido, ver BITACORA_BUFFER)
+MARGEN_CIERRE = timedelta(minutes=1)
+CACHE_TTL = 60 * 60 * 24
+LIMITE_USUARIOS = 50
+
+
+def filtrar_bitacora(qs, desde=None, hasta=None, usuario_id=None, ip=None):
+    if desde is not None:
+        qs = qs.filter(hora_entrada__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(hora_entrada__lt=hasta)
+    if usuario_id:
+        qs = qs.filter(usuario_id=usuario_id)
+    if ip:
+        qs = qs.filter(ip=ip)
+    return qs
+
+
+def _clave_cache(desde, hasta, usuario_id, ip, agrupar):
+    partes = f'{desde.isoformat()}|{hasta.isoformat()}|{usuario_id or ""}|{ip or ""}|{agrupar}'
+    return 'usuarios:bitacora:estadisticas:' + hashlib.md5(partes.encode()).hexdigest()
+
+
+def estadisticas_bitacora(desde, hasta, usuario_id=None, ip=None, agrupar='dia'):
+    """
+    Agregados de la bitácora en [desde, hasta): totales por usuario, tabla,
+    acción y por día/hora. Las ventanas cerradas se cachean: ya no cambian.
+    """
+    cerrada = hasta <= timezone.now() - MARGEN_CIERRE
+    clave = _clave_cache(desde, hasta, usuario_id, ip, agrupar)
+    if cerrada:
+        resultado = cache.get(clave)
+        if resultado is not None:
+            return resultado
+
+    qs = filtrar_bitacora(Bitacora.objects.order_by(), desde, hasta, usuario_id, ip)
+
+    por_accion = list(qs.values('accion').annotate(total=Count('id')).order_by('-total'))
+    por_tabla = list(qs.values('tabla_afectada').annotate(total=Count('id')).order_by('-total'))
+    por_usuario = list(
+        qs.values('usuario_id', 'usuario__username')
+        .annotate(total=Count('id'))
+        .order_by('-total')[:LIMITE_USUARIOS]
+    )
+    por_periodo = [
+        {'periodo': fila['periodo'].isoformat(), 'total': fila['total']}
+        for fila in qs.annotate(periodo=TRUNCAR[agrupar]('hora_entrada'))
+        .values('periodo')
+        .annotate(total=Count('id'))
+        .order_by('periodo')
+    ]
+
+    resultado = {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'agrupar': agrupar,
+        'total': sum(fila['total'] for fila in por_accion),
+        'por_usuario': [
+            {'usuario': fila['usuario_id'], 'username': fila['usuario__username'], 'total': fila['total']}
+            for fila in por_usuario
+        ],
+        'por_tabla': por_tabla,
+        'por_accion': por_accion,
+        'por_periodo': por_periodo,
+    }
+    if cerrada:
+        cache.set(clave, resultado, CACHE_TTL)
+    return resultado
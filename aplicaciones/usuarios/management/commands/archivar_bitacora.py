@@ -0,0 +1,163 @@
+# usuarios/management/commands/archivar_bitacora.py
+import gzip
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from aplicaciones.usuarios import particiones
+from aplicaciones.usuarios.models import Bitacora
+
+CAMPOS = (
+    'id', 'usuario_id', 'hora_entrada', 'hora_salida', 'ip',
+    'tabla_afectada', 'accion', 'descripcion', 'fecha',
+)
+LOTE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea por adelantado las particiones mensuales de la bitácora y archiva "
+        "en JSONL comprimido los meses que quedan fuera de la ventana de retención."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, help='Meses que se conservan en línea.')
+        parser.add_argument('--adelante', type=int, help='Particiones futuras a crear (PostgreSQL).')
+        parser.add_argument('--directorio', help='Destino de los archivos .jsonl.gz.')
+        parser.add_argument('--simular', action='store_true', help='Solo informa, no modifica nada.')
+
+    def handle(self, *args, **opciones):
+        config = getattr(settings, 'BITACORA_RETENCION', {})
+        meses = opciones['meses'] if opciones['meses'] is not None else config.get('MESES', 12)
+        adelante = opciones['adelante'] if opciones['adelante'] is not None else config.get('MESES_ADELANTE', 3)
+        directorio = (
+            opciones['directorio']
+            or config.get('DIRECTORIO')
+            or os.path.join(settings.MEDIA_ROOT, 'bitacora_archivo')
+        )
+        self.simular = opciones['simular']
+        corte = particiones.sumar_meses(particiones.inicio_mes(), -meses)
+        if not self.simular:
+            os.makedirs(directorio, exist_ok=True)
+
+        if particiones.soporta_particiones(connection):
+            with connection.cursor() as cursor:
+                if particiones.esta_particionada(cursor):
+                    self._archivar_particiones(cursor, corte, adelante, directorio)
+
+        # Filas anteriores al corte que no están en una partición mensual
+        # (partición por defecto en PostgreSQL, tabla plana en SQLite)
+        self._archivar_filas(corte, directorio)
+
+    # ── PostgreSQL ────────────────────────────────────────────
+    def _archivar_particiones(self, cursor, corte, adelante, directorio):
+        if not self.simular:
+            with transaction.atomic():
+                for nombre in particiones.asegurar_particiones(cursor, particiones.inicio_mes(), adelante):
+                    self.stdout.write(f"Partición creada: {nombre}")
+
+        for inicio, nombre in particiones.particiones(cursor):
+            if particiones.sumar_meses(inicio, 1) > corte:
+                break
+            if self.simular:
+                self.stdout.write(f"Se archivaría la partición {nombre}")
+                continue
+            ruta = os.path.join(directorio, f'{nombre}.jsonl.gz')
+            # Volcado, DETACH y DROP en una transacción: si el volcado falla no se pierde nada
+            with self._archivo(ruta) as temporal, transaction.atomic():
+                total = self._volcar(self._filas_particion(nombre), temporal)
+                particiones.separar_particion(cursor, nombre)
+            self.stdout.write(self.style.SUCCESS(f"{nombre}: {total} filas → {ruta}"))
+
+    def _filas_particion(self, nombre):
+        qn = connection.ops.quote_name
+        columnas = ', '.join('host(ip)' if campo == 'ip' else qn(campo) for campo in CAMPOS)
+        # Cursor del lado del servidor: el mes no se carga entero en memoria
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(f'SELECT {columnas} FROM {qn(nombre)} ORDER BY id')
+            while True:
+                filas = cursor.fetchmany(LOTE)
+                if not filas:
+                    return
+                for fila in filas:
+                    yield dict(zip(CAMPOS, fila))
+
+    # ── tabla plana / partición por defecto ───────────────────
+    def _archivar_filas(self, corte, directorio):
+        primera = (
+            Bitacora.objects.filter(hora_entrada__lt=corte)
+            .order_by('hora_entrada')
+            .values_list('hora_entrada', flat=True)
+            .first()
+        )
+        if primera is None:
+            return
+
+        inicio = particiones.inicio_mes(primera)
+        while inicio < corte:
+            fin = particiones.sumar_meses(inicio, 1)
+            mes = Bitacora.objects.filter(hora_entrada__gte=inicio, hora_entrada__lt=fin).order_by()
+            if self.simular:
+                self.stdout.write(f"Se archivarían {mes.count()} filas de {inicio:%Y-%m}")
+            else:
+                self._archivar_mes(mes, os.path.join(directorio, f'{particiones.nombre_particion(inicio)}.jsonl.gz'))
+            inicio = fin
+
+    def _archivar_mes(self, mes, ruta):
+        if not mes.exists():
+            return
+        ultimo = {'id': None}
+
+        def filas():
+            for fila in mes.order_by('id').values(*CAMPOS).iterator(chunk_size=LOTE):
+                ultimo['id'] = fila['id']
+                yield fila
+
+        with self._archivo(ruta) as temporal, transaction.atomic():
+            total = self._volcar(filas(), temporal)
+            # Solo se borra lo que quedó volcado en el archivo, en lotes
+            volcadas = mes.filter(id__lte=ultimo['id'])
+            while True:
+                ids = list(volcadas.values_list('id', flat=True)[:LOTE])
+                if not ids:
+                    break
+                Bitacora.objects.filter(id__in=ids).delete()
+        self.stdout.write(self.style.SUCCESS(f"{total} filas → {ruta}"))
+
+    # ── archivo ───────────────────────────────────────────────
+    @contextmanager
+    def _archivo(self, ruta):
+        """
+        Volcado a un archivo temporal que solo se publica en `ruta` si el bloque
+        (DETACH/DROP o borrado) se confirmó: una corrida fallida no deja filas
+        en el archivo que la siguiente volvería a volcar. Si el mes ya tenía
+        archivo se le agrega el temporal como un miembro gzip más.
+        """
+        temporal = f'{ruta}.{os.getpid()}.{time.time_ns()}.tmp'
+        try:
+            yield temporal
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        if not os.path.exists(ruta):
+            os.replace(temporal, ruta)
+            return
+        with open(temporal, 'rb') as origen, open(ruta, 'ab') as destino:
+            shutil.copyfileobj(origen, destino)
+        os.remove(temporal)
+
+    def _volcar(self, filas, ruta):
+        total = 0
+        with gzip.open(ruta, 'wt', encoding='utf-8') as archivo:
+            for fila in filas:
+                archivo.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                total += 1
+        return total
@@ -0,0 +1,21 @@
+# usuarios/management/commands/procesar_envios.py
+from django.core.management.base import BaseCommand
+
+from aplicaciones.usuarios import difusion
+from aplicaciones.usuarios.models import EnvioNotificacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Retoma los envíos masivos de notificaciones pendientes o interrumpidos "
+        "(p. ej. tras reiniciar el servidor con envíos en segundo plano). Omite los que otro "
+        "proceso sigue procesando (latido reciente)."
+    )
+
+    def handle(self, *args, **opciones):
+        for envio_id in EnvioNotificacion.objects.filter(estado__in=('PEN', 'PRO')).values_list('pk', flat=True):
+            envio = difusion.procesar(envio_id)
+            if envio is None:
+                self.stdout.write(f"Envío {envio_id}: en curso en otro proceso, se omite")
+                continue
+            self.stdout.write(f"Envío {envio.pk}: {envio.get_estado_display()} ({envio.enviados}/{envio.total})")
@@ -0,0 +1,34 @@
+# usuarios/management/commands/purgar_notificaciones.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aplicaciones.usuarios.models import Notificacion
+
+LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = "Elimina en lotes las notificaciones leídas más antiguas que la retención (pensado para cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Días que se conservan las notificaciones leídas.')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Notificaciones eliminadas por transacción.')
+
+    def handle(self, *args, **opciones):
+        dias = opciones['dias']
+        if dias is None:
+            dias = getattr(settings, 'NOTIFICACION_RETENCION', {}).get('DIAS', 90)
+        lote = opciones['lote']
+        # Solo leídas: los contadores de no leídas no cambian
+        viejas = Notificacion.objects.filter(leida=True, fecha__lt=timezone.now() - timedelta(days=dias)).order_by('pk')
+        total = 0
+        while True:
+            ids = list(viejas.values_list('pk', flat=True)[:lote])
+            if not ids:
+                break
+            Notificacion.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+        self.stdout.write(self.style.SUCCESS(f"Notificaciones leídas eliminadas: {total}"))
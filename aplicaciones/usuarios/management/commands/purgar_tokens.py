@@ -0,0 +1,33 @@
+# usuarios/management/commands/purgar_tokens.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aplicaciones.usuarios.models import MultiToken, RevocacionTokens, TokenDenegado
+
+LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = "Elimina en lotes los MultiToken expirados y la denylist de JWT vencida (pensado para cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE, help='Tokens eliminados por transacción.')
+
+    def handle(self, *args, **opciones):
+        lote = opciones['lote']
+        expirados = MultiToken.objects.filter(expires__lte=timezone.now()).order_by('expires')
+        total = 0
+        # Lotes cortos por clave: no bloquea la tabla que usa la autenticación
+        while True:
+            keys = list(expirados.values_list('key', flat=True)[:lote])
+            if not keys:
+                break
+            MultiToken.objects.filter(key__in=keys).delete()
+            total += len(keys)
+        self.stdout.write(self.style.SUCCESS(f"Tokens expirados eliminados: {total}"))
+
+        # Denylist de JWT: pasada la expiración el token ya se rechaza por sí mismo
+        ahora = timezone.now()
+        denegados, _ = TokenDenegado.objects.filter(expira__lte=ahora).delete()
+        revocaciones, _ = RevocacionTokens.objects.filter(expira__lte=ahora).delete()
+        self.stdout.write(self.style.SUCCESS(f"Entradas de denylist vencidas eliminadas: {denegados + revocaciones}"))
@@ -0,0 +1,15 @@
+# usuarios/management/commands/reconstruir_membresias.py
+from django.core.management.base import BaseCommand
+
+from aplicaciones.usuarios import membresias
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera UsuarioUnidad desde Admin, Profesor, Estudiante y TutorEstudiante "
+        "(por ejemplo tras cargas masivas con update()/bulk_create, que no disparan señales)."
+    )
+
+    def handle(self, *args, **opciones):
+        total = membresias.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Membresías reconstruidas: {total}"))
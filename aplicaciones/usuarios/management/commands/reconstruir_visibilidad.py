@@ -0,0 +1,15 @@
+# usuarios/management/commands/reconstruir_visibilidad.py
+from django.core.management.base import BaseCommand
+
+from aplicaciones.usuarios import visibilidad
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera VisibilidadEstudiante desde TutorEstudiante, Curso.tutor y MateriaCurso "
+        "(por ejemplo tras cargas masivas con update()/bulk_create, que no disparan señales)."
+    )
+
+    def handle(self, *args, **opciones):
+        total = visibilidad.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Filas de visibilidad reconstruidas: {total}"))
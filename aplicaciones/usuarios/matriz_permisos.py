@@ -0,0 +1,233 @@
+# usuarios/matriz_permisos.py
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import PermisoRol, PermisoPuesto, ModeloPermitido, Accion
+from .versiones import VersionCompartida
+
+CLAVE_VERSION = 'usuarios:matriz_permisos:version'
+
+_VACIO = frozenset()
+
+
+class MatrizPermisos:
+    """
+    Matriz compilada de permisos en memoria:
+      • por_rol[rol_id]       → frozenset{(modelo, accion), ...}
+      • por_puesto[puesto_id] → frozenset{(modelo, accion), ...}
+      • todos                 → ModeloPermitido × Accion (lo que ve el SuperAdmin)
+
+    Se carga una vez (dos consultas) y se marca con una versión. La versión
+    vive en la caché compartida (settings.CACHES) y cada proceso la relee cada
+    pocos segundos (usuarios/versiones.py), así que una invalidación en un
+    proceso obliga a recargar al resto sin tocar la caché en cada consulta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._por_rol = {}
+        self._por_puesto = {}
+        self._todos = _VACIO
+        self._efectivos = {}
+        self._local = threading.local()
+        self._compartida = VersionCompartida(CLAVE_VERSION)
+
+    # ── versión ───────────────────────────────────────────────
+    def _version_actual(self):
+        return self._compartida.actual()
+
+    @property
+    def version(self):
+        self._asegurar()
+        return self._version
+
+    def invalidar(self):
+        self._compartida.invalidar()
+        with self._lock:
+            self._version = None
+
+    def programar_invalidacion(self):
+        """Invalida tras el commit; dentro de `en_lote()` se acumula en una sola."""
+        if getattr(self._local, 'lote', 0):
+            return
+        transaction.on_commit(self.invalidar)
+
+    @contextmanager
+    def en_lote(self):
+        self._local.lote = getattr(self._local, 'lote', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.lote -= 1
+        if not self._local.lote:
+            transaction.on_commit(self.invalidar)
+
+    # ── carga ─────────────────────────────────────────────────
+    def _asegurar(self):
+        version = self._version_actual()
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            self._por_rol = self._compilar(
+                PermisoRol.objects.values_list('rol_id', 'modelo__nombre', 'accion__nombre')
+            )
+            self._por_puesto = self._compilar(
+                PermisoPuesto.objects.values_list('puesto_id', 'modelo__nombre', 'accion__nombre')
+            )
+            acciones = list(Accion.objects.values_list('nombre', flat=True))
+            self._todos = frozenset(
+                (modelo, accion)
+                for modelo in ModeloPermitido.objects.values_list('nombre', flat=True)
+                for accion in acciones
+            )
+            self._efectivos = {}
+            self._version = version
+
+    @staticmethod
+    def _compilar(filas):
+        agrupado = {}
+        for clave, modelo, accion in filas:
+            agrupado.setdefault(clave, set()).add((modelo, accion))
+        return {clave: frozenset(pares) for clave, pares in agrupado.items()}
+
+    # ── consultas ─────────────────────────────────────────────
+    def permisos_rol(self, rol_id):
+        self._asegurar()
+        return self._por_rol.get(rol_id, _VACIO)
+
+    def permisos_puesto(self, puesto_id):
+        self._asegurar()
+        return self._por_puesto.get(puesto_id, _VACIO)
+
+    def catalogo(self):
+        self._asegurar()
+        return self._todos
+
+    def matriz_roles(self):
+        self._asegurar()
+        return self._por_rol
+
+    def matriz_puestos(self):
+        self._asegurar()
+        return self._por_puesto
+
+    def permite_rol(self, rol_id, modelo, accion):
+        return (modelo, accion) in self.permisos_rol(rol_id)
+
+    def permite_puesto(self, puesto_id, modelo, accion):
+        return (modelo, accion) in self.permisos_puesto(puesto_id)
+
+    # ── permisos efectivos (frontend) ─────────────────────────
+    def permisos_perfil(self, perfil):
+        """Pares (modelo, accion) que PermisoPorPuesto / PermisoPorRol conceden al perfil."""
+        if perfil.es_superadmin:
+            return self.catalogo()
+        if perfil.es_admin:
+            return self.permisos_puesto(perfil.puesto_id)
+        return self.permisos_rol(perfil.rol_id)
+
+    def efectivos(self, perfil):
+        """
+        ({modelo: [acciones]}, etag) del perfil. El etag es un hash del contenido:
+        solo cambia cuando cambia ese conjunto, no con cada invalidación.
+        """
+        pares = self.permisos_perfil(perfil)
+        clave = (perfil.es_superadmin, pares)
+        resultado = self._efectivos.get(clave)
+        if resultado is None:
+            agrupado = {}
+            for modelo, accion in sorted(pares):
+                agrupado.setdefault(modelo, []).append(accion)
+            firma = repr((perfil.es_superadmin, sorted(pares))).encode()
+            resultado = (agrupado, hashlib.md5(firma).hexdigest())
+            self._efectivos[clave] = resultado
+        return resultado
+
+
+matriz_permisos = MatrizPermisos()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Edición en lote (matriz puesto/rol × modelo × acción)
+# ──────────────────────────────────────────────────────────────
+def serializar_matriz(matriz):
+    """{sujeto_id: frozenset{(modelo, accion)}} → {"id": {modelo: [acciones]}}."""
+    resultado = {}
+    for sujeto_id, pares in matriz.items():
+        agrupado = resultado.setdefault(str(sujeto_id), {})
+        for modelo, accion in sorted(pares):
+            agrupado.setdefault(modelo, []).append(accion)
+    return resultado
+
+
+def _expandir(bloque, modelos, acciones, clave):
+    """{"id": {modelo: [acciones]}} → {(sujeto_id, modelo_id, accion_id)}; valida nombres."""
+    if not isinstance(bloque, dict):
+        raise ValidationError({clave: 'Se espera {id: {modelo: [acciones]}}.'})
+    filas = set()
+    for sujeto_id, por_modelo in bloque.items():
+        try:
+            sujeto_id = int(sujeto_id)
+        except (TypeError, ValueError):
+            raise ValidationError({clave: f'Id inválido: {sujeto_id}'})
+        if not isinstance(por_modelo, dict):
+            raise ValidationError({clave: 'Se espera {id: {modelo: [acciones]}}.'})
+        for modelo, nombres in por_modelo.items():
+            if modelo not in modelos:
+                raise ValidationError({clave: f'Modelo desconocido: {modelo}'})
+            for accion in nombres:
+                if accion not in acciones:
+                    raise ValidationError({clave: f'Acción desconocida: {accion}'})
+                filas.add((sujeto_id, modelos[modelo], acciones[accion]))
+    return filas
+
+
+def aplicar_cambios(modelo_permiso, campo, otorgar, revocar):
+    """
+    Aplica un diff de permisos (PermisoPuesto con campo='puesto' o PermisoRol
+    con campo='rol') en una transacción: bulk_create de lo nuevo, un DELETE
+    para lo revocado y una única invalidación de la matriz al confirmar.
+    """
+    modelos = dict(ModeloPermitido.objects.values_list('nombre', 'id'))
+    acciones = dict(Accion.objects.values_list('nombre', 'id'))
+    otorgar = _expandir(otorgar or {}, modelos, acciones, 'otorgar')
+    revocar = _expandir(revocar or {}, modelos, acciones, 'revocar')
+    if otorgar & revocar:
+        raise ValidationError('Un mismo permiso no puede otorgarse y revocarse a la vez.')
+
+    sujetos = {fila[0] for fila in otorgar | revocar}
+    Sujeto = modelo_permiso._meta.get_field(campo).related_model
+    existentes_ids = set(Sujeto.objects.filter(pk__in=sujetos).values_list('pk', flat=True))
+    if sujetos - existentes_ids:
+        raise ValidationError({campo: f'No existen: {sorted(sujetos - existentes_ids)}'})
+
+    campo_id = f'{campo}_id'
+    with transaction.atomic(), matriz_permisos.en_lote():
+        revocados = 0
+        if revocar:
+            filtro = Q()
+            for sujeto_id, modelo_id, accion_id in revocar:
+                filtro |= Q(**{campo_id: sujeto_id, 'modelo_id': modelo_id, 'accion_id': accion_id})
+            revocados, _ = modelo_permiso.objects.filter(filtro).delete()
+
+        nuevos = []
+        if otorgar:
+            existentes = set(
+                modelo_permiso.objects.filter(**{f'{campo_id}__in': {fila[0] for fila in otorgar}})
+                .values_list(campo_id, 'modelo_id', 'accion_id')
+            )
+            nuevos = [
+                modelo_permiso(**{campo_id: sujeto_id, 'modelo_id': modelo_id, 'accion_id': accion_id})
+                for sujeto_id, modelo_id, accion_id in otorgar - existentes
+            ]
+            modelo_permiso.objects.bulk_create(nuevos, ignore_conflicts=True)
+
+    return {'otorgados': len(nuevos), 'revocados': revocados}
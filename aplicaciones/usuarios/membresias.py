@@ -0,0 +1,86 @@
+# usuarios/membresias.py
+"""
+Mantenimiento de UsuarioUnidad (usuario → unidad educativa por tipo de perfil).
+
+• ADM / PRO / EST: una fila según `unidad` del perfil.
+• TUT: una fila por cada unidad donde el tutor tiene al menos un estudiante.
+
+Las señales (usuarios/signals.py) llaman a estas funciones dentro de la misma
+transacción que el cambio; `reconstruir()` regenera la tabla completa.
+"""
+from django.apps import apps as apps_globales
+from django.db import transaction
+
+ADMIN, PROFESOR, ESTUDIANTE, TUTOR = 'ADM', 'PRO', 'EST', 'TUT'
+
+
+def _modelo():
+    return apps_globales.get_model('usuarios', 'UsuarioUnidad')
+
+
+def sincronizar_perfil(usuario_id, tipo, unidad_id):
+    """Perfil con una sola unidad (Admin, Profesor, Estudiante)."""
+    UsuarioUnidad = _modelo()
+    UsuarioUnidad.objects.filter(usuario_id=usuario_id, tipo=tipo).exclude(unidad_id=unidad_id).delete()
+    if unidad_id is not None:
+        UsuarioUnidad.objects.get_or_create(usuario_id=usuario_id, tipo=tipo, unidad_id=unidad_id)
+
+
+def quitar_perfil(usuario_id, tipo):
+    _modelo().objects.filter(usuario_id=usuario_id, tipo=tipo).delete()
+
+
+def sincronizar_tutores(tutor_ids):
+    """Recalcula las unidades de cada tutor a partir de sus estudiantes."""
+    UsuarioUnidad = _modelo()
+    TutorEstudiante = apps_globales.get_model('estudiantes', 'TutorEstudiante')
+    tutor_ids = set(tutor_ids)
+    if not tutor_ids:
+        return
+
+    esperadas = set(
+        TutorEstudiante.objects.filter(tutor_id__in=tutor_ids, estudiante__unidad__isnull=False)
+        .values_list('tutor_id', 'estudiante__unidad_id')
+        .distinct()
+    )
+    actuales = set(
+        UsuarioUnidad.objects.filter(usuario_id__in=tutor_ids, tipo=TUTOR)
+        .values_list('usuario_id', 'unidad_id')
+    )
+    for usuario_id, unidad_id in actuales - esperadas:
+        UsuarioUnidad.objects.filter(usuario_id=usuario_id, unidad_id=unidad_id, tipo=TUTOR).delete()
+    UsuarioUnidad.objects.bulk_create(
+        [UsuarioUnidad(usuario_id=u, unidad_id=un, tipo=TUTOR) for u, un in esperadas - actuales],
+        ignore_conflicts=True,
+    )
+
+
+def filas_esperadas(apps=apps_globales):
+    """(usuario_id, unidad_id, tipo) de todas las membresías según los perfiles."""
+    Admin = apps.get_model('usuarios', 'Admin')
+    Profesor = apps.get_model('personal', 'Profesor')
+    Estudiante = apps.get_model('estudiantes', 'Estudiante')
+    TutorEstudiante = apps.get_model('estudiantes', 'TutorEstudiante')
+
+    for modelo, tipo in ((Admin, ADMIN), (Profesor, PROFESOR), (Estudiante, ESTUDIANTE)):
+        for usuario_id, unidad_id in modelo.objects.filter(unidad__isnull=False).values_list('usuario_id', 'unidad_id'):
+            yield usuario_id, unidad_id, tipo
+    tutores = (
+        TutorEstudiante.objects.filter(estudiante__unidad__isnull=False)
+        .values_list('tutor_id', 'estudiante__unidad_id')
+        .distinct()
+    )
+    for usuario_id, unidad_id in tutores:
+        yield usuario_id, unidad_id, TUTOR
+
+
+def reconstruir(apps=apps_globales):
+    UsuarioUnidad = apps.get_model('usuarios', 'UsuarioUnidad')
+    filas = [
+        UsuarioUnidad(usuario_id=usuario_id, unidad_id=unidad_id, tipo=tipo)
+        for usuario_id, unidad_id, tipo in filas_esperadas(apps)
+    ]
+    with transaction.atomic():
+        UsuarioUnidad.objects.all().delete()
+        UsuarioUnidad.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 07:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_alter_accion_options_alter_modelopermitido_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bitacora',
+            name='hora_entrada',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Hora de entrada'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+from aplicaciones.usuarios import particiones
+
+
+def particionar_bitacora(apps, schema_editor):
+    # Solo PostgreSQL: en SQLite la tabla queda plana
+    if not particiones.soporta_particiones(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        particiones.particionar(cursor)
+
+
+def desparticionar_bitacora(apps, schema_editor):
+    if not particiones.soporta_particiones(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        particiones.desparticionar(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0009_bitacora_hora_entrada_default'),
+    ]
+
+    operations = [
+        # Primero se particiona: los índices se crean luego sobre la tabla padre
+        migrations.RunPython(particionar_bitacora, desparticionar_bitacora),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['usuario', 'hora_entrada'], name='bitacora_usuario_entrada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['-hora_entrada'], name='bitacora_entrada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(condition=models.Q(('hora_salida__isnull', True)), fields=['usuario', '-hora_entrada'], name='bitacora_abiertas_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0010_bitacora_particionada'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bitacora',
+            name='bitacora_entrada_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['-hora_entrada'], include=('usuario', 'tabla_afectada', 'accion', 'ip'), name='bitacora_entrada_cubre_idx'),
+        ),
+    ]
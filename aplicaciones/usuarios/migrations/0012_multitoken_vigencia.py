@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 07:45
+
+import aplicaciones.usuarios.models
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0011_bitacora_indice_estadisticas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multitoken',
+            name='expires',
+            field=models.DateTimeField(default=aplicaciones.usuarios.models.expiracion_token),
+        ),
+        migrations.AddField(
+            model_name='multitoken',
+            name='last_used',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='multitoken',
+            index=models.Index(fields=['user', 'created'], name='multitoken_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multitoken',
+            index=models.Index(fields=['expires'], name='multitoken_expires_idx'),
+        ),
+    ]
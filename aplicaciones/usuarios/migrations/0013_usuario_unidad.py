@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 07:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from aplicaciones.usuarios import membresias
+
+
+def poblar_membresias(apps, schema_editor):
+    membresias.reconstruir(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0002_estudiante_unidad'),
+        ('institucion', '0004_remove_unidadeducativa_admin_fk'),
+        ('personal', '0006_alter_cargahoraria_options_and_more'),
+        ('usuarios', '0012_multitoken_vigencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioUnidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ADM', 'Administrador'), ('PRO', 'Profesor'), ('EST', 'Estudiante'), ('TUT', 'Tutor')], max_length=3)),
+                ('unidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='membresias', to='institucion.unidadeducativa')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='membresias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Membresía de unidad',
+                'verbose_name_plural': 'Membresías de unidad',
+                'db_table': 'usuario_unidad',
+                'constraints': [models.UniqueConstraint(fields=('unidad', 'tipo', 'usuario'), name='usuario_unidad_unica')],
+            },
+        ),
+        migrations.RunPython(poblar_membresias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 07:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from aplicaciones.usuarios import visibilidad
+
+
+def poblar_visibilidad(apps, schema_editor):
+    visibilidad.reconstruir(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academico', '0005_curso_tutor_materiacurso_profesor'),
+        ('estudiantes', '0002_estudiante_unidad'),
+        ('usuarios', '0013_usuario_unidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisibilidadEstudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('TUT', 'Tutor vinculado'), ('CUR', 'Tutor del curso'), ('MAT', 'Dicta materia en el curso')], max_length=3)),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visible_para', to='estudiantes.estudiante')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estudiantes_visibles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Visibilidad de estudiante',
+                'verbose_name_plural': 'Visibilidad de estudiantes',
+                'db_table': 'visibilidad_estudiante',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'estudiante', 'motivo'), name='visibilidad_estudiante_unica')],
+            },
+        ),
+        migrations.RunPython(poblar_visibilidad, migrations.RunPython.noop),
+    ]
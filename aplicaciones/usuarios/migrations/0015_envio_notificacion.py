@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 07:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0014_visibilidad_estudiante'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioNotificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audiencia', models.JSONField()),
+                ('titulo', models.CharField(max_length=100)),
+                ('mensaje', models.TextField()),
+                ('tipo', models.CharField(max_length=50)),
+                ('estado', models.CharField(choices=[('PEN', 'Pendiente'), ('PRO', 'Procesando'), ('COM', 'Completado'), ('ERR', 'Error')], default='PEN', max_length=3)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('enviados', models.PositiveIntegerField(default=0)),
+                ('ultimo_usuario_id', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('finalizado', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='envios_notificacion', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Envío de notificaciones',
+                'verbose_name_plural': 'Envíos de notificaciones',
+                'db_table': 'envio_notificacion',
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
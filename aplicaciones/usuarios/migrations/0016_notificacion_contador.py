@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 08:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_contadores(apps, schema_editor):
+    Notificacion = apps.get_model('usuarios', 'Notificacion')
+    ContadorNotificaciones = apps.get_model('usuarios', 'ContadorNotificaciones')
+    conteos = (
+        Notificacion.objects.filter(leida=False)
+        .values_list('usuario_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    ContadorNotificaciones.objects.bulk_create(
+        [ContadorNotificaciones(usuario_id=usuario_id, no_leidas=total) for usuario_id, total in conteos],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0015_envio_notificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificaciones',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificaciones', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('no_leidas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de notificaciones',
+                'verbose_name_plural': 'Contadores de notificaciones',
+                'db_table': 'notificacion_contador',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('leida', False)), fields=['usuario', '-fecha'], name='notificacion_no_leidas_idx'),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
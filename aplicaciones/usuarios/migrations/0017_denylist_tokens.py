@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0016_notificacion_contador'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevocacionTokens',
+            fields=[
+                ('usuario_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('revocado', models.BigIntegerField()),
+                ('expira', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Revocación de tokens',
+                'verbose_name_plural': 'Revocaciones de tokens',
+                'db_table': 'revocacion_tokens',
+            },
+        ),
+        migrations.CreateModel(
+            name='TokenDenegado',
+            fields=[
+                ('jti', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('expira', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Token denegado',
+                'verbose_name_plural': 'Tokens denegados',
+                'db_table': 'token_denegado',
+            },
+        ),
+    ]
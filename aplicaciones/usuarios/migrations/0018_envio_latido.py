@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0017_denylist_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='envionotificacion',
+            name='latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
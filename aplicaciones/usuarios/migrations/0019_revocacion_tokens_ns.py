@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def a_nanosegundos(apps, schema_editor):
+    RevocacionTokens = apps.get_model('usuarios', 'RevocacionTokens')
+    # Las filas previas guardaban segundos enteros
+    RevocacionTokens.objects.filter(revocado__lt=10**12).update(revocado=F('revocado') * 10**9)
+
+
+def a_segundos(apps, schema_editor):
+    RevocacionTokens = apps.get_model('usuarios', 'RevocacionTokens')
+    RevocacionTokens.objects.filter(revocado__gte=10**12).update(revocado=F('revocado') / 10**9)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0018_envio_latido'),
+    ]
+
+    operations = [
+        migrations.RunPython(a_nanosegundos, a_segundos),
+    ]
@@ -1,8 +1,43 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from django.conf import settings
 from django.apps import AppConfig
+from datetime import timedelta
+import secrets
+
+
+def config_tokens():
+    return getattr(settings, 'MULTITOKEN', {})
+
+
+def duracion_token():
+    return timedelta(seconds=config_tokens().get('DURACION', 60 * 60 * 24 * 7))
+
+
+def expiracion_token():
+    return timezone.now() + duracion_token()
+
+
+class MultiTokenManager(models.Manager):
+    def emitir(self, user, device_name=None):
+        """
+        Crea un token nuevo para `user` respetando MULTITOKEN['MAX_DISPOSITIVOS']:
+        si se supera el tope, se revocan los tokens más antiguos.
+        """
+        maximo = config_tokens().get('MAX_DISPOSITIVOS')
+        if maximo:
+            sobrantes = list(
+                self.filter(user=user).order_by('-created').values_list('key', flat=True)[maximo - 1:]
+            )
+            if sobrantes:
+                self.filter(key__in=sobrantes).delete()
+        return self.create(user=user, key=secrets.token_hex(20), device_name=device_name)
+
 
 class MultiToken(models.Model):
     key = models.CharField(max_length=40, primary_key=True)
@@ -13,10 +48,65 @@ class MultiToken(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
     device_name = models.CharField(max_length=255, null=True, blank=True)
+    # Ventana deslizante: cada uso (como mucho cada MULTITOKEN['REFRESCO'] s) extiende `expires`
+    expires = models.DateTimeField(default=expiracion_token)
+    last_used = models.DateTimeField(default=timezone.now)
+
+    objects = MultiTokenManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created'], name='multitoken_user_created_idx'),
+            models.Index(fields=['expires'], name='multitoken_expires_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.device_name or 'sin nombre'}"
 
+    def expirado(self, ahora=None):
+        return self.expires <= (ahora or timezone.now())
+
+    def debe_renovarse(self, ahora=None):
+        refresco = timedelta(seconds=config_tokens().get('REFRESCO', 300))
+        return (ahora or timezone.now()) - self.last_used >= refresco
+
+    def renovar(self, ahora=None):
+        self.last_used = ahora or timezone.now()
+        self.expires = self.last_used + duracion_token()
+        MultiToken.objects.filter(pk=self.pk).update(last_used=self.last_used, expires=self.expires)
+
+
+# Denylist de los JWT (usuarios/tokens_firmados.py). La BD es la fuente de verdad;
+# la caché compartida solo evita la consulta en cada request.
+class TokenDenegado(models.Model):
+    """jti revocado (logout, refresh ya rotado) hasta que el token expira."""
+    jti = models.CharField(max_length=64, primary_key=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Token denegado'
+        verbose_name_plural = 'Tokens denegados'
+        db_table = 'token_denegado'
+
+    def __str__(self):
+        return self.jti
+
+
+class RevocacionTokens(models.Model):
+    """Todo JWT del usuario emitido hasta `revocado` (epoch, nanosegundos) es inválido."""
+    # Sin FK: se registra también al eliminar el usuario
+    usuario_id = models.BigIntegerField(primary_key=True)
+    revocado = models.BigIntegerField()
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Revocación de tokens'
+        verbose_name_plural = 'Revocaciones de tokens'
+        db_table = 'revocacion_tokens'
+
+    def __str__(self):
+        return f"{self.usuario_id} ({self.revocado})"
+
 class Rol(models.Model):
     nombre = models.CharField(max_length=50, unique=True)
     descripcion = models.TextField(blank=True, null=True)
@@ -113,6 +203,83 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     def get_short_name(self):
         return self.nombre
 
+    # Campos que viajan en los tokens (o los invalidan): solo su cambio revoca los JWT
+    CAMPOS_TOKENS = ('is_active', 'rol_id', 'password')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._tokens_guardados = instancia.valores_tokens()
+        return instancia
+
+    def valores_tokens(self):
+        """Valores cargados de CAMPOS_TOKENS (los diferidos no se consultan)."""
+        return {campo: self.__dict__[campo] for campo in self.CAMPOS_TOKENS if campo in self.__dict__}
+
+class ContadorNotificaciones(models.Model):
+    """
+    Notificaciones no leídas por usuario (contador desnormalizado del badge).
+    Se ajusta en la misma transacción que las altas, lecturas y bajas de
+    Notificacion: señales para filas sueltas, NotificacionManager para lotes.
+    """
+    usuario = models.OneToOneField(
+        Usuario,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='contador_notificaciones'
+    )
+    no_leidas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Contador de notificaciones'
+        verbose_name_plural = 'Contadores de notificaciones'
+        db_table = 'notificacion_contador'
+
+    def __str__(self):
+        return f"{self.usuario}: {self.no_leidas} sin leer"
+
+
+def ajustar_contadores(deltas):
+    """
+    {usuario_id: delta} → crea las filas que falten y aplica un UPDATE por cada delta distinto.
+    Solo los incrementos crean filas: un descuento sin fila ya vale 0, y en el
+    borrado en cascada de un Usuario volver a insertarla rompería la FK.
+    """
+    deltas = {usuario_id: delta for usuario_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ContadorNotificaciones.objects.bulk_create(
+        [ContadorNotificaciones(usuario_id=usuario_id) for usuario_id, delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+    por_delta = {}
+    for usuario_id, delta in deltas.items():
+        por_delta.setdefault(delta, []).append(usuario_id)
+    for delta, usuarios in por_delta.items():
+        ContadorNotificaciones.objects.filter(usuario_id__in=usuarios).update(
+            no_leidas=Greatest(F('no_leidas') + delta, Value(0))
+        )
+
+
+class NotificacionManager(models.Manager):
+    def crear_lote(self, notificaciones, batch_size=None):
+        """bulk_create (sin post_save) más el ajuste de contadores, en una transacción."""
+        with transaction.atomic():
+            creadas = self.bulk_create(notificaciones, batch_size=batch_size)
+            ajustar_contadores(Counter(n.usuario_id for n in creadas if not n.leida))
+        return creadas
+
+    def marcar_leidas(self, usuario_id, ids=None):
+        """Marca como leídas todas (o solo `ids`) con un único UPDATE; devuelve cuántas cambiaron."""
+        with transaction.atomic():
+            pendientes = self.filter(usuario_id=usuario_id, leida=False)
+            if ids is not None:
+                pendientes = pendientes.filter(pk__in=ids)
+            marcadas = pendientes.update(leida=True)
+            ajustar_contadores({usuario_id: -marcadas})
+        return marcadas
+
+
 class Notificacion(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     titulo = models.CharField(max_length=100)
@@ -121,15 +288,83 @@ class Notificacion(models.Model):
     leida = models.BooleanField(default=False)
     tipo = models.CharField(max_length=50)
 
+    objects = NotificacionManager()
+
     class Meta:
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
         db_table = 'notificacion'
         ordering = ['-fecha']
+        indexes = [
+            # Solo las no leídas: listado del badge y reconstrucción de contadores
+            models.Index(
+                fields=['usuario', '-fecha'],
+                name='notificacion_no_leidas_idx',
+                condition=models.Q(leida=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.usuario}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estado persistido de `leida`: la señal post_save ajusta el contador por diferencia
+        instancia._leida_guardada = instancia.__dict__.get('leida')
+        return instancia
+
+    def save(self, *args, **kwargs):
+        # La fila y su contador (señal post_save) se confirman juntos
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._leida_guardada = self.leida
+
+
+class EnvioNotificacion(models.Model):
+    """
+    Trabajo de difusión masiva (usuarios/difusion.py): una audiencia y una
+    plantilla que se expanden en filas de Notificacion por lotes.
+    `ultimo_usuario_id` permite retomar un envío interrumpido sin duplicar y
+    `latido` distingue uno interrumpido de uno que otro proceso sigue procesando.
+    """
+    ESTADOS = [
+        ('PEN', 'Pendiente'),
+        ('PRO', 'Procesando'),
+        ('COM', 'Completado'),
+        ('ERR', 'Error'),
+    ]
+
+    creado_por = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='envios_notificacion'
+    )
+    audiencia = models.JSONField()
+    titulo = models.CharField(max_length=100)
+    mensaje = models.TextField()
+    tipo = models.CharField(max_length=50)
+    estado = models.CharField(max_length=3, choices=ESTADOS, default='PEN')
+    total = models.PositiveIntegerField(default=0)
+    enviados = models.PositiveIntegerField(default=0)
+    ultimo_usuario_id = models.BigIntegerField(default=0)
+    # Último avance de quien lo procesa; sin latido reciente se puede retomar
+    latido = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    finalizado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Envío de notificaciones'
+        verbose_name_plural = 'Envíos de notificaciones'
+        db_table = 'envio_notificacion'
+        ordering = ['-creado']
+
+    def __str__(self):
+        return f"{self.titulo} ({self.get_estado_display()}: {self.enviados}/{self.total})"
+
 class SuperAdmin(models.Model):
     usuario = models.OneToOneField(
         Usuario, 
@@ -243,6 +478,82 @@ class Admin(models.Model):
 from django.db import models
 from django.conf import settings
 
+class UsuarioUnidad(models.Model):
+    """
+    Índice desnormalizado usuario → unidad educativa por tipo de perfil.
+    Lo mantienen las señales de Admin, Profesor, Estudiante y TutorEstudiante
+    (usuarios/membresias.py); `manage.py reconstruir_membresias` lo regenera.
+    """
+    TIPOS = [
+        ('ADM', 'Administrador'),
+        ('PRO', 'Profesor'),
+        ('EST', 'Estudiante'),
+        ('TUT', 'Tutor'),
+    ]
+
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='membresias'
+    )
+    unidad = models.ForeignKey(
+        'institucion.UnidadEducativa',
+        on_delete=models.CASCADE,
+        related_name='membresias'
+    )
+    tipo = models.CharField(max_length=3, choices=TIPOS)
+
+    class Meta:
+        verbose_name = 'Membresía de unidad'
+        verbose_name_plural = 'Membresías de unidad'
+        db_table = 'usuario_unidad'
+        constraints = [
+            # Sirve también al GROUP BY (unidad, tipo) de los conteos por unidad
+            models.UniqueConstraint(fields=['unidad', 'tipo', 'usuario'], name='usuario_unidad_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} ∈ {self.unidad} ({self.get_tipo_display()})"
+
+
+class VisibilidadEstudiante(models.Model):
+    """
+    ACL precalculada usuario → estudiante para tutores y profesores, con el
+    motivo por el que lo ve. La mantienen las señales de TutorEstudiante,
+    Estudiante, Curso y MateriaCurso (usuarios/visibilidad.py);
+    `manage.py reconstruir_visibilidad` la regenera.
+    """
+    MOTIVOS = [
+        ('TUT', 'Tutor vinculado'),
+        ('CUR', 'Tutor del curso'),
+        ('MAT', 'Dicta materia en el curso'),
+    ]
+
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='estudiantes_visibles'
+    )
+    estudiante = models.ForeignKey(
+        'estudiantes.Estudiante',
+        on_delete=models.CASCADE,
+        related_name='visible_para'
+    )
+    motivo = models.CharField(max_length=3, choices=MOTIVOS)
+
+    class Meta:
+        verbose_name = 'Visibilidad de estudiante'
+        verbose_name_plural = 'Visibilidad de estudiantes'
+        db_table = 'visibilidad_estudiante'
+        constraints = [
+            # (usuario, estudiante) como prefijo: sirve al semi-join y al chequeo por objeto
+            models.UniqueConstraint(fields=['usuario', 'estudiante', 'motivo'], name='visibilidad_estudiante_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} → {self.estudiante} ({self.get_motivo_display()})"
+
+
 class Bitacora(models.Model):
     ACCIONES = [
         ('crear', 'Crear'),
@@ -257,8 +568,9 @@ class Bitacora(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Usuario relacionado'
     )
+    # default (no auto_now_add): conserva la hora en que se encoló la entrada
     hora_entrada = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name='Hora de entrada'
     )
     hora_salida = models.DateTimeField(
@@ -298,6 +610,21 @@ class Bitacora(models.Model):
         verbose_name_plural = 'Bitácoras de sesión'
         db_table = 'bitacora_sesion'
         ordering = ['-fecha']
+        # En PostgreSQL la tabla está particionada por mes (usuarios/particiones.py)
+        indexes = [
+            models.Index(fields=['usuario', 'hora_entrada'], name='bitacora_usuario_entrada_idx'),
+            # Cubre las agregaciones de /bitacoras/estadisticas/ (index-only scan en PostgreSQL)
+            models.Index(
+                fields=['-hora_entrada'],
+                name='bitacora_entrada_cubre_idx',
+                include=['usuario', 'tabla_afectada', 'accion', 'ip'],
+            ),
+            models.Index(
+                fields=['usuario', '-hora_entrada'],
+                name='bitacora_abiertas_idx',
+                condition=models.Q(hora_salida__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.usuario} realizó {self.accion} el {self.fecha:%Y-%m-%d %H:%M:%S}"
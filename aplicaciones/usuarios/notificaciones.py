@@ -0,0 +1,135 @@
+# usuarios/notificaciones.py
+"""
+Entrega en tiempo real de Notificacion.
+
+Cada usuario tiene un grupo en la capa de canales (`notificaciones_<id>`).
+Las señales de Notificacion publican ahí tras el commit y lo reciben:
+  • el WebSocket  ws/notificaciones/?token=...            (consumers.py)
+  • el respaldo SSE user/auth/notificaciones/eventos/?token=...  (ASGI)
+
+Eventos:
+  {"evento": "nueva", "notificacion": {...}, "no_leidas": n}
+  {"evento": "contador", "no_leidas": n}
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+
+from .authentication import MultiTokenAuthentication
+from .models import ContadorNotificaciones
+
+logger = logging.getLogger(__name__)
+
+TIPO_MENSAJE = 'notificacion.evento'
+LATIDO = 25  # segundos: mantiene viva la conexión SSE detrás de proxies
+
+
+def grupo_usuario(usuario_id):
+    return f'notificaciones_{usuario_id}'
+
+
+def no_leidas(usuario_id):
+    # Contador desnormalizado (ContadorNotificaciones): sin COUNT sobre notificacion
+    return ContadorNotificaciones.objects.filter(usuario_id=usuario_id).values_list('no_leidas', flat=True).first() or 0
+
+
+def evento_nueva(notificacion):
+    from .serializer import NotificacionSerializer
+    return {
+        'evento': 'nueva',
+        'notificacion': NotificacionSerializer(notificacion).data,
+        'no_leidas': no_leidas(notificacion.usuario_id),
+    }
+
+
+def evento_contador(usuario_id):
+    return {'evento': 'contador', 'no_leidas': no_leidas(usuario_id)}
+
+
+def publicar(usuario_id, datos):
+    capa = get_channel_layer()
+    if capa is None:
+        return
+    # Entrega de mejor esfuerzo: corre en on_commit, con la notificación ya guardada,
+    # así que una capa caída (Redis) no debe convertir la escritura en un 500
+    try:
+        async_to_sync(capa.group_send)(grupo_usuario(usuario_id), {'type': TIPO_MENSAJE, 'datos': datos})
+    except Exception:
+        logger.exception("No se pudo publicar la notificación al usuario %s", usuario_id)
+
+
+def publicar_contador(usuario_id):
+    """Tras el commit, cuando el contador ya refleja el cambio."""
+    transaction.on_commit(lambda: publicar(usuario_id, evento_contador(usuario_id)))
+
+
+def publicar_lote(creadas):
+    """Para filas insertadas con bulk_create (sin post_save): una sola lectura de contadores."""
+    from .serializer import NotificacionSerializer
+    if not creadas or get_channel_layer() is None:
+        return
+    conteos = dict(
+        ContadorNotificaciones.objects.filter(usuario_id__in={n.usuario_id for n in creadas})
+        .values_list('usuario_id', 'no_leidas')
+    )
+    for notificacion, datos in zip(creadas, NotificacionSerializer(creadas, many=True).data):
+        publicar(notificacion.usuario_id, {
+            'evento': 'nueva',
+            'notificacion': datos,
+            'no_leidas': conteos.get(notificacion.usuario_id, 0),
+        })
+
+
+def autenticar_consulta(crudo):
+    """Usuario de la credencial en ?token= o None."""
+    if not crudo:
+        return None
+    try:
+        user, _ = MultiTokenAuthentication().autenticar_credencial(crudo)
+    except exceptions.AuthenticationFailed:
+        return None
+    return user
+
+
+# ── respaldo SSE ──────────────────────────────────────────────
+def _sse(datos):
+    return f"data: {json.dumps(datos, default=str)}\n\n"
+
+
+async def eventos_notificaciones(request):
+    """
+    Server-Sent Events para clientes sin WebSocket. Requiere servidor ASGI:
+    bajo WSGI el flujo infinito ocuparía un worker por cliente.
+    """
+    user = await sync_to_async(autenticar_consulta)(request.GET.get('token', ''))
+    if user is None:
+        return JsonResponse({'detail': 'No autenticado'}, status=401)
+
+    capa = get_channel_layer()
+    canal = await capa.new_channel()
+    grupo = grupo_usuario(user.pk)
+    await capa.group_add(grupo, canal)
+
+    async def flujo():
+        try:
+            yield _sse(await sync_to_async(evento_contador)(user.pk))
+            while True:
+                try:
+                    mensaje = await asyncio.wait_for(capa.receive(canal), LATIDO)
+                except asyncio.TimeoutError:
+                    yield ': latido\n\n'
+                    continue
+                yield _sse(mensaje['datos'])
+        finally:
+            await capa.group_discard(grupo, canal)
+
+    respuesta = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
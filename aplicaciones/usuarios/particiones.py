@@ -0,0 +1,190 @@
+# usuarios/particiones.py
+"""
+Particionado mensual de `bitacora_sesion` (solo PostgreSQL).
+
+La tabla padre está particionada por RANGE (hora_entrada): cada mes vive en
+`bitacora_sesion_pAAAA_MM` y lo que cae fuera de rango en `bitacora_sesion_default`.
+En SQLite (tests) la tabla queda plana y la retención se hace con DELETE por lotes.
+"""
+import re
+from datetime import datetime
+
+from django.utils import timezone
+
+TABLA = 'bitacora_sesion'
+TABLA_DEFAULT = f'{TABLA}_default'
+_PATRON_PARTICION = re.compile(rf'^{TABLA}_p(\d{{4}})_(\d{{2}})$')
+
+
+def soporta_particiones(connection):
+    return connection.vendor == 'postgresql'
+
+
+# ── meses ─────────────────────────────────────────────────────
+def inicio_mes(fecha=None):
+    fecha = timezone.localtime(fecha or timezone.now())
+    return fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def sumar_meses(inicio, meses):
+    indice = inicio.year * 12 + inicio.month - 1 + meses
+    return timezone.make_aware(datetime(indice // 12, indice % 12 + 1, 1))
+
+
+def nombre_particion(inicio):
+    return f'{TABLA}_p{inicio:%Y_%m}'
+
+
+def mes_de_particion(nombre):
+    coincidencia = _PATRON_PARTICION.match(nombre)
+    if coincidencia is None:
+        return None
+    return timezone.make_aware(datetime(int(coincidencia[1]), int(coincidencia[2]), 1))
+
+
+# ── catálogo ──────────────────────────────────────────────────
+def esta_particionada(cursor):
+    cursor.execute(
+        """
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        """,
+        [TABLA],
+    )
+    return cursor.fetchone() is not None
+
+
+def particiones(cursor):
+    """[(inicio_mes, nombre)] de las particiones mensuales, de la más antigua a la más nueva."""
+    cursor.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s AND pg_table_is_visible(p.oid)
+        """,
+        [TABLA],
+    )
+    meses = ((mes_de_particion(nombre), nombre) for (nombre,) in cursor.fetchall())
+    return sorted((inicio, nombre) for inicio, nombre in meses if inicio is not None)
+
+
+# ── DDL ───────────────────────────────────────────────────────
+def crear_particion(cursor, inicio):
+    """
+    Crea la partición del mes que empieza en `inicio`.
+    Si la partición por defecto ya tiene filas de ese mes, las mueve antes
+    de adjuntarla (ATTACH falla si el rango se solapa con filas del default).
+    """
+    qn = cursor.db.ops.quote_name
+    nombre = nombre_particion(inicio)
+    desde, hasta = inicio.isoformat(), sumar_meses(inicio, 1).isoformat()
+    cursor.execute(f'CREATE TABLE {qn(nombre)} (LIKE {qn(TABLA)} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f"""
+        WITH movidas AS (
+            DELETE FROM {qn(TABLA_DEFAULT)}
+            WHERE hora_entrada >= %s AND hora_entrada < %s
+            RETURNING *
+        )
+        INSERT INTO {qn(nombre)} SELECT * FROM movidas
+        """,
+        [desde, hasta],
+    )
+    cursor.execute(
+        f"ALTER TABLE {qn(TABLA)} ATTACH PARTITION {qn(nombre)} "
+        f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+    )
+    return nombre
+
+
+def asegurar_particiones(cursor, desde, meses_adelante):
+    """Crea las particiones que falten desde `desde` hasta el mes actual + `meses_adelante`."""
+    existentes = {inicio for inicio, _ in particiones(cursor)}
+    creadas = []
+    inicio, limite = inicio_mes(desde), sumar_meses(inicio_mes(), meses_adelante)
+    while inicio <= limite:
+        if inicio not in existentes:
+            creadas.append(crear_particion(cursor, inicio))
+        inicio = sumar_meses(inicio, 1)
+    return creadas
+
+
+def separar_particion(cursor, nombre):
+    qn = cursor.db.ops.quote_name
+    cursor.execute(f'ALTER TABLE {qn(TABLA)} DETACH PARTITION {qn(nombre)}')
+    cursor.execute(f'DROP TABLE {qn(nombre)}')
+
+
+# ── conversión (migración 0010) ───────────────────────────────
+def _indices(cursor, tabla):
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid) AND NOT i.indisprimary
+        """,
+        [tabla],
+    )
+    return [fila[0] for fila in cursor.fetchall()]
+
+
+def _reconstruir(cursor, clausula_particion, clave_primaria, nombre_pk, preparar=None):
+    """
+    Renombra la tabla actual, crea la nueva con la misma estructura,
+    copia las filas y recrea índices secundarios y la FK a usuario.
+    """
+    qn = cursor.db.ops.quote_name
+    anterior = f'{TABLA}_anterior'
+    secuencia = f'{TABLA}_id_seq'
+    indices = _indices(cursor, TABLA)
+
+    cursor.execute(f'ALTER TABLE {qn(TABLA)} RENAME TO {qn(anterior)}')
+    cursor.execute(f'CREATE TABLE {qn(TABLA)} (LIKE {qn(anterior)} INCLUDING DEFAULTS) {clausula_particion}')
+    # El índice de la PK anterior conserva su nombre tras el RENAME: se usa otro
+    cursor.execute(f'ALTER TABLE {qn(TABLA)} ADD CONSTRAINT {qn(nombre_pk)} PRIMARY KEY ({clave_primaria})')
+    cursor.execute(
+        f'ALTER TABLE {qn(TABLA)} ADD CONSTRAINT {qn(TABLA + "_usuario_id_fk")} '
+        f'FOREIGN KEY (usuario_id) REFERENCES usuario (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    # Se libera la identidad/secuencia de la tabla anterior antes de crear la nueva
+    cursor.execute(f'ALTER TABLE {qn(anterior)} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    cursor.execute(f'ALTER TABLE {qn(anterior)} ALTER COLUMN id DROP DEFAULT')
+    cursor.execute(f'ALTER TABLE {qn(TABLA)} ALTER COLUMN id DROP DEFAULT')
+    cursor.execute(f'DROP SEQUENCE IF EXISTS {qn(secuencia)}')
+    cursor.execute(f'CREATE SEQUENCE {qn(secuencia)} OWNED BY {qn(TABLA)}.id')
+    cursor.execute(f"ALTER TABLE {qn(TABLA)} ALTER COLUMN id SET DEFAULT nextval('{secuencia}')")
+
+    if preparar is not None:
+        preparar(cursor, anterior)
+
+    cursor.execute(f'INSERT INTO {qn(TABLA)} SELECT * FROM {qn(anterior)}')
+    cursor.execute(f"SELECT setval('{secuencia}', COALESCE(MAX(id), 0) + 1, false) FROM {qn(TABLA)}")
+    cursor.execute(f'DROP TABLE {qn(anterior)} CASCADE')
+    # Las definiciones se leyeron antes del RENAME: apuntan a la tabla nueva
+    for definicion in indices:
+        cursor.execute(definicion)
+
+
+def particionar(cursor, meses_adelante=3):
+    if esta_particionada(cursor):
+        return
+
+    def preparar(cursor, anterior):
+        qn = cursor.db.ops.quote_name
+        cursor.execute(f'CREATE TABLE {qn(TABLA_DEFAULT)} PARTITION OF {qn(TABLA)} DEFAULT')
+        cursor.execute(f'SELECT MIN(hora_entrada) FROM {qn(anterior)}')
+        desde = cursor.fetchone()[0] or timezone.now()
+        asegurar_particiones(cursor, desde, meses_adelante)
+
+    # En una tabla particionada la clave primaria debe incluir la columna de partición
+    _reconstruir(
+        cursor, 'PARTITION BY RANGE (hora_entrada)', 'id, hora_entrada', f'{TABLA}_part_pkey', preparar
+    )
+
+
+def desparticionar(cursor):
+    if not esta_particionada(cursor):
+        return
+    _reconstruir(cursor, '', 'id', f'{TABLA}_pkey')
@@ -0,0 +1,103 @@
+# usuarios/perfil.py
+from dataclasses import dataclass
+from typing import Optional
+
+from .models import Usuario
+
+
+@dataclass(frozen=True)
+class PerfilUsuario:
+    """
+    Qué tipo de usuario es el autenticado, resuelto una sola vez por request.
+    Reemplaza los hasattr(user, 'admin'/'profesor'/...) que disparaban
+    una consulta por cada relación uno-a-uno inexistente.
+    """
+    usuario_id: Optional[int] = None
+    rol_id: Optional[int] = None
+    es_superadmin: bool = False
+    es_admin: bool = False
+    es_profesor: bool = False
+    es_estudiante: bool = False
+    es_tutor: bool = False
+    puesto_id: Optional[int] = None   # solo Admin
+    unidad_id: Optional[int] = None   # unidad del Admin, Profesor o Estudiante
+    curso_id: Optional[int] = None    # solo Estudiante
+
+
+PERFIL_ANONIMO = PerfilUsuario()
+
+# Relaciones uno-a-uno inversas que definen el perfil
+RELACIONES = ('superadmin', 'admin', 'profesor', 'estudiante', 'tutor')
+
+
+def obtener_perfil(user):
+    """
+    Devuelve el PerfilUsuario de `user` y lo deja en `user.perfil`.
+    Si el usuario llegó con los perfiles ya unidos (MultiTokenAuthentication)
+    no hace consultas; si no, resuelve todo con una sola consulta.
+    """
+    if user is None or not user.is_authenticated:
+        return PERFIL_ANONIMO
+
+    perfil = user.__dict__.get('perfil')
+    if perfil is None:
+        perfil = _perfil_desde_relaciones(user) or _perfil_desde_bd(user)
+        user.perfil = perfil
+    return perfil
+
+
+def _perfil_desde_relaciones(user):
+    descriptores = [getattr(type(user), nombre).related for nombre in RELACIONES]
+    if not all(rel.is_cached(user) for rel in descriptores):
+        return None
+
+    superadmin, admin, profesor, estudiante, tutor = (
+        rel.get_cached_value(user) for rel in descriptores
+    )
+    unidad_id = next(
+        (p.unidad_id for p in (admin, profesor, estudiante) if p is not None and p.unidad_id),
+        None,
+    )
+    return PerfilUsuario(
+        usuario_id=user.pk,
+        rol_id=user.rol_id,
+        es_superadmin=superadmin is not None,
+        es_admin=admin is not None,
+        es_profesor=profesor is not None,
+        es_estudiante=estudiante is not None,
+        es_tutor=tutor is not None,
+        puesto_id=admin.puesto_id if admin is not None else None,
+        unidad_id=unidad_id,
+        curso_id=estudiante.curso_id if estudiante is not None else None,
+    )
+
+
+def _perfil_desde_bd(user):
+    # Un único SELECT con LEFT JOIN a las cinco tablas de perfil
+    fila = Usuario.objects.filter(pk=user.pk).values(
+        'rol_id',
+        'superadmin__usuario_id',
+        'admin__usuario_id', 'admin__puesto_id', 'admin__unidad_id',
+        'profesor__usuario_id', 'profesor__unidad_id',
+        'estudiante__usuario_id', 'estudiante__unidad_id', 'estudiante__curso_id',
+        'tutor__usuario_id',
+    ).first()
+    if fila is None:
+        return PERFIL_ANONIMO
+
+    return PerfilUsuario(
+        usuario_id=user.pk,
+        rol_id=fila['rol_id'],
+        es_superadmin=fila['superadmin__usuario_id'] is not None,
+        es_admin=fila['admin__usuario_id'] is not None,
+        es_profesor=fila['profesor__usuario_id'] is not None,
+        es_estudiante=fila['estudiante__usuario_id'] is not None,
+        es_tutor=fila['tutor__usuario_id'] is not None,
+        puesto_id=fila['admin__puesto_id'],
+        unidad_id=(
+            fila['admin__unidad_id']
+            or fila['profesor__unidad_id']
+            or fila['estudiante__unidad_id']
+        ),
+        curso_id=fila['estudiante__curso_id'],
+    )
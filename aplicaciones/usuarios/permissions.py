@@ -1,5 +1,8 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from .models import PermisoPuesto, PermisoRol, Accion, ModeloPermitido
+from .models import Accion
+from .matriz_permisos import matriz_permisos
+from .perfil import obtener_perfil
+from . import visibilidad
 
 
 _METHOD_TO_ACTION = {
@@ -23,39 +26,39 @@ def metodo_a_accion(method: str) -> str:
 # ──────────────────────────────────────────────────────────────
 class IsSuperAdmin(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'superadmin')
+        return request.user.is_authenticated and obtener_perfil(request.user).es_superadmin
 
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'admin')
+        return request.user.is_authenticated and obtener_perfil(request.user).es_admin
 
 
 class IsAdminOrSuperAdmin(BasePermission):
     def has_permission(self, request, view):
-        u = request.user
-        return u.is_authenticated and (hasattr(u, 'admin') or hasattr(u, 'superadmin'))
+        perfil = obtener_perfil(request.user)
+        return perfil.es_admin or perfil.es_superadmin
 
 
 class IsEstudiante(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'estudiante')
+        return request.user.is_authenticated and obtener_perfil(request.user).es_estudiante
 
 
 class IsProfesor(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'profesor')
+        return request.user.is_authenticated and obtener_perfil(request.user).es_profesor
 
 
 class IsTutor(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'tutor')
+        return request.user.is_authenticated and obtener_perfil(request.user).es_tutor
 
 
 class IsProfesorOrTutor(BasePermission):
     def has_permission(self, request, view):
-        u = request.user
-        return u.is_authenticated and (hasattr(u, 'profesor') or hasattr(u, 'tutor'))
+        perfil = obtener_perfil(request.user)
+        return perfil.es_profesor or perfil.es_tutor
 
 
     
@@ -64,7 +67,7 @@ class IsProfesorOrTutor(BasePermission):
 # ──────────────────────────────────────────────────────────────
 class PermisoPorPuesto(BasePermission):
     """
-    Consulta la tabla PermisoPuesto:
+    Consulta la matriz compilada de PermisoPuesto:
     (puesto, modelo, accion)
     """
     def has_permission(self, request, view):
@@ -72,32 +75,29 @@ class PermisoPorPuesto(BasePermission):
         if not user.is_authenticated:
             return False
 
+        perfil = obtener_perfil(user)
+
         # SuperAdmin bypass
-        if hasattr(user, 'superadmin'):
+        if perfil.es_superadmin:
             return True
 
         # Solo Admin usa este permiso
-        if not hasattr(user, 'admin'):
+        if not perfil.es_admin:
             # Otros roles pasan a PermisoPorRol o a lógica específica
             return request.method in SAFE_METHODS
 
-        admin   = user.admin
-        puesto  = admin.puesto
-        modelo  = view.basename
-        accion  = metodo_a_accion(request.method)
+        puesto_id = perfil.puesto_id
+        modelo    = view.basename
+        accion    = metodo_a_accion(request.method)
 
-        return PermisoPuesto.objects.filter(
-            puesto=puesto,
-            modelo__nombre=modelo,
-            accion__nombre=accion
-        ).exists()
+        return matriz_permisos.permite_puesto(puesto_id, modelo, accion)
     
 # ──────────────────────────────────────────────────────────────
 #  PermisoPorRol → roles fijos (Estudiante, Profesor, Tutor…)
 # ──────────────────────────────────────────────────────────────
 class PermisoPorRol(BasePermission):
     """
-    Usa (rol, modelo, accion) de la tabla PermisoRol.
+    Usa (rol, modelo, accion) de la matriz compilada de PermisoRol.
     Pasa si existe al menos una fila que coincida.
     """
 
@@ -106,26 +106,24 @@ class PermisoPorRol(BasePermission):
         if not user.is_authenticated:
             return False
 
+        perfil = obtener_perfil(user)
+
         # SuperAdmin bypass
-        if hasattr(user, 'superadmin'):
+        if perfil.es_superadmin:
             return True
 
         # Admin se delega a PermisoPorPuesto
-        if hasattr(user, 'admin'):
+        if perfil.es_admin:
             return True   # lo evaluará PermisoPorPuesto en la lista de permisos
 
         # Resto de usuarios deben tener un Rol
-        if not user.rol_id:
+        if not perfil.rol_id:
             return request.method in SAFE_METHODS
 
         accion = metodo_a_accion(request.method)
         modelo = view.basename
 
-        return PermisoRol.objects.filter(
-            rol_id=user.rol_id,
-            modelo__nombre=modelo,
-            accion__nombre=accion
-        ).exists()
+        return matriz_permisos.permite_rol(perfil.rol_id, modelo, accion)
     
 
 # ──────────────────────────────────────────────────────────────
@@ -147,46 +145,38 @@ class PermisoEstudianteView(BasePermission):
         if not user.is_authenticated:
             return False
 
+        perfil = obtener_perfil(user)
+
         # SuperAdmin bypass
-        if hasattr(user, 'superadmin'):
+        if perfil.es_superadmin:
             return True
 
         # Admin → validamos con PermisoPorPuesto
-        if hasattr(user, 'admin'):
+        if perfil.es_admin:
             return PermisoPorPuesto().has_permission(request, view)
 
         # Otros roles → validamos con PermisoPorRol
         return PermisoPorRol().has_permission(request, view)
 
     def has_object_permission(self, request, view, obj):
-        user = request.user
+        perfil = obtener_perfil(request.user)
 
         # SuperAdmin / Admin ya pasaron
-        if hasattr(user, 'superadmin') or hasattr(user, 'admin'):
+        if perfil.es_superadmin or perfil.es_admin:
             return True
 
+        # El objeto puede ser el Estudiante o algo que lo referencia (asistencia, notas…)
+        campo = getattr(view, 'campo_estudiante', 'pk')
+        estudiante_id = obj.pk if campo == 'pk' else getattr(obj, f'{campo}_id')
+
         # Estudiante: solo suya
-        if hasattr(user, 'estudiante'):
-            return obj.pk == user.pk
-
-        # Tutor: vínculo en TutorEstudiante
-        if hasattr(user, 'tutor'):
-            return obj.tutores.filter(tutor__usuario=user).exists()
-
-        # Profesor: tutor del curso o dicta alguna materia en ese curso
-        if hasattr(user, 'profesor'):
-            prof  = user.profesor
-            curso = obj.curso
-            if not curso:
-                return False
-
-            # 1) Tutor del curso
-            if curso.tutor_id == prof.pk:
-                return True
-
-            # 2) Profesor asignado en MateriaCurso
-            from aplicaciones.academico.models import MateriaCurso
-            return MateriaCurso.objects.filter(curso=curso, profesor=prof).exists()
+        if perfil.es_estudiante:
+            return estudiante_id == perfil.usuario_id
+
+        # Tutor vinculado, tutor del curso o profesor que dicta en el curso:
+        # una consulta sobre la ACL precalculada (VisibilidadEstudiante)
+        if perfil.es_tutor or perfil.es_profesor:
+            return visibilidad.puede_ver(perfil.usuario_id, estudiante_id)
 
         # Cualquier otro rol (visitante) → denegado
         return False
\ No newline at end of file
@@ -0,0 +1,8 @@
+# usuarios/routing.py
+from django.urls import path
+
+from .consumers import NotificacionConsumer
+
+websocket_urlpatterns = [
+    path('ws/notificaciones/', NotificacionConsumer.as_asgi()),
+]
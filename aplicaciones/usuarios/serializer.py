@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Usuario, Rol, Notificacion, Bitacora, SuperAdmin, Puesto, Admin, Accion, ModeloPermitido, PermisoPuesto, PermisoRol
+from .models import Usuario, Rol, Notificacion, EnvioNotificacion, Bitacora, SuperAdmin, Puesto, Admin, Accion, ModeloPermitido, PermisoPuesto, PermisoRol
 from django.contrib.auth.hashers import make_password
 from django.apps import apps as models
 from aplicaciones.institucion.models import UnidadEducativa, Colegio
@@ -61,6 +61,12 @@ class NotificacionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('fecha', 'usuario')
 
+class EnvioNotificacionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EnvioNotificacion
+        exclude = ('ultimo_usuario_id',)
+        read_only_fields = ('estado', 'total', 'enviados', 'error', 'creado', 'finalizado', 'creado_por')
+
 class BitacoraSerializer(serializers.ModelSerializer):
     # Assign current authenticated user automatically
     usuario = serializers.HiddenField(default=serializers.CurrentUserDefault())
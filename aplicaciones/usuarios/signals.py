@@ -0,0 +1,195 @@
+# usuarios/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .authentication import cache_tokens
+from . import membresias
+from . import notificaciones
+from . import tokens_firmados
+from . import visibilidad
+from .matriz_permisos import matriz_permisos
+from .models import ajustar_contadores, Usuario, MultiToken, PermisoRol, PermisoPuesto, ModeloPermitido, Accion
+
+
+# ──────────────────────────────────────────────────────────────
+#  Invalidación de la caché de tokens
+# ──────────────────────────────────────────────────────────────
+@receiver(post_delete, sender=MultiToken)
+def invalidar_token_eliminado(sender, instance, **kwargs):
+    cache_tokens.invalidar(instance.key)
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_tokens_usuario(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Cubre desactivación (is_active=False) y cambios de rol
+    cache_tokens.invalidar_usuario(instance.pk)
+    antes, ahora = getattr(instance, '_tokens_guardados', None), instance.valores_tokens()
+    instance._tokens_guardados = ahora
+    if created or raw:
+        return
+    if update_fields is not None and not {'is_active', 'rol', 'rol_id', 'password'} & set(update_fields):
+        return
+    # Los JWT llevan el perfil embebido: se revocan (y el cliente debe refrescar)
+    # solo si cambió la activación, el rol o la contraseña; sin estado previo, por las dudas
+    if antes is None or any(ahora.get(campo, valor) != valor for campo, valor in antes.items()):
+        tokens_firmados.revocar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=Usuario)
+def invalidar_tokens_usuario_eliminado(sender, instance, **kwargs):
+    cache_tokens.invalidar_usuario(instance.pk)
+    tokens_firmados.revocar_usuario(instance.pk)
+
+
+def invalidar_tokens_perfil(sender, instance, **kwargs):
+    cache_tokens.invalidar_usuario(instance.usuario_id)
+    tokens_firmados.revocar_usuario(instance.usuario_id)
+
+
+# Perfiles de rol: su alta/baja cambia lo que trae el JOIN del token
+PERFILES_ROL = (
+    'usuarios.SuperAdmin',
+    'usuarios.Admin',
+    'personal.Profesor',
+    'estudiantes.Estudiante',
+    'estudiantes.Tutor',
+)
+
+for _perfil in PERFILES_ROL:
+    post_save.connect(invalidar_tokens_perfil, sender=_perfil, dispatch_uid=f'tokens_save_{_perfil}')
+    post_delete.connect(invalidar_tokens_perfil, sender=_perfil, dispatch_uid=f'tokens_delete_{_perfil}')
+
+
+# ──────────────────────────────────────────────────────────────
+#  Invalidación de la matriz compilada de permisos
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender=PermisoRol)
+@receiver(post_delete, sender=PermisoRol)
+@receiver(post_save, sender=PermisoPuesto)
+@receiver(post_delete, sender=PermisoPuesto)
+@receiver(post_save, sender=ModeloPermitido)
+@receiver(post_delete, sender=ModeloPermitido)
+@receiver(post_save, sender=Accion)
+@receiver(post_delete, sender=Accion)
+def invalidar_matriz_permisos(sender, **kwargs):
+    # Tras el commit, para que ningún proceso recompile con datos sin confirmar
+    # (una sola vez si el cambio viene de matriz_permisos.aplicar_cambios)
+    matriz_permisos.programar_invalidacion()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Índice usuario → unidad (UsuarioUnidad)
+# ──────────────────────────────────────────────────────────────
+PERFILES_UNIDAD = {
+    'usuarios.Admin': membresias.ADMIN,
+    'personal.Profesor': membresias.PROFESOR,
+    'estudiantes.Estudiante': membresias.ESTUDIANTE,
+}
+
+
+def sincronizar_membresia_perfil(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    membresias.sincronizar_perfil(instance.usuario_id, PERFILES_UNIDAD[sender._meta.label], instance.unidad_id)
+
+
+def quitar_membresia_perfil(sender, instance, **kwargs):
+    membresias.quitar_perfil(instance.usuario_id, PERFILES_UNIDAD[sender._meta.label])
+
+
+for _perfil in PERFILES_UNIDAD:
+    post_save.connect(sincronizar_membresia_perfil, sender=_perfil, dispatch_uid=f'membresia_save_{_perfil}')
+    post_delete.connect(quitar_membresia_perfil, sender=_perfil, dispatch_uid=f'membresia_delete_{_perfil}')
+
+
+@receiver(post_save, sender='estudiantes.Estudiante')
+def sincronizar_tutores_estudiante(sender, instance, raw=False, **kwargs):
+    # Si el estudiante cambia de unidad, cambian las unidades de sus tutores
+    if raw:
+        return
+    membresias.sincronizar_tutores(instance.tutores.values_list('tutor_id', flat=True))
+
+
+@receiver(post_save, sender='estudiantes.TutorEstudiante')
+@receiver(post_delete, sender='estudiantes.TutorEstudiante')
+def sincronizar_tutor(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    membresias.sincronizar_tutores([instance.tutor_id])
+
+
+@receiver(post_delete, sender='estudiantes.Tutor')
+def quitar_membresias_tutor(sender, instance, **kwargs):
+    membresias.quitar_perfil(instance.usuario_id, membresias.TUTOR)
+
+
+# ──────────────────────────────────────────────────────────────
+#  ACL de estudiantes (VisibilidadEstudiante)
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender='estudiantes.TutorEstudiante')
+@receiver(post_delete, sender='estudiantes.TutorEstudiante')
+@receiver(post_save, sender='estudiantes.Estudiante')
+def sincronizar_visibilidad_estudiante(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    estudiante_id = instance.pk if sender._meta.label == 'estudiantes.Estudiante' else instance.estudiante_id
+    visibilidad.sincronizar_estudiantes([estudiante_id])
+
+
+@receiver(post_save, sender='academico.Curso')
+def sincronizar_visibilidad_curso(sender, instance, raw=False, **kwargs):
+    # Cambio de tutor del curso
+    if raw:
+        return
+    visibilidad.sincronizar_curso(instance.pk)
+
+
+@receiver(post_save, sender='academico.MateriaCurso')
+@receiver(post_delete, sender='academico.MateriaCurso')
+def sincronizar_visibilidad_materia(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    visibilidad.sincronizar_curso(instance.curso_id)
+
+
+@receiver(pre_delete, sender='academico.Curso')
+def quitar_visibilidad_curso(sender, instance, **kwargs):
+    visibilidad.quitar_curso(instance.pk)
+
+
+@receiver(post_delete, sender='personal.Profesor')
+def quitar_visibilidad_profesor(sender, instance, **kwargs):
+    visibilidad.quitar_profesor(instance.usuario_id)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Notificaciones en tiempo real (WebSocket / SSE)
+# ──────────────────────────────────────────────────────────────
+@receiver(post_save, sender='usuarios.Notificacion')
+def publicar_notificacion(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if not instance.leida:
+            ajustar_contadores({instance.usuario_id: 1})
+        transaction.on_commit(lambda: notificaciones.publicar(
+            instance.usuario_id, notificaciones.evento_nueva(instance)
+        ))
+        return
+
+    # Solo un cambio de `leida` mueve el contador (se compara con el estado cargado de la BD)
+    antes = getattr(instance, '_leida_guardada', None)
+    if antes is not None and antes != instance.leida:
+        ajustar_contadores({instance.usuario_id: 1 if antes else -1})
+        notificaciones.publicar_contador(instance.usuario_id)
+
+
+@receiver(post_delete, sender='usuarios.Notificacion')
+def publicar_contador_notificaciones(sender, instance, origin=None, **kwargs):
+    # Las leídas (p. ej. la purga) no cambian el contador; si se borra el
+    # usuario, su contador cae en la misma cascada
+    if instance.leida or isinstance(origin, Usuario):
+        return
+    ajustar_contadores({instance.usuario_id: -1})
+    notificaciones.publicar_contador(instance.usuario_id)
@@ -1,7 +1,35 @@
-from django.test import TestCase, Client
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from channels.layers import get_channel_layer
+from django.core.management import call_command
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.utils import timezone
 from django.urls import reverse
-from .models import Usuario, Rol
+from rest_framework import exceptions
+from rest_framework.exceptions import ValidationError
+from .models import Usuario, Rol, MultiToken, Accion, ModeloPermitido, PermisoRol, Bitacora, SuperAdmin, UsuarioUnidad, VisibilidadEstudiante, Notificacion, EnvioNotificacion, ContadorNotificaciones, RevocacionTokens
+from . import difusion, notificaciones, tokens_firmados, visibilidad
+from .consumers import NotificacionConsumer
+from aplicaciones.academico.models import Curso, Grado, Materia, MateriaCurso, Paralelo
+from aplicaciones.estudiantes.models import Estudiante, Tutor, TutorEstudiante
+from aplicaciones.institucion.models import Colegio, UnidadEducativa
+from aplicaciones.personal.models import Profesor
+from .auditoria import auditar
+from .buffer import BufferEscritura
+from .utils import _recuperar_respaldo, respaldar_bitacora
+from .estadisticas import estadisticas_bitacora
+from .authentication import MultiTokenAuthentication, cache_tokens
+from .matriz_permisos import CLAVE_VERSION as CLAVE_VERSION_MATRIZ, matriz_permisos, aplicar_cambios
+from .perfil import obtener_perfil
+import gzip
 import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+from io import StringIO
 
 class LoginTests(TestCase):
     def setUp(self):
@@ -43,6 +71,547 @@ class LoginTests(TestCase):
         self.assertEqual(resp.json()["success"], False)
         self.assertEqual(resp.json()["message"], "Credenciales incorrectas")
 
+class MultiTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        rol = Rol.objects.create(nombre="Tester")
+        self.user = Usuario.objects.create_user(
+            ci="456",
+            email="token@example.com",
+            nombre="Token",
+            apellido="User",
+            username="token_user",
+            password="clave123",
+            rol=rol,
+        )
+        self.token = MultiToken.objects.create(user=self.user, key="a" * 40)
+        self.auth = MultiTokenAuthentication()
+        cache_tokens.limpiar()
+
+    def test_token_cacheado_no_consulta_bd(self):
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_perfil_resuelto_en_la_misma_consulta(self):
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+            perfil = obtener_perfil(user)
+        self.assertFalse(perfil.es_admin or perfil.es_superadmin)
+        self.assertEqual(perfil.rol_id, self.user.rol_id)
+
+    def test_perfil_sin_token_usa_una_consulta(self):
+        user = Usuario.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertFalse(obtener_perfil(user).es_estudiante)
+            self.assertFalse(obtener_perfil(user).es_tutor)
+
+    def test_usuario_desactivado_invalida_cache(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_token_eliminado_invalida_cache(self):
+        self.auth.authenticate_credentials(self.token.key)
+        MultiToken.objects.filter(key=self.token.key).delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_token_expirado_rechazado(self):
+        MultiToken.objects.filter(key=self.token.key).update(expires=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_renovacion_deslizante_escribe_como_mucho_una_vez(self):
+        MultiToken.objects.filter(key=self.token.key).update(last_used=timezone.now() - timedelta(hours=1))
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            self.auth.authenticate_credentials(self.token.key)
+        token = MultiToken.objects.get(key=self.token.key)
+        self.assertGreater(token.expires, self.token.expires)
+
+    @override_settings(MULTITOKEN={'MAX_DISPOSITIVOS': 2})
+    def test_tope_de_dispositivos_y_purga(self):
+        MultiToken.objects.emitir(self.user, device_name="b")
+        nuevo = MultiToken.objects.emitir(self.user, device_name="c")
+        self.assertEqual(MultiToken.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(MultiToken.objects.filter(key=self.token.key).exists())
+
+        MultiToken.objects.filter(key=nuevo.key).update(expires=timezone.now())
+        call_command('purgar_tokens', stdout=StringIO())
+        self.assertEqual(list(MultiToken.objects.values_list('device_name', flat=True)), ["b"])
+
+class TokensFirmadosTests(TestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create_user(
+            ci="457", email="jwt@example.com", nombre="Jwt", apellido="User",
+            username="jwt_user", password="clave123", rol=Rol.objects.create(nombre="Jwt"),
+        )
+        SuperAdmin.objects.create(usuario=self.user)
+        self.auth = MultiTokenAuthentication()
+        self.par = tokens_firmados.emitir(Usuario.objects.get(pk=self.user.pk))
+        self.request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.par['access']}")
+
+    def test_autentica_y_autoriza_sin_consultas(self):
+        # La primera verificación lee la denylist de la BD y la deja en caché
+        self.auth.authenticate(self.request)
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate(self.request)
+            perfil = obtener_perfil(user)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(perfil.es_superadmin)
+        self.assertEqual(perfil.rol_id, self.user.rol_id)
+
+    def test_logout_deniega_el_access(self):
+        _, access = self.auth.authenticate(self.request)
+        tokens_firmados.cerrar_sesion(access, self.par['refresh'])
+        # La denylist vive en la BD: sobrevive a otra caché (otro worker) o a un reinicio
+        cache.clear()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate(self.request)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            tokens_firmados.refrescar(self.par['refresh'])
+
+    def test_refresh_rota_y_no_se_reutiliza(self):
+        nuevo = tokens_firmados.refrescar(self.par['refresh'])
+        self.assertIn('access', nuevo)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            tokens_firmados.refrescar(self.par['refresh'])
+
+    def test_denylist_en_memoria_sin_tocar_la_cache(self):
+        self.auth.authenticate(self.request)
+        # Con DatabaseCache cada lectura de la caché sería una consulta
+        with mock.patch.object(cache, 'get_many', side_effect=AssertionError):
+            self.auth.authenticate(self.request)
+        # Revocación hecha por otro worker: se nota al vencer la relectura
+        cache.set(tokens_firmados.CLAVE_USUARIO.format(self.user.pk), time.time_ns())
+        self.auth.authenticate(self.request)
+        with override_settings(TOKENS_FIRMADOS={'ACTIVO': True, 'RELECTURA_SEG': 0}):
+            tokens_firmados._memoria.clear()
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.auth.authenticate(self.request)
+
+    def test_revocacion_en_el_mismo_segundo(self):
+        self.auth.authenticate(self.request)
+        tokens_firmados.revocar_usuario(self.user.pk)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate(self.request)
+        nuevo = tokens_firmados.emitir(Usuario.objects.get(pk=self.user.pk))
+        user, _ = self.auth.authenticate(RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {nuevo['access']}"))
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_solo_cambios_de_acceso_revocan(self):
+        RevocacionTokens.objects.all().delete()
+        user = Usuario.objects.get(pk=self.user.pk)
+        user.nombre = "Otro"
+        user.save()
+        user.save(update_fields=['last_login'])
+        self.assertFalse(RevocacionTokens.objects.exists())
+
+        user.is_active = False
+        user.save()
+        self.assertTrue(RevocacionTokens.objects.filter(usuario_id=user.pk).exists())
+
+class DatosInstitucionMixin:
+    def setUp(self):
+        self.colegio = Colegio.objects.create(nombre="Colegio", direccion="-", telefono="-")
+        self.rol = Rol.objects.create(nombre="Miembro")
+
+    def _unidad(self, nombre):
+        return UnidadEducativa.objects.create(colegio=self.colegio, codigo_sie=nombre, nombre=nombre, turno="MAN")
+
+    def _usuario(self, username):
+        return Usuario.objects.create_user(
+            ci=username, email=f"{username}@example.com", nombre=username, apellido="X",
+            username=username, password="clave123", rol=self.rol,
+        )
+
+
+class UsuarioUnidadTests(DatosInstitucionMixin, TestCase):
+    def test_senales_mantienen_membresias(self):
+        u1, u2 = self._unidad("U1"), self._unidad("U2")
+        estudiante = Estudiante.objects.create(usuario=self._usuario("est"), rude="R1", unidad=u1)
+        tutor = Tutor.objects.create(usuario=self._usuario("tut"))
+        TutorEstudiante.objects.create(tutor=tutor, estudiante=estudiante)
+        membresias = lambda: set(UsuarioUnidad.objects.values_list('usuario_id', 'unidad_id', 'tipo'))
+        self.assertEqual(membresias(), {
+            (estudiante.pk, u1.pk, 'EST'), (tutor.pk, u1.pk, 'TUT'),
+        })
+
+        estudiante.unidad = u2
+        estudiante.save()
+        self.assertEqual(membresias(), {
+            (estudiante.pk, u2.pk, 'EST'), (tutor.pk, u2.pk, 'TUT'),
+        })
+
+        esperadas = membresias()
+        call_command('reconstruir_membresias', stdout=StringIO())
+        self.assertEqual(membresias(), esperadas)
+
+    def test_senales_mantienen_visibilidad(self):
+        grado = Grado.objects.create(unidad_educativa=self._unidad("U1"), nivel_educativo="PRI")
+        curso = Curso.objects.create(paralelo=Paralelo.objects.create(grado=grado, letra="A"), nombre="1A")
+        estudiante = Estudiante.objects.create(usuario=self._usuario("est"), rude="R1", curso=curso)
+        tutor = Tutor.objects.create(usuario=self._usuario("tut"))
+        profesor = Profesor.objects.create(usuario=self._usuario("pro"))
+        otro = Profesor.objects.create(usuario=self._usuario("otro"))
+        TutorEstudiante.objects.create(tutor=tutor, estudiante=estudiante)
+        curso.tutor = profesor
+        curso.save()
+        materia = MateriaCurso.objects.create(curso=curso, materia=Materia.objects.create(nombre="Mat"), profesor=otro)
+        filas = lambda: set(VisibilidadEstudiante.objects.values_list('usuario_id', 'motivo'))
+        self.assertEqual(filas(), {(tutor.pk, 'TUT'), (profesor.pk, 'CUR'), (otro.pk, 'MAT')})
+        self.assertTrue(visibilidad.puede_ver(otro.pk, estudiante.pk))
+
+        materia.delete()
+        estudiante.curso = None
+        estudiante.save()
+        self.assertEqual(filas(), {(tutor.pk, 'TUT')})
+        self.assertFalse(visibilidad.puede_ver(profesor.pk, estudiante.pk))
+
+        esperadas = filas()
+        call_command('reconstruir_visibilidad', stdout=StringIO())
+        self.assertEqual(filas(), esperadas)
+
+class DifusionNotificacionesTests(DatosInstitucionMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        grado = Grado.objects.create(unidad_educativa=self._unidad("U1"), nivel_educativo="PRI")
+        self.curso = Curso.objects.create(paralelo=Paralelo.objects.create(grado=grado, letra="A"), nombre="1A")
+        self.tutores = []
+        for i in range(3):
+            estudiante = Estudiante.objects.create(usuario=self._usuario(f"est{i}"), rude=f"R{i}", curso=self.curso)
+            tutor = Tutor.objects.create(usuario=self._usuario(f"tut{i}"))
+            TutorEstudiante.objects.create(tutor=tutor, estudiante=estudiante)
+            self.tutores.append(tutor.pk)
+        self.audiencia = {"curso": self.curso.pk, "perfil": "tutores"}
+
+    def test_difusion_a_tutores_del_curso(self):
+        envio = difusion.crear_envio(None, self.audiencia, "Reunión", "Hola {nombre}")
+        self.assertEqual((envio.estado, envio.total, envio.enviados), ("COM", 3, 3))
+        self.assertEqual(
+            set(Notificacion.objects.values_list('usuario_id', 'mensaje')),
+            {(pk, f"Hola tut{i}") for i, pk in enumerate(self.tutores)},
+        )
+        with self.assertRaises(ValidationError):
+            difusion.crear_envio(None, self.audiencia, "Reunión", "Hola {clave}")
+
+    @override_settings(DIFUSION_NOTIFICACIONES={'UMBRAL_FONDO': 0, 'LOTE': 2})
+    def test_audiencia_grande_se_encola_y_se_retoma_por_lotes(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            envio = difusion.crear_envio(None, self.audiencia, "Aviso", "Mensaje")
+        self.assertEqual((envio.estado, len(callbacks)), ("PEN", 1))
+
+        call_command('procesar_envios', stdout=StringIO())
+        envio.refresh_from_db()
+        self.assertEqual((envio.estado, envio.enviados), ("COM", 3))
+        self.assertEqual(Notificacion.objects.count(), 3)
+
+    @override_settings(DIFUSION_NOTIFICACIONES={'UMBRAL_FONDO': 0, 'LOTE': 2, 'ABANDONO_SEG': 300})
+    def test_envio_en_curso_no_se_reclama_dos_veces(self):
+        with self.captureOnCommitCallbacks():
+            envio = difusion.crear_envio(None, self.audiencia, "Aviso", "Mensaje")
+        # Otro hilo lo tomó y sigue avanzando: el comando no lo toca
+        EnvioNotificacion.objects.filter(pk=envio.pk).update(estado='PRO', latido=timezone.now())
+        self.assertIsNone(difusion.procesar(envio.pk))
+        call_command('procesar_envios', stdout=StringIO())
+        self.assertEqual(Notificacion.objects.count(), 0)
+
+        # Sin latido reciente se considera interrumpido y se retoma sin duplicar
+        EnvioNotificacion.objects.filter(pk=envio.pk).update(latido=timezone.now() - timedelta(minutes=10))
+        call_command('procesar_envios', stdout=StringIO())
+        envio.refresh_from_db()
+        self.assertEqual((envio.estado, envio.enviados), ("COM", 3))
+        self.assertEqual(Notificacion.objects.count(), 3)
+
+
+class MatrizPermisosTests(TestCase):
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre="Profesor")
+        self.modelo = ModeloPermitido.objects.create(nombre="curso")
+        self.ver = Accion.objects.create(nombre="view")
+        self.agregar = Accion.objects.create(nombre="add")
+        with self.captureOnCommitCallbacks(execute=True):
+            PermisoRol.objects.create(rol=self.rol, modelo=self.modelo, accion=self.ver)
+
+    def test_consulta_sin_bd_en_estado_estable(self):
+        self.assertTrue(matriz_permisos.permite_rol(self.rol.pk, "curso", "view"))
+        with self.assertNumQueries(0):
+            self.assertTrue(matriz_permisos.permite_rol(self.rol.pk, "curso", "view"))
+            self.assertFalse(matriz_permisos.permite_rol(self.rol.pk, "curso", "add"))
+
+    def test_version_compartida_se_relee_por_intervalo(self):
+        self.assertFalse(matriz_permisos.permite_rol(self.rol.pk, "curso", "add"))
+        # Otro proceso agrega el permiso e invalida: aquí se nota al vencer la relectura
+        PermisoRol.objects.create(rol=self.rol, modelo=self.modelo, accion=self.agregar)
+        cache.incr(CLAVE_VERSION_MATRIZ)
+        self.assertFalse(matriz_permisos.permite_rol(self.rol.pk, "curso", "add"))
+        with override_settings(VERSIONES_COMPARTIDAS={'RELECTURA_SEG': 0}):
+            self.assertTrue(matriz_permisos.permite_rol(self.rol.pk, "curso", "add"))
+
+    def test_signal_invalida_matriz(self):
+        self.assertFalse(matriz_permisos.permite_rol(self.rol.pk, "curso", "add"))
+        with self.captureOnCommitCallbacks(execute=True):
+            PermisoRol.objects.create(rol=self.rol, modelo=self.modelo, accion=self.agregar)
+        self.assertTrue(matriz_permisos.permite_rol(self.rol.pk, "curso", "add"))
+
+    def test_endpoint_permisos_con_etag(self):
+        user = Usuario.objects.create_user(
+            ci="321", email="prof@example.com", nombre="Prof", apellido="X",
+            username="prof_perm", password="clave123", rol=self.rol,
+        )
+        token = MultiToken.objects.emitir(user, device_name="test")
+        cliente = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = "/user/auth/usuarios/permisos/"
+
+        resp = cliente.get(url)
+        self.assertEqual(resp.json()["permisos"], {"curso": ["view"]})
+        etag = resp["ETag"]
+        self.assertEqual(cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PermisoRol.objects.create(rol=self.rol, modelo=self.modelo, accion=self.agregar)
+        resp = cliente.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["permisos"], {"curso": ["add", "view"]})
+
+    def test_aplicar_cambios_en_lote_invalida_una_vez(self):
+        otro = Rol.objects.create(nombre="Tutor")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            resultado = aplicar_cambios(
+                PermisoRol, 'rol',
+                otorgar={str(otro.pk): {"curso": ["view", "add"]}, self.rol.pk: {"curso": ["add"]}},
+                revocar={str(self.rol.pk): {"curso": ["view"]}},
+            )
+        self.assertEqual(resultado, {"otorgados": 3, "revocados": 1})
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(matriz_permisos.permisos_rol(self.rol.pk), {("curso", "add")})
+        self.assertEqual(matriz_permisos.permisos_rol(otro.pk), {("curso", "view"), ("curso", "add")})
+
+        with self.assertRaises(ValidationError):
+            aplicar_cambios(PermisoRol, 'rol', otorgar={otro.pk: {"curso": ["borrar"]}}, revocar=None)
+
+class BufferEscrituraTests(TestCase):
+    def test_vacia_por_lotes_y_respalda_si_falla(self):
+        lotes, respaldados = [], []
+
+        def vaciar(lote):
+            if "x" in lote:
+                raise RuntimeError("BD caída")
+            lotes.append(lote)
+
+        buffer = BufferEscritura('prueba', vaciar, max_entradas=2, respaldo=respaldados.append)
+        for item in ("a", "b", "c"):
+            buffer._cola.put(item)
+        buffer.vaciar()
+        buffer._cola.put("x")
+        with self.assertLogs('aplicaciones.usuarios.buffer', 'ERROR'):
+            buffer.vaciar()
+        self.assertEqual(lotes, [["a", "b"], ["c"]])
+        self.assertEqual(respaldados, [["x"]])
+
+    def test_recupera_el_respaldo_y_aparta_filas_invalidas(self):
+        user = Usuario.objects.create_user(
+            ci="792", email="respaldo@example.com", nombre="Respaldo", apellido="User",
+            username="respaldo_user", password="clave123", rol=Rol.objects.create(nombre="Respaldo"),
+        )
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'pendiente.jsonl')
+            with override_settings(BITACORA_BUFFER={'RESPALDO': ruta}):
+                respaldar_bitacora([Bitacora(usuario=user, accion='crear', hora_entrada=timezone.now())])
+                with open(ruta, 'a', encoding='utf-8') as archivo:
+                    archivo.write('{"usuario_id": null, "accion": "crear"}\n')
+                    archivo.write('no es json\n')
+                with self.assertLogs('aplicaciones.usuarios.utils', 'ERROR'):
+                    _recuperar_respaldo()
+
+                self.assertEqual(list(Bitacora.objects.values_list('usuario_id', 'accion')), [(user.pk, 'crear')])
+                self.assertEqual(os.listdir(directorio), ['pendiente.jsonl.descartadas'])
+                with open(f'{ruta}.descartadas', encoding='utf-8') as archivo:
+                    self.assertEqual(len(archivo.readlines()), 2)
+
+
+class PoliticaAuditoriaTests(TestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create_user(
+            ci="789", email="audit@example.com", nombre="Audit", apellido="User",
+            username="audit_user", password="clave123", rol=Rol.objects.create(nombre="Auditor"),
+        )
+        self.request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+        self.request.user = self.user
+
+    @override_settings(AUDITORIA_POLITICA={'horario.listar': {'registrar': False}})
+    def test_regla_desactiva_registro(self):
+        self.assertFalse(auditar(self.request, 'horario', 'listar'))
+        self.assertTrue(auditar(self.request, 'horario', 'crear', 'Creó un horario'))
+        self.assertEqual(list(Bitacora.objects.values_list('accion', flat=True)), ['crear'])
+
+    @override_settings(AUDITORIA_POLITICA={'*.listar': {'plantilla': '[{tabla}] {descripcion}'}})
+    def test_alias_y_plantilla(self):
+        auditar(self.request, 'grado', 'ver', 'Consultó grados')
+        entrada = Bitacora.objects.get()
+        self.assertEqual(entrada.accion, 'listar')
+        self.assertEqual(entrada.descripcion, '[grado] Consultó grados')
+        self.assertEqual(entrada.ip, '10.0.0.1')
+
+
+class ArchivarBitacoraTests(TestCase):
+    def test_archiva_y_borra_meses_fuera_de_retencion(self):
+        user = Usuario.objects.create_user(
+            ci="790", email="archivo@example.com", nombre="Archivo", apellido="User",
+            username="archivo_user", password="clave123", rol=Rol.objects.create(nombre="Archivo"),
+        )
+        vieja = Bitacora.objects.create(usuario=user, hora_entrada=timezone.now() - timedelta(days=400))
+        reciente = Bitacora.objects.create(usuario=user)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            call_command('archivar_bitacora', meses=12, directorio=directorio, stdout=StringIO())
+            archivos = os.listdir(directorio)
+            self.assertEqual(len(archivos), 1)
+            with gzip.open(os.path.join(directorio, archivos[0]), 'rt', encoding='utf-8') as archivo:
+                filas = [json.loads(linea) for linea in archivo]
+
+        self.assertEqual([fila['id'] for fila in filas], [vieja.pk])
+        self.assertEqual(list(Bitacora.objects.values_list('pk', flat=True)), [reciente.pk])
+
+    def test_corrida_fallida_no_duplica_el_archivo(self):
+        user = Usuario.objects.create_user(
+            ci="791", email="archivo2@example.com", nombre="Archivo", apellido="User",
+            username="archivo_user2", password="clave123", rol=Rol.objects.create(nombre="Archivo"),
+        )
+        vieja = Bitacora.objects.create(usuario=user, hora_entrada=timezone.now() - timedelta(days=400))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            # Falla después de volcar y antes de confirmar el borrado
+            with mock.patch('django.db.models.query.QuerySet.delete', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    call_command('archivar_bitacora', meses=12, directorio=directorio, stdout=StringIO())
+            self.assertEqual(os.listdir(directorio), [])
+
+            call_command('archivar_bitacora', meses=12, directorio=directorio, stdout=StringIO())
+            archivos = os.listdir(directorio)
+            with gzip.open(os.path.join(directorio, archivos[0]), 'rt', encoding='utf-8') as archivo:
+                self.assertEqual([json.loads(linea)['id'] for linea in archivo], [vieja.pk])
+        self.assertFalse(Bitacora.objects.exists())
+
+
+class EstadisticasBitacoraTests(TestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create_user(
+            ci="791", email="stats@example.com", nombre="Stats", apellido="User",
+            username="stats_user", password="clave123", rol=Rol.objects.create(nombre="Stats"),
+        )
+        self.hasta = timezone.now() - timedelta(hours=1)
+        self.desde = self.hasta - timedelta(days=2)
+        for accion, tabla in (('crear', 'grado'), ('crear', 'grado'), ('editar', 'curso')):
+            Bitacora.objects.create(
+                usuario=self.user, hora_entrada=self.hasta - timedelta(hours=3),
+                accion=accion, tabla_afectada=tabla,
+            )
+
+    def test_agregados_y_cache_de_ventana_cerrada(self):
+        datos = estadisticas_bitacora(self.desde, self.hasta)
+        self.assertEqual(datos['total'], 3)
+        self.assertEqual(datos['por_accion'][0], {'accion': 'crear', 'total': 2})
+        self.assertEqual(datos['por_usuario'][0]['username'], 'stats_user')
+        self.assertEqual(sum(fila['total'] for fila in datos['por_periodo']), 3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(estadisticas_bitacora(self.desde, self.hasta), datos)
+
+    def test_filtros_invalidos_responden_400(self):
+        SuperAdmin.objects.create(usuario=self.user)
+        token = MultiToken.objects.emitir(self.user, device_name="test")
+        cliente = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+        for filtro in ("usuario=abc", "ip=999.1.1"):
+            self.assertEqual(cliente.get(f"/user/auth/bitacoras/estadisticas/?{filtro}").status_code, 400)
+            self.assertEqual(cliente.get(f"/user/auth/bitacoras/listar/?{filtro}").status_code, 400)
+        self.assertEqual(cliente.get("/user/auth/bitacoras/estadisticas/?ip=10.0.0.1").status_code, 200)
+
+
+class NotificacionesTiempoRealTests(TestCase):
+    def setUp(self):
+        self.user = Usuario.objects.create_user(
+            ci="654", email="notif@example.com", nombre="Notif", apellido="User",
+            username="notif_user", password="clave123", rol=Rol.objects.create(nombre="Padre"),
+        )
+        self.capa = get_channel_layer()
+        self.canal = async_to_sync(self.capa.new_channel)()
+        async_to_sync(self.capa.group_add)(notificaciones.grupo_usuario(self.user.pk), self.canal)
+
+    def _recibir(self):
+        return async_to_sync(self.capa.receive)(self.canal)['datos']
+
+    def test_alta_y_lectura_publican_al_grupo_del_usuario(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion = Notificacion.objects.create(usuario=self.user, titulo="Hola", mensaje="-", tipo="aviso")
+        evento = self._recibir()
+        self.assertEqual((evento['evento'], evento['no_leidas']), ('nueva', 1))
+        self.assertEqual(evento['notificacion']['titulo'], "Hola")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion.leida = True
+            notificacion.save()
+        self.assertEqual(self._recibir(), {'evento': 'contador', 'no_leidas': 0})
+
+    def test_contador_marcado_en_lote_y_purga(self):
+        contador = lambda: notificaciones.no_leidas(self.user.pk)
+        creadas = [
+            Notificacion.objects.create(usuario=self.user, titulo=f"N{i}", mensaje="-", tipo="aviso")
+            for i in range(3)
+        ]
+        Notificacion.objects.crear_lote([Notificacion(usuario=self.user, titulo="L", mensaje="-", tipo="aviso")])
+        self.assertEqual(contador(), 4)
+
+        with self.assertNumQueries(4):  # SAVEPOINT, UPDATE notificacion, UPDATE contador, RELEASE
+            self.assertEqual(Notificacion.objects.marcar_leidas(self.user.pk, [creadas[0].pk]), 1)
+        creadas[1].delete()
+        self.assertEqual(contador(), 2)
+        self.assertEqual(Notificacion.objects.marcar_leidas(self.user.pk), 2)
+        self.assertEqual(contador(), 0)
+
+        Notificacion.objects.filter(pk=creadas[2].pk).update(fecha=timezone.now() - timedelta(days=365))
+        call_command('purgar_notificaciones', stdout=StringIO())
+        self.assertEqual(Notificacion.objects.count(), 2)
+        self.assertEqual(contador(), 0)
+
+    def test_capa_caida_no_rompe_la_escritura(self):
+        with mock.patch.object(self.capa, 'group_send', side_effect=ConnectionError):
+            with self.assertLogs("aplicaciones.usuarios.notificaciones", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Notificacion.objects.create(usuario=self.user, titulo="Hola", mensaje="-", tipo="aviso")
+        self.assertEqual(notificaciones.no_leidas(self.user.pk), 1)
+
+    def test_borrar_usuario_con_notificaciones_sin_leer(self):
+        Notificacion.objects.crear_lote([
+            Notificacion(usuario=self.user, titulo=f"N{i}", mensaje="-", tipo="aviso") for i in range(2)
+        ])
+        Notificacion.objects.create(usuario=self.user, titulo="S", mensaje="-", tipo="aviso")
+        self.assertEqual(notificaciones.no_leidas(self.user.pk), 3)
+
+        # La cascada borra las notificaciones y el contador sin volver a insertarlo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(Notificacion.objects.exists())
+        self.assertFalse(ContadorNotificaciones.objects.exists())
+
+    def test_websocket_sin_token_se_rechaza(self):
+        async def conectar():
+            # channels.testing requiere daphne; basta el comunicador ASGI de asgiref
+            scope = {'type': 'websocket', 'path': '/ws/notificaciones/', 'query_string': b'', 'headers': [], 'subprotocols': []}
+            comunicador = ApplicationCommunicator(NotificacionConsumer.as_asgi(), scope)
+            await comunicador.send_input({'type': 'websocket.connect'})
+            respuesta = await comunicador.receive_output(timeout=1)
+            await comunicador.wait(timeout=1)
+            return respuesta['type'] == 'websocket.accept', respuesta.get('code')
+
+        self.assertEqual(async_to_sync(conectar)(), (False, 4401))
+
+
 """
 # Crear un superusuario
 usuario_superadmin = Usuario.objects.create_superuser(
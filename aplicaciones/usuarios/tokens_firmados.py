@@ -0,0 +1,211 @@
+# usuarios/tokens_firmados.py
+"""
+Modo de autenticación sin estado: `Authorization: Bearer <jwt>` (simplejwt).
+
+El access token lleva el PerfilUsuario en sus claims, así que autenticar y
+autorizar no consulta la base de datos. La revocación usa una denylist
+guardada en la BD (durable y común a todos los workers):
+  • TokenDenegado por jti    → tokens sueltos (logout, refresh ya usado) hasta que expiren;
+  • RevocacionTokens por usuario → instante de revocación (ns); se rechaza todo token
+                                   emitido hasta entonces (desactivación, cambio de rol o
+                                   de perfil). `iat` tiene segundos enteros, así que la
+                                   emisión viaja además en el claim `emitido_ns`.
+Cada consulta se guarda en la caché compartida, y lo leído de ella además en
+memoria del proceso durante TOKENS_FIRMADOS['RELECTURA_SEG'] segundos: en estado
+estable verificar un token no toca la BD aunque la caché compartida sea
+DatabaseCache. Una revocación hecha en otro proceso se nota a lo sumo en ese
+intervalo; en el propio, de inmediato.
+"""
+import threading
+import time
+from dataclasses import fields
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, router, transaction
+from django.db.models import Value
+from rest_framework import exceptions
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import RevocacionTokens, TokenDenegado, Usuario
+from .perfil import PerfilUsuario, obtener_perfil
+
+CLAVE_JTI = 'usuarios:jwt:denegado:{}'
+CLAVE_USUARIO = 'usuarios:jwt:revocado_ns:{}'
+CLAIM_EMISION = 'emitido_ns'
+
+MAX_MEMORIA = 10000
+_memoria = {}   # clave de caché → (valor, time.monotonic() de vencimiento)
+_lock_memoria = threading.Lock()
+
+# usuario_id ya viaja en el claim estándar user_id
+CLAIMS_PERFIL = tuple(campo.name for campo in fields(PerfilUsuario) if campo.name != 'usuario_id')
+
+
+def _config():
+    return getattr(settings, 'TOKENS_FIRMADOS', {})
+
+
+def activo():
+    return _config().get('ACTIVO', False)
+
+
+# ── emisión ───────────────────────────────────────────────────
+def emitir(user):
+    """Par access/refresh con el perfil de rol embebido (el access hereda los claims)."""
+    perfil = obtener_perfil(user)
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh[CLAIM_EMISION] = time.time_ns()
+    for nombre in CLAIMS_PERFIL:
+        refresh[nombre] = getattr(perfil, nombre)
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+def refrescar(refresh_crudo):
+    """Valida el refresh, lo invalida (rotación) y emite un par nuevo con el perfil actual."""
+    try:
+        refresh = RefreshToken(refresh_crudo)
+    except TokenError:
+        raise exceptions.AuthenticationFailed("Refresh token inválido o expirado.")
+    _verificar_denylist(refresh)
+
+    try:
+        user = Usuario.objects.get(pk=refresh[api_settings.USER_ID_CLAIM])
+    except Usuario.DoesNotExist:
+        raise exceptions.AuthenticationFailed("Usuario inactivo o eliminado.")
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed("Usuario inactivo o eliminado.")
+
+    # Rotación atómica: de dos refrescos concurrentes con el mismo token solo uno inserta el jti
+    if not denegar(refresh):
+        raise exceptions.AuthenticationFailed("Token revocado.")
+    return emitir(user)
+
+
+# ── autenticación ─────────────────────────────────────────────
+def autenticar(access_crudo):
+    try:
+        token = AccessToken(access_crudo)
+    except TokenError:
+        raise exceptions.AuthenticationFailed("Token inválido o expirado.")
+    _verificar_denylist(token)
+    return _usuario_desde_claims(token), token
+
+
+def _usuario_desde_claims(token):
+    """
+    Usuario armado desde los claims, sin consulta. Los demás campos quedan
+    diferidos: si una vista los lee, Django los carga en ese momento.
+    """
+    usuario_id = int(token[api_settings.USER_ID_CLAIM])
+    user = Usuario.from_db(
+        router.db_for_read(Usuario),
+        ['id', 'username', 'rol_id', 'is_active'],
+        [usuario_id, token.get('username'), token.get('rol_id'), True],
+    )
+    user.perfil = PerfilUsuario(
+        usuario_id=usuario_id,
+        **{nombre: token[nombre] for nombre in CLAIMS_PERFIL if nombre in token},
+    )
+    return user
+
+
+# ── denylist ──────────────────────────────────────────────────
+def _restante(token):
+    return max(int(token['exp'] - time.time()), 1)
+
+
+def _expira(segundos):
+    return datetime.fromtimestamp(segundos, tz=dt_timezone.utc)
+
+
+def denegar(token):
+    """Agrega el jti a la denylist; False si ya estaba (p. ej. un refresh usado dos veces)."""
+    jti = token[api_settings.JTI_CLAIM]
+    try:
+        with transaction.atomic():
+            TokenDenegado.objects.create(jti=jti, expira=_expira(token['exp']))
+        nuevo = True
+    except IntegrityError:
+        nuevo = False
+    cache.set(CLAVE_JTI.format(jti), 1, _restante(token))
+    _recordar(CLAVE_JTI.format(jti), 1)
+    return nuevo
+
+
+def revocar_usuario(usuario_id):
+    # Basta con recordarlo lo que vive un refresh: después ningún token previo es válido
+    duracion = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    ahora = time.time_ns()
+    RevocacionTokens.objects.bulk_create(
+        [RevocacionTokens(usuario_id=usuario_id, revocado=ahora, expira=_expira(ahora // 10**9 + duracion))],
+        update_conflicts=True,
+        unique_fields=['usuario_id'],
+        update_fields=['revocado', 'expira'],
+    )
+    cache.set(CLAVE_USUARIO.format(usuario_id), ahora, duracion)
+    _recordar(CLAVE_USUARIO.format(usuario_id), ahora)
+
+
+def cerrar_sesion(access, refresh_crudo=None):
+    denegar(access)
+    if refresh_crudo:
+        try:
+            denegar(RefreshToken(refresh_crudo))
+        except TokenError:
+            pass
+
+
+def _recordar(clave, valor):
+    with _lock_memoria:
+        if len(_memoria) >= MAX_MEMORIA:
+            _memoria.clear()
+        _memoria[clave] = (valor, time.monotonic() + _config().get('RELECTURA_SEG', 5))
+
+
+def _leer(claves):
+    """Valores vigentes en memoria del proceso; lo demás, de la caché compartida."""
+    ahora, valores = time.monotonic(), {}
+    for clave in claves:
+        valor, vence = _memoria.get(clave, (None, 0))
+        if vence > ahora:
+            valores[clave] = valor
+    faltan = [clave for clave in claves if clave not in valores]
+    if faltan:
+        for clave, valor in cache.get_many(faltan).items():
+            _recordar(clave, valor)
+            valores[clave] = valor
+    return valores
+
+
+def _cargar(clave, consulta, timeout):
+    """Lee de la BD lo que no está en caché y lo guarda con add(): no pisa una revocación concurrente."""
+    valor = consulta.first() or 0
+    cache.add(clave, valor, timeout)
+    _recordar(clave, valor)
+    return valor
+
+
+def _verificar_denylist(token):
+    jti, usuario_id = token[api_settings.JTI_CLAIM], token[api_settings.USER_ID_CLAIM]
+    clave_jti, clave_usuario = CLAVE_JTI.format(jti), CLAVE_USUARIO.format(usuario_id)
+    valores = _leer([clave_jti, clave_usuario])
+    if clave_jti not in valores:
+        valores[clave_jti] = _cargar(
+            clave_jti, TokenDenegado.objects.filter(jti=jti).values_list(Value(1), flat=True), _restante(token),
+        )
+    if valores[clave_jti]:
+        raise exceptions.AuthenticationFailed("Token revocado.")
+    if clave_usuario not in valores:
+        valores[clave_usuario] = _cargar(
+            clave_usuario,
+            RevocacionTokens.objects.filter(usuario_id=usuario_id).values_list('revocado', flat=True),
+            int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+        )
+    # Tokens emitidos antes de `emitido_ns`: con `iat` el mismo segundo de la revocación cuenta como previo
+    if token.get(CLAIM_EMISION, token['iat'] * 10**9) <= valores[clave_usuario]:
+        raise exceptions.AuthenticationFailed("Token revocado.")
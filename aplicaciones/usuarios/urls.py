@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .notificaciones import eventos_notificaciones
 from .usuario_views import (
     UsuarioViewSet,
     RolViewSet,
@@ -26,6 +27,8 @@ router.register(r'permisos-puesto', PermisoPuestoViewSet, basename='permisopuest
 router.register(r'permisos-rol', PermisoRolViewSet, basename='permisorol')
 
 urlpatterns = [
+    # Antes del router: 'eventos' no debe tomarse como pk de notificaciones/<pk>/
+    path('auth/notificaciones/eventos/', eventos_notificaciones, name='notificaciones-eventos'),
     path('auth/', include(router.urls)),
 ]
 
@@ -6,27 +6,29 @@ from rest_framework.authentication import TokenAuthentication
 
 from django.contrib.auth import authenticate, logout
 from rest_framework.authtoken.models import Token
-from .models import Usuario, Rol, Notificacion, Bitacora, SuperAdmin, MultiToken, Admin, Puesto, Accion, ModeloPermitido, PermisoPuesto, PermisoRol
+from .models import Usuario, Rol, Notificacion, Bitacora, SuperAdmin, MultiToken, Admin, Puesto, Accion, ModeloPermitido, PermisoPuesto, PermisoRol, UsuarioUnidad, EnvioNotificacion
 
 from aplicaciones.estudiantes.models import Estudiante, Tutor
 from aplicaciones.personal.models import Profesor
 
-from .authentication import MultiTokenAuthentication
+from .authentication import MultiTokenAuthentication, cache_tokens
+from . import difusion, notificaciones, tokens_firmados
 
 
 from django.contrib.auth.models import User as UserModel
-from django.db.models import Count, Q # Importar Count y Q para consultas complejas
+from django.db.models import Count # Importar Count para consultas complejas
 from django.views.decorators.csrf import csrf_exempt
 
-import secrets
-
 from .permissions import IsSuperAdmin, PermisoPorRol, PermisoPorPuesto
+from .perfil import obtener_perfil
+from .matriz_permisos import matriz_permisos, aplicar_cambios, serializar_matriz
 
 from .serializer import (
 
     UsuarioSerializer,
     RolSerializer,
     NotificacionSerializer,
+    EnvioNotificacionSerializer,
     BitacoraSerializer,
     LoginSerializer,
     SuperAdminSerializer,
@@ -39,16 +41,25 @@ from .serializer import (
 )
 
 from django.utils import timezone
-from .utils import registrar_bitacora
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from datetime import datetime, time, timedelta
+from rest_framework.exceptions import ValidationError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_ipv46_address
+from .utils import get_client_ip
+from .auditoria import AuditoriaMixin
+from .estadisticas import estadisticas_bitacora, filtrar_bitacora, TRUNCAR
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 
-from .permissions import IsSuperAdmin, IsAdmin
+from .permissions import IsSuperAdmin, IsAdmin, IsAdminOrSuperAdmin
 
 def csrf_token_view(request):
     return JsonResponse({'csrftoken': get_token(request)})
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+class UsuarioViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'usuario'
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     authentication_classes = [MultiTokenAuthentication]
@@ -106,14 +117,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Rol no encontrado'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Registrar bitácora
-        ip = get_client_ip(request)  # Asumiendo que tienes esta función que obtiene la IP
-        registrar_bitacora(
-            usuario=user,
-            ip=ip,
-            tabla_afectada='usuario',
-            accion='crear',
-            descripcion=f'Creación de nuevo usuario: {user.username}'
-        )
+        self.auditar('crear', f'Creación de nuevo usuario: {user.username}', usuario=user)
 
         return Response({
             'user': serializer.data,
@@ -149,37 +153,49 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         if not user.is_active:
             return Response({'error': 'Cuenta desactivada'}, status=status.HTTP_403_FORBIDDEN)
 
-        token = MultiToken.objects.create(
-            user=user,
-            key=secrets.token_hex(20),  # 40 caracteres
+        # Respeta MULTITOKEN['MAX_DISPOSITIVOS']: revoca los tokens más antiguos
+        token = MultiToken.objects.emitir(
+            user,
             device_name=request.headers.get("User-Agent", "")[:250]
         )
         print(token.key)
 
-        # Registrar bitácora si tienes la función
-        ip = get_client_ip(request)
-        registrar_bitacora(
-            usuario=user,
-            ip=ip,
-            tabla_afectada='usuario',
-            accion='crear',
-            descripcion='Inicio de sesión exitoso'
-        )
+        # Registrar bitácora
+        self.auditar('crear', 'Inicio de sesión exitoso', usuario=user)
 
         user_data = UsuarioSerializer(user, context={'request': request}).data
 
-        return Response({
+        data = {
             'token': token.key,
             'user': user_data
-        })
+        }
+        # Modo sin estado: par access/refresh para `Authorization: Bearer <access>`
+        if tokens_firmados.activo():
+            data.update(tokens_firmados.emitir(user))
+        return Response(data)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[AllowAny],
+        url_path='token-refresh',
+    )
+    def token_refresh(self, request):
+        if not tokens_firmados.activo():
+            return Response({'error': 'Modo sin estado desactivado'}, status=status.HTTP_404_NOT_FOUND)
+        refresh = request.data.get('refresh')
+        if not refresh:
+            return Response({'error': "Falta 'refresh'"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(tokens_firmados.refrescar(refresh))
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def logout(self, request):
-        # Registrar bitácora de cierre de sesión
+        # Registrar bitácora de cierre de sesión: la entrada abierta más reciente
+        # (.last() con ordering '-fecha' devolvía la más antigua y recorría todo el historial)
         bitacora = Bitacora.objects.filter(
             usuario=request.user,
             hora_salida__isnull=True
-        ).last()
+        ).order_by('-hora_entrada').first()
 
         if bitacora:
             bitacora.hora_salida = timezone.now()
@@ -203,6 +219,10 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         if auth_header.startswith('Token '):
             token_key = auth_header.split(' ')[1]
             MultiToken.objects.filter(key=token_key).delete()
+            cache_tokens.invalidar(token_key)
+        elif auth_header.startswith('Bearer '):
+            # El access (y el refresh, si se envía) quedan en la denylist hasta expirar
+            tokens_firmados.cerrar_sesion(request.auth, request.data.get('refresh'))
 
         # Realizar logout del usuario
         logout(request)
@@ -234,13 +254,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             for item in qs
         }
 
-        registrar_bitacora (
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='usuario',
-            accion='ver',
-            descripcion='Consultó la cantidad de usuarios por rol'
-        )
+        self.auditar('ver', 'Consultó la cantidad de usuarios por rol')
 
         return Response(data, status=status.HTTP_200_OK)
     
@@ -251,16 +265,28 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         user = request.user
         if not user or not user.is_authenticated:
             return Response({"detail": "No autenticado"}, status=401)
-        registrar_bitacora(
-            usuario=user,
-            ip=get_client_ip(request),
-            tabla_afectada='usuario',
-            accion='ver',
-            descripcion='Consultó su perfil'
-        )
+        self.auditar('ver', 'Consultó su perfil')
         serializer = self.get_serializer(request.user, context={'request': request})
         return Response(serializer.data, status=200)
 
+    @action(detail=False, methods=['get'], url_path='permisos', permission_classes=[IsAuthenticated])
+    def permisos(self, request):
+        """
+        Permisos efectivos del usuario: {modelo: [acciones]}. Responde con ETag;
+        si el cliente manda If-None-Match con el mismo valor se devuelve 304.
+        """
+        perfil = obtener_perfil(request.user)
+        permisos, version = matriz_permisos.efectivos(perfil)
+        etag = quote_etag(version)
+        cabeceras = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+        return Response(
+            {'superadmin': perfil.es_superadmin, 'permisos': permisos},
+            headers=cabeceras,
+        )
+
 
     @action(
         detail=False,
@@ -270,22 +296,18 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     )
     def listar_usuarios(self, request):
         user = request.user
+        perfil = obtener_perfil(user)
 
         # 1) SuperAdmin → todos los usuarios
-        if hasattr(user, 'superadmin'):
+        if perfil.es_superadmin:
             qs = Usuario.objects.all()
 
         # 2) Admin → usuarios de su unidad
-        elif hasattr(user, 'admin') and user.admin.unidad:
-            unidad = user.admin.unidad
+        elif perfil.es_admin and perfil.unidad_id:
+            # Semi-join sobre el índice UsuarioUnidad (sin OR de cuatro JOIN ni DISTINCT)
             qs = Usuario.objects.filter(
-                Q(admin__unidad=unidad) |
-                Q(profesor__unidad=unidad) |
-                Q(estudiante__unidad=unidad) |
-                Q(
-                    tutor__estudiantes__estudiante__unidad=unidad
-                ) 
-            ).distinct()
+                pk__in=UsuarioUnidad.objects.filter(unidad_id=perfil.unidad_id).values('usuario_id')
+            )
 
         # 3) Cualquier otro rol (Profesor, Estudiante, Tutor, etc.) → NO tiene permiso
         else:
@@ -299,13 +321,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         # Solo registra bitácora si es un Usuario real y autenticado
         user = request.user
         if isinstance(user, UserModel) and user.is_authenticated:
-            registrar_bitacora(
-                usuario=user,
-                ip=get_client_ip(request),
-                tabla_afectada='usuario',
-                accion='ver',
-                descripcion='Listó los usuarios'
-            )
+            self.auditar('ver', 'Listó los usuarios')
 
         return Response(serializer.data)
    
@@ -329,13 +345,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             usuario.set_password(nueva_contraseña)
             usuario.save()
 
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='usuario',
-            accion='editar',
-            descripcion=f'Editó el usuario con ID {pk}'
-        )
+        self.auditar('editar', f'Editó el usuario con ID {pk}')
 
         return Response({
             'usuario': serializer.data,
@@ -350,13 +360,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
     
         usuario.delete()
-        registrar_bitacora(
-        usuario=request.user,
-        ip=get_client_ip(request),
-        tabla_afectada='usuario',
-        accion='eliminar',
-        descripcion=f'Eliminó un usuario  '
-    )
+        self.auditar('eliminar', f'Eliminó un usuario  ')
     
         return Response({'message': 'Usuario eliminado correctamente'}, status=status.HTTP_204_NO_CONTENT)
 
@@ -377,13 +381,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         serializer = UsuarioSerializer(queryset, many=True)
         
         # Registrar la acción en la bitácora
-        registrar_bitacora(
-            usuario=request.user,
-            ip=get_client_ip(request),
-            tabla_afectada='usuario',
-            accion='ver',
-            descripcion='Listó los administradores'
-        )
+        self.auditar('ver', 'Listó los administradores')
         
         return Response(serializer.data)
     
@@ -434,7 +432,8 @@ class RolViewSet(viewsets.ModelViewSet):
         rol.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class NotificacionViewSet(viewsets.ModelViewSet):
+class NotificacionViewSet(AuditoriaMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'notificacion'
     serializer_class = NotificacionSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [MultiTokenAuthentication]
@@ -445,9 +444,50 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def marcar_leida(self, request, pk=None):
         notificacion = self.get_object()
-        notificacion.leida = True
-        notificacion.save()
+        if Notificacion.objects.marcar_leidas(request.user.pk, [notificacion.pk]):
+            notificaciones.publicar_contador(request.user.pk)
         return Response({'status': 'notificación marcada como leída'})
+
+    @action(detail=False, methods=['get'], url_path='no-leidas')
+    def no_leidas(self, request):
+        return Response({'no_leidas': notificaciones.no_leidas(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='marcar-leidas')
+    def marcar_leidas(self, request):
+        """{"ids": [...]} marca esas; sin "ids" marca todas. Un único UPDATE."""
+        ids = request.data.get('ids')
+        if ids is not None and not isinstance(ids, list):
+            raise ValidationError({'ids': 'Se espera una lista de ids.'})
+        marcadas = Notificacion.objects.marcar_leidas(request.user.pk, ids)
+        if marcadas:
+            notificaciones.publicar_contador(request.user.pk)
+        return Response({'marcadas': marcadas, 'no_leidas': notificaciones.no_leidas(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='difundir', permission_classes=[IsAdminOrSuperAdmin, PermisoPorPuesto])
+    def difundir(self, request):
+        """
+        Difusión masiva: {"audiencia": {...}, "titulo", "mensaje", "tipo"}.
+        Ver usuarios/difusion.py para los selectores y los campos de plantilla.
+        Responde 201 si ya se envió o 202 si quedó en segundo plano.
+        """
+        envio = difusion.crear_envio(
+            request.user,
+            request.data.get('audiencia'),
+            request.data.get('titulo', ''),
+            request.data.get('mensaje', ''),
+            request.data.get('tipo') or 'aviso',
+        )
+        self.auditar('crear', f'Difusión "{envio.titulo}" a {envio.total} destinatarios')
+        codigo = status.HTTP_201_CREATED if envio.estado == 'COM' else status.HTTP_202_ACCEPTED
+        return Response(EnvioNotificacionSerializer(envio).data, status=codigo)
+
+    @action(detail=False, methods=['get'], url_path=r'envios/(?P<envio_id>\d+)', permission_classes=[IsAdminOrSuperAdmin])
+    def envio(self, request, envio_id=None):
+        try:
+            envio = EnvioNotificacion.objects.get(pk=envio_id)
+        except EnvioNotificacion.DoesNotExist:
+            return Response({'error': 'Envío no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(EnvioNotificacionSerializer(envio).data)
     
 
 from rest_framework.pagination import PageNumberPagination
@@ -466,11 +506,13 @@ class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = BitacoraPagination
 
     def get_queryset(self):
-        qs = Bitacora.objects.all().order_by('-hora_entrada')
-        usuario_id = self.request.query_params.get('usuario')
-        if usuario_id:
-            qs = qs.filter(usuario__id=usuario_id)
-        return qs
+        params = self.request.query_params
+        return filtrar_bitacora(
+            Bitacora.objects.all().order_by('-hora_entrada'),
+            desde=_parse_instante(params.get('desde')),
+            hasta=_parse_instante(params.get('hasta'), fin=True),
+            **_filtros_bitacora(params),
+        )
 
     @action(detail=False, methods=['get'], url_path='listar')
     def listar(self, request, *args, **kwargs):
@@ -482,7 +524,67 @@ class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
-    
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='estadisticas',
+        permission_classes=[IsAdminOrSuperAdmin, PermisoPorPuesto],
+    )
+    def estadisticas(self, request):
+        """
+        Agregados de la bitácora: ?desde=&hasta= (fecha o fecha-hora, por defecto
+        los últimos 7 días), ?usuario=, ?ip= y ?agrupar=dia|hora.
+        """
+        params = request.query_params
+        agrupar = params.get('agrupar', 'dia')
+        if agrupar not in TRUNCAR:
+            return Response({'error': "agrupar debe ser 'dia' u 'hora'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        hasta = _parse_instante(params.get('hasta'), fin=True) or timezone.now()
+        desde = _parse_instante(params.get('desde')) or hasta - timedelta(days=7)
+        if desde >= hasta:
+            return Response({'error': "'desde' debe ser anterior a 'hasta'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = estadisticas_bitacora(desde, hasta, agrupar=agrupar, **_filtros_bitacora(params))
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def _filtros_bitacora(params):
+    """?usuario= y ?ip= validados antes de llegar al filtro de la BD (si no, 400)."""
+    usuario_id, ip = params.get('usuario') or None, params.get('ip') or None
+    if usuario_id is not None and not usuario_id.isdigit():
+        raise ValidationError({'error': "usuario debe ser un id numérico"})
+    if ip is not None:
+        try:
+            validate_ipv46_address(ip)
+        except DjangoValidationError:
+            raise ValidationError({'error': "ip no es una dirección IPv4/IPv6 válida"})
+    return {'usuario_id': usuario_id, 'ip': ip}
+
+
+def _parse_instante(valor, fin=False):
+    """
+    'AAAA-MM-DD' o fecha-hora ISO → datetime con zona horaria.
+    Con fin=True una fecha sola cubre el día completo (límite exclusivo al día siguiente).
+    """
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+        instante = None if fecha is not None else parse_datetime(valor)
+    except ValueError:
+        fecha = instante = None
+    if fecha is not None:
+        if fin:
+            fecha += timedelta(days=1)
+        instante = datetime.combine(fecha, time.min)
+    if instante is None:
+        raise ValidationError({'fecha': f"Fecha inválida: {valor}"})
+    if timezone.is_naive(instante):
+        instante = timezone.make_aware(instante)
+    return instante
+
 class PuestoViewSet(viewsets.ModelViewSet):
     queryset = Puesto.objects.all()
     serializer_class = PuestoSerializer
@@ -620,7 +722,49 @@ class ModeloPermitidoViewSet(viewsets.ModelViewSet):
     permission_classes = [PermisoPorPuesto]
     authentication_classes = [MultiTokenAuthentication]
 
-class PermisoPuestoViewSet(viewsets.ModelViewSet):
+class MatrizPermisosMixin(AuditoriaMixin):
+    """
+    Lectura y edición en lote de la matriz sujeto × modelo × acción
+    (sujeto = puesto o rol, según `campo_matriz`).
+
+      GET  matriz/          → {"modelos", "acciones", "version", "matriz": {id: {modelo: [acciones]}}}
+      POST matriz/aplicar/  ← {"otorgar": {id: {modelo: [acciones]}}, "revocar": {...}}
+    """
+    campo_matriz = None
+
+    def _matriz(self):
+        if self.campo_matriz == 'puesto':
+            return matriz_permisos.matriz_puestos()
+        return matriz_permisos.matriz_roles()
+
+    @action(detail=False, methods=['get'], url_path='matriz', permission_classes=[IsAdminOrSuperAdmin, PermisoPorPuesto])
+    def matriz(self, request):
+        # Sale de la matriz compilada en memoria: sin consultas en estado estable
+        todos = matriz_permisos.catalogo()
+        return Response({
+            'modelos': sorted({modelo for modelo, _ in todos}),
+            'acciones': sorted({accion for _, accion in todos}),
+            'version': matriz_permisos.version,
+            'matriz': serializar_matriz(self._matriz()),
+        })
+
+    @action(detail=False, methods=['post'], url_path='matriz/aplicar', permission_classes=[IsAdminOrSuperAdmin, PermisoPorPuesto])
+    def aplicar_matriz(self, request):
+        resultado = aplicar_cambios(
+            self.queryset.model, self.campo_matriz,
+            request.data.get('otorgar'), request.data.get('revocar'),
+        )
+        self.auditar(
+            'editar',
+            f"Matriz de permisos por {self.campo_matriz}: "
+            f"{resultado['otorgados']} otorgados, {resultado['revocados']} revocados",
+        )
+        return Response(resultado)
+
+
+class PermisoPuestoViewSet(MatrizPermisosMixin, viewsets.ModelViewSet):
+    tabla_auditoria = 'permiso_puesto'
+    campo_matriz = 'puesto'
     queryset = PermisoPuesto.objects.select_related('puesto', 'modelo', 'accion').all()
     serializer_class = PermisoPuestoSerializer
     permission_classes = [IsAuthenticated]
@@ -646,19 +790,13 @@ class PermisoPuestoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
-class PermisoRolViewSet(viewsets.ModelViewSet):
+class PermisoRolViewSet(MatrizPermisosMixin, viewsets.ModelViewSet):
     """
     CRUD de permisos por Rol. Solo Admin/SuperAdmin pueden modificar.
     """
+    tabla_auditoria = 'permiso_rol'
+    campo_matriz = 'rol'
     queryset = PermisoRol.objects.select_related('rol', 'modelo', 'accion')
     serializer_class = PermisoRolSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [MultiTokenAuthentication]
-
-def get_client_ip(request):
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get("REMOTE_ADDR")
-        return ip
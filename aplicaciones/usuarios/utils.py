@@ -1,13 +1,191 @@
 # usuarios/utils.py
-from .models import Bitacora
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .buffer import BufferEscritura
+from .models import Bitacora
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_CAMPOS_BITACORA = ('usuario_id', 'ip', 'tabla_afectada', 'accion', 'descripcion')
+_CAMPOS_FECHA = ('hora_entrada', 'hora_salida', 'fecha')
+_lock_respaldo = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'BITACORA_BUFFER', {})
+
+
+def _ruta_respaldo():
+    return _config().get('RESPALDO') or os.path.join(settings.BASE_DIR, 'bitacora_pendiente.jsonl')
+
+
+def _a_dict(entrada):
+    data = {campo: getattr(entrada, campo) for campo in _CAMPOS_BITACORA}
+    for campo in _CAMPOS_FECHA:
+        valor = getattr(entrada, campo)
+        data[campo] = valor.isoformat() if valor else None
+    return data
+
+
+def _desde_dict(data):
+    fechas = {campo: parse_datetime(data[campo]) if data.get(campo) else None for campo in _CAMPOS_FECHA}
+    return Bitacora(**{campo: data.get(campo) for campo in _CAMPOS_BITACORA}, **fechas)
+
+
+def _mismo_archivo(archivo, ruta):
+    try:
+        actual, abierto = os.stat(ruta), os.fstat(archivo.fileno())
+    except FileNotFoundError:
+        return False
+    return (actual.st_dev, actual.st_ino) == (abierto.st_dev, abierto.st_ino)
+
+
+def _bloquear(archivo):
+    # Exclusión entre procesos (workers de gunicorn); se libera al cerrar el archivo
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+
+
+def agregar_lineas(ruta, lineas):
+    """Agrega líneas a un archivo de respaldo compartido entre hilos y procesos."""
+    with _lock_respaldo:
+        while True:
+            with open(ruta, 'a', encoding='utf-8') as archivo:
+                _bloquear(archivo)
+                # Si otro proceso lo tomó para recuperarlo mientras esperábamos, se abre el nuevo
+                if _mismo_archivo(archivo, ruta):
+                    archivo.writelines(lineas)
+                    return
+
+
+def tomar_lineas(ruta):
+    """
+    Toma el archivo de respaldo para recuperarlo: lo renombra (atómico) y lo lee.
+    Otro proceso que esté agregando termina en el archivo renombrado antes del
+    bloqueo o abre uno nuevo, y dos procesos no lo toman a la vez.
+    Devuelve (ruta tomada, líneas), o (None, []) si no había respaldo.
+    """
+    if not os.path.exists(ruta):
+        return None, []
+    tomado = f'{ruta}.{os.getpid()}.{time.time_ns()}'
+    with _lock_respaldo:
+        try:
+            os.rename(ruta, tomado)
+        except FileNotFoundError:
+            return None, []
+        with open(tomado, encoding='utf-8') as archivo:
+            _bloquear(archivo)
+            return tomado, [linea for linea in archivo if linea.strip()]
+
+
+def respaldar_bitacora(entradas):
+    """Respaldo durable: si la BD falla, las entradas se agregan a un archivo JSONL."""
+    agregar_lineas(
+        _ruta_respaldo(),
+        [json.dumps(_a_dict(entrada), ensure_ascii=False) + '\n' for entrada in entradas],
+    )
+
+
+def _reinsertar(lineas):
+    """Inserta las líneas del respaldo; devuelve (insertadas, líneas con datos inválidos)."""
+    validas, invalidas = [], []
+    for linea in lineas:
+        try:
+            validas.append((linea, _desde_dict(json.loads(linea))))
+        except (AttributeError, TypeError, ValueError):
+            invalidas.append(linea)
+    try:
+        with transaction.atomic():
+            Bitacora.objects.bulk_create([entrada for _, entrada in validas], batch_size=500)
+        return len(validas), invalidas
+    except (DataError, IntegrityError):
+        pass
+    # Alguna fila no entra: una por una, para que no bloquee al resto. Los errores
+    # de conexión (OperationalError) se propagan y el respaldo se conserva.
+    insertadas = 0
+    for linea, entrada in validas:
+        try:
+            with transaction.atomic():
+                entrada.save()
+            insertadas += 1
+        except (DataError, IntegrityError):
+            invalidas.append(linea)
+    return insertadas, invalidas
+
+
+def _recuperar_respaldo():
+    """
+    Reinserta lo que quedó en el archivo de respaldo en un vaciado anterior
+    (ver tomar_lineas). Las líneas inválidas van a `.descartadas`.
+    """
+    ruta = _ruta_respaldo()
+    tomado, lineas = tomar_lineas(ruta)
+    if tomado is None:
+        return
+    try:
+        insertadas, invalidas = _reinsertar(lineas)
+    except Exception:
+        agregar_lineas(ruta, lineas)
+        os.remove(tomado)
+        raise
+    if invalidas:
+        agregar_lineas(f'{ruta}.descartadas', invalidas)
+        logger.error("Descartadas %s entradas de bitácora inválidas (ver %s.descartadas)", len(invalidas), ruta)
+    os.remove(tomado)
+    logger.info("Recuperadas %s entradas de bitácora del respaldo", insertadas)
+
+
+def _vaciar_bitacora(entradas):
+    Bitacora.objects.bulk_create(entradas, batch_size=500)
+    try:
+        _recuperar_respaldo()
+    except Exception:
+        logger.exception("No se pudo recuperar el respaldo de bitácora")
+
+
+buffer_bitacora = BufferEscritura(
+    'bitacora',
+    _vaciar_bitacora,
+    max_entradas=_config().get('MAX_ENTRADAS', 100),
+    intervalo_ms=_config().get('INTERVALO_MS', 500),
+    respaldo=respaldar_bitacora,
+)
+
 
 def registrar_bitacora(usuario, ip, tabla_afectada, accion, descripcion=""):
-    Bitacora.objects.create(
+    entrada = Bitacora(
         usuario=usuario,
         ip=ip,
         hora_entrada=timezone.now(),
         tabla_afectada=tabla_afectada,
         accion=accion,
         descripcion=descripcion
-    )
\ No newline at end of file
+    )
+    if not _config().get('ACTIVO', True):
+        entrada.save()
+        return
+    # Se inserta en lote desde el hilo del buffer (bulk_create)
+    buffer_bitacora.agregar(entrada)
+
+
+def get_client_ip(request):
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get("REMOTE_ADDR")
+    return ip
@@ -0,0 +1,48 @@
+# usuarios/versiones.py
+"""
+Versión compartida entre procesos para cachés en memoria (MatrizPermisos,
+IndiceKiosco): la versión vive en la caché de Django y cada proceso la relee
+como mucho cada VERSIONES_COMPARTIDAS['RELECTURA_SEG'] segundos.
+
+Con DatabaseCache (sin REDIS_URL) leerla en cada consulta sería un SELECT por
+chequeo de permisos o escaneo; así el costo queda en uno por intervalo y la
+invalidación tarda a lo sumo ese intervalo en llegar a los demás procesos. En
+el proceso que invalida se nota de inmediato.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _relectura():
+    return getattr(settings, 'VERSIONES_COMPARTIDAS', {}).get('RELECTURA_SEG', 5)
+
+
+class VersionCompartida:
+    def __init__(self, clave):
+        self.clave = clave
+        self._lock = threading.Lock()
+        self._vista = (None, 0.0)   # (versión, time.monotonic() de la lectura)
+
+    def actual(self):
+        version, leida = self._vista
+        if version is not None and time.monotonic() - leida < _relectura():
+            return version
+        version = cache.get(self.clave)
+        if version is None:
+            # Si la clave se perdió (caché vaciada o desalojada) no se reinicia en 1:
+            # un proceso que quedó en una versión baja la tomaría por vigente
+            nueva = time.time_ns()
+            version = nueva if cache.add(self.clave, nueva, timeout=None) else cache.get(self.clave, nueva)
+        self._vista = (version, time.monotonic())
+        return version
+
+    def invalidar(self):
+        try:
+            cache.incr(self.clave)
+        except ValueError:
+            cache.set(self.clave, time.time_ns(), timeout=None)
+        with self._lock:
+            self._vista = (None, 0.0)
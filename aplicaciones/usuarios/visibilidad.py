@@ -0,0 +1,144 @@
+# usuarios/visibilidad.py
+"""
+ACL de estudiantes (VisibilidadEstudiante: usuario → estudiante, con motivo).
+
+• TUT: el tutor vinculado en TutorEstudiante.
+• CUR: el profesor tutor del curso del estudiante.
+• MAT: cada profesor que dicta alguna materia en ese curso.
+
+Las señales (usuarios/signals.py) recalculan solo los estudiantes afectados;
+`reconstruir()` regenera la tabla completa. Las vistas la consultan con un
+único semi-join (`visibles`) o un EXISTS por objeto (`puede_ver`).
+"""
+from django.apps import apps as apps_globales
+from django.db import transaction
+
+from .perfil import obtener_perfil
+
+TUTOR, TUTOR_CURSO, MATERIA = 'TUT', 'CUR', 'MAT'
+
+
+def _modelo():
+    return apps_globales.get_model('usuarios', 'VisibilidadEstudiante')
+
+
+# ── consulta ──────────────────────────────────────────────────
+def visibles(usuario_id):
+    """Subconsulta con los ids de estudiante que `usuario_id` puede ver."""
+    return _modelo().objects.filter(usuario_id=usuario_id).values('estudiante_id')
+
+
+def puede_ver(usuario_id, estudiante_id):
+    return _modelo().objects.filter(usuario_id=usuario_id, estudiante_id=estudiante_id).exists()
+
+
+# ── mantenimiento ─────────────────────────────────────────────
+def filas_esperadas(apps=apps_globales, estudiante_ids=None):
+    """(usuario_id, estudiante_id, motivo) según vínculos, cursos y materias."""
+    Estudiante = apps.get_model('estudiantes', 'Estudiante')
+    TutorEstudiante = apps.get_model('estudiantes', 'TutorEstudiante')
+    MateriaCurso = apps.get_model('academico', 'MateriaCurso')
+
+    vinculos = TutorEstudiante.objects.all()
+    estudiantes = Estudiante.objects.filter(curso__isnull=False)
+    if estudiante_ids is not None:
+        vinculos = vinculos.filter(estudiante_id__in=estudiante_ids)
+        estudiantes = estudiantes.filter(pk__in=estudiante_ids)
+
+    for tutor_id, estudiante_id in vinculos.values_list('tutor_id', 'estudiante_id'):
+        yield tutor_id, estudiante_id, TUTOR
+
+    por_curso = {}
+    for estudiante_id, curso_id, tutor_curso_id in estudiantes.values_list('pk', 'curso_id', 'curso__tutor_id'):
+        por_curso.setdefault(curso_id, []).append(estudiante_id)
+        if tutor_curso_id is not None:
+            yield tutor_curso_id, estudiante_id, TUTOR_CURSO
+
+    profesores = (
+        MateriaCurso.objects.filter(curso_id__in=por_curso, profesor__isnull=False)
+        .values_list('curso_id', 'profesor_id')
+        .distinct()
+    )
+    for curso_id, profesor_id in profesores:
+        for estudiante_id in por_curso[curso_id]:
+            yield profesor_id, estudiante_id, MATERIA
+
+
+def sincronizar_estudiantes(estudiante_ids):
+    """Recalcula las filas de esos estudiantes y aplica solo la diferencia."""
+    VisibilidadEstudiante = _modelo()
+    estudiante_ids = set(estudiante_ids)
+    if not estudiante_ids:
+        return
+
+    esperadas = set(filas_esperadas(estudiante_ids=estudiante_ids))
+    actuales = {
+        (fila[1], fila[2], fila[3]): fila[0]
+        for fila in VisibilidadEstudiante.objects.filter(estudiante_id__in=estudiante_ids)
+        .values_list('pk', 'usuario_id', 'estudiante_id', 'motivo')
+    }
+    sobrantes = [pk for fila, pk in actuales.items() if fila not in esperadas]
+    if sobrantes:
+        VisibilidadEstudiante.objects.filter(pk__in=sobrantes).delete()
+    VisibilidadEstudiante.objects.bulk_create(
+        [VisibilidadEstudiante(usuario_id=u, estudiante_id=e, motivo=m) for u, e, m in esperadas - actuales.keys()],
+        ignore_conflicts=True,
+    )
+
+
+def sincronizar_curso(curso_id):
+    Estudiante = apps_globales.get_model('estudiantes', 'Estudiante')
+    sincronizar_estudiantes(Estudiante.objects.filter(curso_id=curso_id).values_list('pk', flat=True))
+
+
+def quitar_curso(curso_id):
+    """Antes de borrar un curso: sus estudiantes quedan sin curso (SET_NULL sin señales)."""
+    _modelo().objects.filter(estudiante__curso_id=curso_id, motivo__in=(TUTOR_CURSO, MATERIA)).delete()
+
+
+def quitar_profesor(usuario_id):
+    """Al borrar un Profesor, Curso.tutor y MateriaCurso.profesor pasan a NULL sin señales."""
+    _modelo().objects.filter(usuario_id=usuario_id, motivo__in=(TUTOR_CURSO, MATERIA)).delete()
+
+
+def reconstruir(apps=apps_globales):
+    VisibilidadEstudiante = apps.get_model('usuarios', 'VisibilidadEstudiante')
+    filas = [
+        VisibilidadEstudiante(usuario_id=usuario_id, estudiante_id=estudiante_id, motivo=motivo)
+        for usuario_id, estudiante_id, motivo in set(filas_esperadas(apps))
+    ]
+    with transaction.atomic():
+        VisibilidadEstudiante.objects.all().delete()
+        VisibilidadEstudiante.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+# ── vistas ────────────────────────────────────────────────────
+class VisibilidadEstudianteMixin:
+    """
+    Acota el queryset de un ViewSet a los estudiantes que el usuario puede ver.
+    `campo_estudiante` es la ruta al estudiante desde el modelo de la vista
+    ('pk' si el modelo es Estudiante). PermisoEstudianteView usa el mismo
+    atributo para el chequeo por objeto.
+
+      • SuperAdmin / Admin → sin filtro
+      • Estudiante        → solo lo suyo
+      • Tutor / Profesor  → semi-join sobre VisibilidadEstudiante
+      • Otros             → sin filtro (los regula PermisoPorRol),
+                             o nada si `otros_sin_acceso`
+    """
+    campo_estudiante = 'estudiante'
+    otros_sin_acceso = False
+
+    def get_queryset(self):
+        return self.filtrar_visibles(super().get_queryset())
+
+    def filtrar_visibles(self, qs):
+        perfil = obtener_perfil(self.request.user)
+        if perfil.es_superadmin or perfil.es_admin:
+            return qs
+        if perfil.es_estudiante:
+            return qs.filter(**{self.campo_estudiante: perfil.usuario_id})
+        if perfil.es_tutor or perfil.es_profesor:
+            return qs.filter(**{f'{self.campo_estudiante}__in': visibles(perfil.usuario_id)})
+        return qs.none() if self.otros_sin_acceso else qs
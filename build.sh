@@ -15,6 +15,9 @@ fi
 echo "Ejecutando migraciones..."
 python manage.py migrate || { echo "Error al ejecutar las migraciones"; exit 1; }
 
+echo "Creando la tabla de caché compartida..."
+python manage.py createcachetable
+
 # Crear superusuario personalizado si no existe
 if [ "$CREATE_SUPERUSER" = "true" ]; then
   echo "Creando superusuario..."
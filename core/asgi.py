@@ -5,4 +5,15 @@ from django.core.asgi import get_asgi_application
 settings_module = 'core.deployment_settings' if 'RENDER_EXTERNAL_HOSTNAME' in os.environ else 'core.settings'
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
 
-application = get_asgi_application()
+# Inicializa Django antes de importar consumidores que usan modelos
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+
+from aplicaciones.usuarios.routing import websocket_urlpatterns
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+})
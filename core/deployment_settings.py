@@ -3,6 +3,9 @@
 import os
 import sys
 from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
 from .settings import *  # hereda configuración base
 
 # 1. Añadir carpeta de aplicaciones al PYTHONPATH
@@ -13,6 +16,14 @@ SECRET_KEY = os.environ['SECRET_KEY']
 DEBUG = os.environ.get('DEBUG', 'False') == 'True'
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'donboscofrontend.onrender.com').split(',')
 
+# La capa de canales se eligió en settings.py con su DEBUG = True: sin REDIS_URL
+# quedó en memoria, que en producción no llega de un proceso a otro
+if not DEBUG and not REDIS_URL:
+    raise ImproperlyConfigured(
+        "Falta REDIS_URL: sin una capa de canales compartida las notificaciones "
+        "en tiempo real no llegan a los clientes (WebSocket/SSE)."
+    )
+
 # 3. Base de datos desde DATABASE_URL
 import dj_database_url
 DATABASES = {
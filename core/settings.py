@@ -1,6 +1,9 @@
 from pathlib import Path
 import sys
 import os
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -66,8 +69,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        "knox.auth.TokenAuthentication",
+        # Único autenticador: token → usuario → perfil en una consulta (con caché)
         'aplicaciones.usuarios.authentication.MultiTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -75,6 +77,115 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Caché compartida entre workers (y persistente a reinicios): versiones de la
+# matriz de permisos y del índice del kiosco, precarga del pase de lista, etc.
+# Con REDIS_URL se usa Redis; si no, una tabla de la BD (`python manage.py
+# createcachetable`, en build.sh). Nunca LocMemCache fuera de los tests: cada
+# proceso tendría su propia copia y las invalidaciones no llegarían al resto.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if 'test' in sys.argv:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+elif REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache_compartida',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+    }
+
+# Versiones de las cachés en memoria por proceso (matriz de permisos, índice del
+# kiosco): se releen de CACHES como mucho cada N segundos, no en cada consulta
+VERSIONES_COMPARTIDAS = {
+    'RELECTURA_SEG': 5,     # demora máxima para que una invalidación llegue a otros procesos
+}
+
+# Caché en memoria de MultiTokenAuthentication (por proceso). Logout, borrado de
+# tokens y desactivación de usuarios solo la limpian en el proceso que los atiende:
+# en los demás workers un token revocado sigue aceptándose hasta TTL segundos.
+MULTITOKEN_CACHE = {
+    'TTL': 15,              # segundos que un token validado se reutiliza sin ir a la BD (cota de revocación)
+    'MAX_ENTRADAS': 10000,  # tope de tokens en memoria (se descartan los menos usados)
+}
+
+# Ciclo de vida de MultiToken
+MULTITOKEN = {
+    'DURACION': 60 * 60 * 24 * 7,   # segundos sin uso hasta que el token expira
+    'REFRESCO': 60 * 5,             # last_used/expires se escriben como mucho cada N segundos
+    'MAX_DISPOSITIVOS': 5,          # tokens activos por usuario; al superarlo se revoca el más antiguo
+}
+
+# Modo sin estado (usuarios/tokens_firmados.py): login entrega además un par JWT
+# y MultiTokenAuthentication acepta `Authorization: Bearer <access>`
+TOKENS_FIRMADOS = {
+    'ACTIVO': True,
+    'RELECTURA_SEG': 5,     # la denylist leída se reutiliza en memoria del proceso (cota de revocación entre workers)
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),   # corto: el perfil viaja en el token
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+
+# Escritura diferida de la bitácora: se encola y se inserta en lote (bulk_create)
+BITACORA_BUFFER = {
+    'ACTIVO': 'test' not in sys.argv,   # en tests se escribe de forma síncrona
+    'MAX_ENTRADAS': 100,                # vaciar al llegar a N entradas...
+    'INTERVALO_MS': 500,                # ...o cada T milisegundos
+    'RESPALDO': os.path.join(BASE_DIR, 'bitacora_pendiente.jsonl'),  # si la BD falla
+}
+
+# Política de auditoría (usuarios/auditoria.py): 'tabla.accion' → regla.
+# Claves más específicas primero: 'tabla.accion', 'tabla.*', '*.accion', '*'.
+AUDITORIA_POLITICA = {
+    # Catálogos del calendario: lecturas muy frecuentes, no se registran
+    'calendario_academico.listar': {'registrar': False},
+    'periodo.listar': {'registrar': False},
+    'feriado.listar': {'registrar': False},
+    'tipo_horario.listar': {'registrar': False},
+    'horario.listar': {'registrar': False},
+    'clase_horario.listar': {'registrar': False},
+    # Resto de lecturas: solo una muestra
+    '*.listar': {'muestreo': 0.1},
+}
+
+# Difusión masiva de notificaciones (usuarios/difusion.py)
+DIFUSION_NOTIFICACIONES = {
+    'LOTE': 1000,           # filas por bulk_create
+    'UMBRAL_FONDO': 500,    # audiencias mayores se procesan en segundo plano
+    'ABANDONO_SEG': 300,    # un envío 'PRO' sin avanzar en N segundos se considera interrumpido
+}
+
+# Retención de notificaciones leídas (python manage.py purgar_notificaciones, p. ej. diario por cron)
+NOTIFICACION_RETENCION = {
+    'DIAS': 90,
+}
+
+# Kiosco de portería (asistencia/kiosco.py): marcas de entrada encoladas e insertadas en lote
+KIOSCO_ASISTENCIA = {
+    'ACTIVO': 'test' not in sys.argv,   # en tests se escribe de forma síncrona
+    'MAX_ENTRADAS': 200,                # vaciar al llegar a N marcas...
+    'INTERVALO_MS': 1000,               # ...o cada T milisegundos
+    'TOLERANCIA_MIN': 10,               # minutos tras el primer bloque del horario antes de 'TAR'
+    'DIARIO': os.path.join(BASE_DIR, 'kiosco_pendiente.jsonl'),  # marcas aceptadas aún sin guardar
+}
+
+# Avisos de inasistencia a tutores (python manage.py alertar_ausencias, p. ej. cada 15 min por cron)
+ALERTAS_AUSENCIA = {
+    'HORA_CORTE': '09:00',   # si la unidad no define hora_corte_asistencia
+}
+
+# Rachas de asistencia (python manage.py detectar_rachas_asistencia, p. ej. cada noche por cron)
+RACHAS_ASISTENCIA = {
+    'MIN_AUSENCIAS': 3,      # faltas sin justificar consecutivas que generan alerta
+    'MIN_RACHA': 10,         # días seguidos con asistencia para registrar la racha
+    'LOTE': 500,             # estudiantes por consulta
+}
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
@@ -126,6 +237,30 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
+
+# Capa de canales de las notificaciones en tiempo real (usuarios/notificaciones.py).
+# Las notificaciones se guardan en los workers WSGI y los consumidores viven en el
+# proceso ASGI: la capa tiene que ser compartida (Redis, REDIS_URL). En memoria
+# solo en tests y en desarrollo (DEBUG), con un único proceso.
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+elif DEBUG or 'test' in sys.argv:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    raise ImproperlyConfigured(
+        "Falta REDIS_URL: sin una capa de canales compartida las notificaciones "
+        "en tiempo real no llegan a los clientes (WebSocket/SSE)."
+    )
 
 STATIC_ROOT = BASE_DIR/'staticfiles'
 
@@ -173,6 +308,13 @@ AUTH_PASSWORD_VALIDATORS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Retención de la bitácora (python manage.py archivar_bitacora, p. ej. mensual por cron)
+BITACORA_RETENCION = {
+    'MESES': 12,            # meses que se conservan en línea
+    'MESES_ADELANTE': 3,    # particiones mensuales creadas por adelantado (PostgreSQL)
+    'DIRECTORIO': os.path.join(MEDIA_ROOT, 'bitacora_archivo'),  # JSONL comprimidos
+}
+
 # Configuración de internacionalización
 LANGUAGE_CODE = 'es-es'
 TIME_ZONE = 'America/La_Paz'